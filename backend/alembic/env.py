@@ -42,6 +42,21 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 target_metadata = db.metadata
 
+# Objetos específicos de PostgreSQL creados con SQL crudo en las migraciones y que no
+# están mapeados en los modelos: autogenerate no debe proponer eliminarlos.
+UNMAPPED_SCHEMA_OBJECTS = {
+    ("column", "search_vector"),
+    ("index", "ix_productos_search_vector"),
+    ("index", "ix_productos_nombre_trgm"),
+}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Excluir de autogenerate los objetos listados en UNMAPPED_SCHEMA_OBJECTS."""
+    if reflected and compare_to is None and (type_, name) in UNMAPPED_SCHEMA_OBJECTS:
+        return False
+    return True
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -64,6 +79,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -87,7 +103,9 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
         )
 
         with context.begin_transaction():
@@ -0,0 +1,30 @@
+"""add keyset pagination indexes to productos
+
+Revision ID: 3c9a41d7b2e5
+Revises: eedaf27feff4
+Create Date: 2026-10-17 09:12:40.221374
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9a41d7b2e5'
+down_revision: Union[str, Sequence[str], None] = 'eedaf27feff4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_productos_precio_id', 'productos', ['precio', 'id_producto'], unique=False)
+    op.create_index('ix_productos_fecha_creacion_id', 'productos', ['fecha_creacion', 'id_producto'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_productos_fecha_creacion_id', table_name='productos')
+    op.drop_index('ix_productos_precio_id', table_name='productos')
@@ -0,0 +1,34 @@
+"""add hash_contenido to imagenes_productos
+
+Revision ID: 5e0f7b3a9d21
+Revises: d4e8a2f61c93
+Create Date: 2026-10-17 15:32:40.118275
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e0f7b3a9d21'
+down_revision: Union[str, Sequence[str], None] = 'd4e8a2f61c93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Las imágenes subidas antes del almacenamiento por contenido quedan en NULL:
+    # su conteo de referencias se hace por url_imagen
+    op.add_column('imagenes_productos', sa.Column('hash_contenido', sa.String(length=64), nullable=True))
+    op.create_index(
+        op.f('ix_imagenes_productos_hash_contenido'), 'imagenes_productos', ['hash_contenido'], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_imagenes_productos_hash_contenido'), table_name='imagenes_productos')
+    op.drop_column('imagenes_productos', 'hash_contenido')
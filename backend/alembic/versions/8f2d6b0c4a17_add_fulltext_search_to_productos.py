@@ -0,0 +1,59 @@
+"""add fulltext search to productos
+
+Revision ID: 8f2d6b0c4a17
+Revises: 3c9a41d7b2e5
+Create Date: 2026-10-17 10:03:11.508912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f2d6b0c4a17'
+down_revision: Union[str, Sequence[str], None] = '3c9a41d7b2e5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # unaccent() no es IMMUTABLE (depende del search_path), así que no puede usarse en
+    # columnas generadas ni índices. Este wrapper fija el diccionario y sí lo es.
+    op.execute("""
+        CREATE OR REPLACE FUNCTION immutable_unaccent(text)
+        RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+        AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+    """)
+
+    op.execute("""
+        ALTER TABLE productos ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('spanish'::regconfig, immutable_unaccent(coalesce(nombre, ''))), 'A') ||
+            setweight(to_tsvector('simple'::regconfig, coalesce(sku, '')), 'A') ||
+            setweight(to_tsvector('spanish'::regconfig, immutable_unaccent(coalesce(material, ''))), 'B') ||
+            setweight(to_tsvector('spanish'::regconfig, immutable_unaccent(coalesce(descripcion, ''))), 'C')
+        ) STORED
+    """)
+
+    op.execute("CREATE INDEX ix_productos_search_vector ON productos USING gin (search_vector)")
+    op.execute(
+        "CREATE INDEX ix_productos_nombre_trgm ON productos "
+        "USING gin (immutable_unaccent(nombre) gin_trgm_ops)"
+    )
+    op.create_index('ix_productos_id_categoria', 'productos', ['id_categoria'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_productos_id_categoria', table_name='productos')
+    op.execute("DROP INDEX IF EXISTS ix_productos_nombre_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_productos_search_vector")
+    op.execute("ALTER TABLE productos DROP COLUMN IF EXISTS search_vector")
+    op.execute("DROP FUNCTION IF EXISTS immutable_unaccent(text)")
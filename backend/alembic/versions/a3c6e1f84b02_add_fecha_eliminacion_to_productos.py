@@ -0,0 +1,39 @@
+"""add fecha_eliminacion to productos
+
+Revision ID: a3c6e1f84b02
+Revises: 5e0f7b3a9d21
+Create Date: 2026-10-17 17:08:13.402651
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c6e1f84b02'
+down_revision: Union[str, Sequence[str], None] = '5e0f7b3a9d21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('productos', sa.Column('fecha_eliminacion', sa.DateTime(), nullable=True))
+
+    # Backfill: los productos que ya están en la papelera toman su última modificación
+    op.execute(
+        "UPDATE productos SET fecha_eliminacion = COALESCE(fecha_actualizacion, fecha_creacion, now()) "
+        "WHERE activo = false"
+    )
+
+    op.create_index(
+        'ix_productos_fecha_eliminacion_id', 'productos', ['fecha_eliminacion', 'id_producto'], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_productos_fecha_eliminacion_id', table_name='productos')
+    op.drop_column('productos', 'fecha_eliminacion')
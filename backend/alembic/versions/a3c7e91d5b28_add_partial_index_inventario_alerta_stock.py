@@ -0,0 +1,32 @@
+"""add partial index inventario alerta stock
+
+Revision ID: a3c7e91d5b28
+Revises: f6b1d8e2a7c4
+Create Date: 2026-10-17 23:40:12.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c7e91d5b28'
+down_revision: Union[str, Sequence[str], None] = 'f6b1d8e2a7c4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Solo las filas en alerta (ver ALERTA_STOCK en models.py): alertas, bajo_stock y el dashboard
+    op.create_index(
+        'ix_inventario_alerta_stock', 'inventario', ['cantidad_stock', 'id_producto'], unique=False,
+        postgresql_where=sa.text('cantidad_stock <= COALESCE(stock_minimo, 0)')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_inventario_alerta_stock', table_name='inventario')
@@ -0,0 +1,37 @@
+"""add fecha_actualizacion to productos and categoria
+
+Revision ID: b71e9c35d0a2
+Revises: 8f2d6b0c4a17
+Create Date: 2026-10-17 11:27:54.730186
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b71e9c35d0a2'
+down_revision: Union[str, Sequence[str], None] = '8f2d6b0c4a17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('productos', sa.Column('fecha_actualizacion', sa.DateTime(), nullable=True))
+    op.add_column('categoria', sa.Column('fecha_actualizacion', sa.DateTime(), nullable=True))
+
+    # Backfill: los productos existentes toman su fecha de creación, las categorías la fecha actual
+    op.execute("UPDATE productos SET fecha_actualizacion = COALESCE(fecha_creacion, now())")
+    op.execute("UPDATE categoria SET fecha_actualizacion = now()")
+
+    op.create_index('ix_productos_fecha_actualizacion', 'productos', ['fecha_actualizacion'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_productos_fecha_actualizacion', table_name='productos')
+    op.drop_column('categoria', 'fecha_actualizacion')
+    op.drop_column('productos', 'fecha_actualizacion')
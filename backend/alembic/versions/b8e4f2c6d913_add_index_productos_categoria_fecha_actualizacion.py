@@ -0,0 +1,31 @@
+"""add index productos categoria fecha_actualizacion
+
+Revision ID: b8e4f2c6d913
+Revises: a3c7e91d5b28
+Create Date: 2026-10-18 10:05:37.604219
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e4f2c6d913'
+down_revision: Union[str, Sequence[str], None] = 'a3c7e91d5b28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_productos_categoria_fecha_actualizacion', 'productos', ['id_categoria', 'fecha_actualizacion'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_productos_categoria_fecha_actualizacion', table_name='productos')
@@ -0,0 +1,52 @@
+"""add imagen_principal_url, stock_actual and en_stock to productos
+
+Revision ID: c58d2b7e9f40
+Revises: a3c6e1f84b02
+Create Date: 2026-10-17 18:41:27.915304
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c58d2b7e9f40'
+down_revision: Union[str, Sequence[str], None] = 'a3c6e1f84b02'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Copias desnormalizadas de imagenes_productos e inventario (ver models.sincronizar_resumen_productos)
+    op.add_column('productos', sa.Column('imagen_principal_url', sa.String(length=500), nullable=True))
+    op.add_column('productos', sa.Column('stock_actual', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('productos', sa.Column('en_stock', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+    # Backfill: misma regla que la aplicación (imagen marcada como principal, si no la primera)
+    op.execute("""
+        UPDATE productos SET
+            imagen_principal_url = (
+                SELECT i.url_imagen FROM imagenes_productos i
+                WHERE i.id_producto = productos.id_producto
+                ORDER BY COALESCE(i.imagen_principal, false) DESC, i.id_imagen
+                LIMIT 1
+            ),
+            stock_actual = COALESCE((
+                SELECT inv.cantidad_stock FROM inventario inv
+                WHERE inv.id_producto = productos.id_producto
+            ), 0)
+    """)
+    op.execute("UPDATE productos SET en_stock = (stock_actual > 0)")
+
+    op.create_index(op.f('ix_productos_en_stock'), 'productos', ['en_stock'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_productos_en_stock'), table_name='productos')
+    op.drop_column('productos', 'en_stock')
+    op.drop_column('productos', 'stock_actual')
+    op.drop_column('productos', 'imagen_principal_url')
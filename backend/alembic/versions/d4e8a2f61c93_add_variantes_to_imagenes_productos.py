@@ -0,0 +1,29 @@
+"""add variantes to imagenes_productos
+
+Revision ID: d4e8a2f61c93
+Revises: b71e9c35d0a2
+Create Date: 2026-10-17 14:05:12.381904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4e8a2f61c93'
+down_revision: Union[str, Sequence[str], None] = 'b71e9c35d0a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Las imágenes existentes quedan en NULL: usar `flask imagenes generar-variantes`
+    op.add_column('imagenes_productos', sa.Column('variantes', sa.JSON(none_as_null=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('imagenes_productos', 'variantes')
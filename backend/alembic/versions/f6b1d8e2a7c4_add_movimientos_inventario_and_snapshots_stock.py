@@ -0,0 +1,67 @@
+"""add movimientos_inventario and snapshots_stock
+
+Revision ID: f6b1d8e2a7c4
+Revises: c58d2b7e9f40
+Create Date: 2026-10-17 21:12:46.530118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6b1d8e2a7c4'
+down_revision: Union[str, Sequence[str], None] = 'c58d2b7e9f40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('movimientos_inventario',
+    sa.Column('id_movimiento', sa.Integer(), nullable=False),
+    sa.Column('id_producto', sa.Integer(), nullable=False),
+    sa.Column('cantidad', sa.Integer(), nullable=False),
+    sa.Column('stock_resultante', sa.Integer(), nullable=False),
+    sa.Column('motivo', sa.String(length=20), nullable=False),
+    sa.Column('id_orden', sa.Integer(), nullable=True),
+    sa.Column('id_usuario', sa.Integer(), nullable=True),
+    sa.Column('fecha', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['id_producto'], ['productos.id_producto'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['id_orden'], ['ordenes.id_orden'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['id_usuario'], ['usuarios.id_usuarios'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id_movimiento')
+    )
+    op.create_index(
+        'ix_movimientos_inventario_producto_fecha', 'movimientos_inventario', ['id_producto', 'fecha'], unique=False
+    )
+    op.create_index(op.f('ix_movimientos_inventario_id_orden'), 'movimientos_inventario', ['id_orden'], unique=False)
+
+    op.create_table('snapshots_stock',
+    sa.Column('id_snapshot', sa.Integer(), nullable=False),
+    sa.Column('id_producto', sa.Integer(), nullable=False),
+    sa.Column('cantidad_stock', sa.Integer(), nullable=False),
+    sa.Column('fecha', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['id_producto'], ['productos.id_producto'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id_snapshot'),
+    sa.UniqueConstraint('id_producto', 'fecha', name='uq_snapshots_stock_producto_fecha')
+    )
+    op.create_index(op.f('ix_snapshots_stock_fecha'), 'snapshots_stock', ['fecha'], unique=False)
+
+    # Punto de partida del historial: el stock actual como primer snapshot
+    op.execute("""
+        INSERT INTO snapshots_stock (id_producto, cantidad_stock, fecha)
+        SELECT id_producto, cantidad_stock, (now() AT TIME ZONE 'utc')
+        FROM inventario WHERE id_producto IS NOT NULL
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_snapshots_stock_fecha'), table_name='snapshots_stock')
+    op.drop_table('snapshots_stock')
+    op.drop_index(op.f('ix_movimientos_inventario_id_orden'), table_name='movimientos_inventario')
+    op.drop_index('ix_movimientos_inventario_producto_fecha', table_name='movimientos_inventario')
+    op.drop_table('movimientos_inventario')
@@ -35,6 +35,18 @@ def create_app(config_class=Config):
     db.init_app(app)
     jwt.init_app(app)
     
+    # Caché de respuestas del catálogo
+    from .cache import catalog_cache
+    catalog_cache.init_app(app)
+    
+    # Contador de consultas SQL por request (diagnóstico de N+1)
+    from .utils.query_counter import init_query_counter
+    init_query_counter(app)
+    
+    # Compresión gzip/brotli de las respuestas de /api/*
+    from .utils.compression import init_compression
+    init_compression(app)
+    
     # Callback para serializar identity dict a string JSON para el claim 'sub'
     @jwt.user_identity_loader
     def user_identity_lookup(identity):
@@ -89,6 +101,10 @@ def create_app(config_class=Config):
     # Manejadores de errores globales
     register_error_handlers(app)
     
+    # Comandos CLI (flask imagenes ...)
+    from .commands import register_commands
+    register_commands(app)
+    
     # Ruta raíz (health check)
     @app.route('/')
     def index():
@@ -0,0 +1,311 @@
+"""
+Caché en memoria de respuestas del catálogo para MuebleriaIris ERP
+
+Las lecturas del catálogo (productos, detalle de producto, categorías) superan a las
+escrituras por miles a uno. Esta caché guarda el JSON ya serializado de esas respuestas
+para no volver a consultar PostgreSQL ni reconstruir diccionarios en cada request.
+
+- LRU con TTL y límite por cantidad de entradas y por bytes totales.
+- Cada entrada lleva "tags"; los servicios invalidan por tag después de cada commit
+  (por ejemplo, modificar el producto 7 invalida "producto:7" y los listados).
+- Contadores de hits/misses/evictions para monitoreo.
+
+Es una caché por proceso: con varios workers de gunicorn cada uno tiene la suya y la
+invalidación alcanza solo al worker que hizo la escritura; el TTL acota cuánto tiempo
+puede quedar desactualizado otro worker.
+"""
+from __future__ import annotations
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Iterable
+from urllib.parse import urlencode
+
+from flask import Flask, Response, current_app, request
+
+from .utils.http_cache import apply_cache_headers, etag_matches, not_modified_response
+
+# Tags usados por el catálogo
+TAG_PRODUCTOS = "productos"      # Listados de productos (cualquier cambio de producto los afecta)
+TAG_CATEGORIAS = "categorias"    # Listados de categorías
+
+
+def tag_producto(producto_id: int) -> str:
+    """Tag del detalle de un producto."""
+    return f"producto:{producto_id}"
+
+
+def tag_categoria(categoria_id: int) -> str:
+    """Tag de las respuestas que incluyen datos de una categoría."""
+    return f"categoria:{categoria_id}"
+
+
+class CacheEntry:
+    """
+    Entrada de la caché: cuerpo serializado, tags y vencimiento.
+
+    `compressed_bodies` guarda el cuerpo ya comprimido por codificación ("gzip", "br"), así
+    la compresión de una respuesta cacheada se paga una vez por entrada (ver
+    utils/compression.py).
+    """
+
+    __slots__ = ("key", "body", "tags", "expires_at", "size", "compressed_bodies")
+
+    def __init__(self, key: str, body: bytes, tags: frozenset[str], expires_at: float) -> None:
+        self.key = key
+        self.body = body
+        self.tags = tags
+        self.expires_at = expires_at
+        self.size = len(body) + len(key)
+        self.compressed_bodies: dict[str, bytes] = {}
+
+
+class ResponseCache:
+    """
+    Caché LRU con TTL, límite de memoria e invalidación por tags.
+
+    Sigue el patrón de las extensiones Flask: se crea global y se configura con init_app.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.max_entries = 512
+        self.max_bytes = 64 * 1024 * 1024
+        self.ttl = 300
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._tags: dict[str, set[str]] = {}
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def init_app(self, app: Flask) -> None:
+        """Leer la configuración CATALOG_CACHE_* de la aplicación."""
+        self.enabled = app.config.get('CATALOG_CACHE_ENABLED', True)
+        self.max_entries = app.config.get('CATALOG_CACHE_MAX_ENTRIES', self.max_entries)
+        self.max_bytes = app.config.get('CATALOG_CACHE_MAX_BYTES', self.max_bytes)
+        self.ttl = app.config.get('CATALOG_CACHE_TTL', self.ttl)
+        self.clear()
+        app.extensions['catalog_cache'] = self
+
+    def get(self, key: str) -> CacheEntry | None:
+        """Obtener una entrada vigente (y marcarla como usada recientemente)."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(
+        self, key: str, body: bytes, tags: Iterable[str] = (), ttl: int | None = None
+    ) -> CacheEntry | None:
+        """
+        Guardar una entrada, desalojando las menos usadas si se superan los límites.
+        `ttl` reemplaza al TTL general para esta entrada (datos que cambian más seguido).
+        """
+        if not self.enabled:
+            return None
+        entry = CacheEntry(key, body, frozenset(tags), time.monotonic() + (self.ttl if ttl is None else ttl))
+        if entry.size > self.max_bytes:
+            return None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            for tag in entry.tags:
+                self._tags.setdefault(tag, set()).add(key)
+            self._evict()
+        return entry
+
+    def compressed(
+        self, entry: CacheEntry, encoding: str, compress: Callable[[bytes], bytes]
+    ) -> tuple[bytes, bool]:
+        """
+        Cuerpo de una entrada comprimido con `encoding`, calculándolo solo la primera vez.
+
+        La compresión se hace fuera del lock; si la entrada sigue en la caché el resultado
+        se guarda en ella (y cuenta para el límite de bytes).
+
+        Returns:
+            Tupla (cuerpo comprimido, True si ya estaba precomprimido)
+        """
+        body = entry.compressed_bodies.get(encoding)
+        if body is not None:
+            return body, True
+        body = compress(entry.body)
+        with self._lock:
+            if self._entries.get(entry.key) is entry and encoding not in entry.compressed_bodies:
+                entry.compressed_bodies[encoding] = body
+                entry.size += len(body)
+                self._bytes += len(body)
+                self._evict()
+        return body, False
+
+    def invalidate_tags(self, *tags: str) -> int:
+        """Eliminar todas las entradas que tengan alguno de los tags. Devuelve cuántas."""
+        removed = 0
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+                    removed += 1
+            self.invalidations += removed
+        return removed
+
+    def clear(self) -> None:
+        """Vaciar la caché (los contadores se conservan)."""
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict[str, Any]:
+        """Contadores y ocupación actual."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _evict(self) -> None:
+        """Desalojar las entradas menos usadas hasta respetar los límites (con lock tomado)."""
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        """Quitar una entrada y sus referencias en el índice de tags (con lock tomado)."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= entry.size
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+# Instancia global (configurada en create_app)
+catalog_cache = ResponseCache()
+
+
+# ==============================================================================
+#                        HELPERS PARA ROUTES Y SERVICIOS
+# ==============================================================================
+
+def request_cache_key() -> str:
+    """Clave de caché del request actual: path + query params ordenados."""
+    args = sorted(request.args.items(multi=True))
+    return f"{request.path}?{urlencode(args)}" if args else request.path
+
+
+def cached_json_response(
+    tags: Iterable[str] | Callable[[Any], Iterable[str]],
+    builder: Callable[[], Any],
+    etag: str | None = None
+) -> Response:
+    """
+    Devolver la respuesta JSON cacheada del request actual, o construirla con `builder`.
+
+    `tags` puede ser una lista fija o una función que recibe los datos construidos
+    (útil cuando el tag depende del contenido, como la categoría de un producto).
+
+    La respuesta lleva la entrada en `response.cache_entry` para que la compresión
+    (utils/compression.py) reutilice el cuerpo precomprimido.
+
+    Si se pasa `etag` (ver utils/http_cache.py):
+    - Si el cliente ya tiene esa versión se responde 304 sin construir nada.
+    - El ETag forma parte de la clave, así una entrada de una versión anterior nunca
+      se sirve aunque la invalidación por tags no haya llegado a este worker.
+
+    Example:
+        return cached_json_response([TAG_CATEGORIAS], lambda: CategoriaService.listar_categorias())
+    """
+    if etag is not None and etag_matches(etag):
+        return not_modified_response(etag)
+
+    key = request_cache_key()
+    if etag is not None:
+        key = f"{key}#{etag}"
+    entry = catalog_cache.get(key)
+    if entry is None:
+        data = builder()
+        body = f"{current_app.json.dumps(data)}\n".encode("utf-8")
+        entry = catalog_cache.set(key, body, tags(data) if callable(tags) else tags)
+    else:
+        body = entry.body
+    response = current_app.response_class(body, mimetype=current_app.json.mimetype)
+    response.cache_entry = entry
+    if etag is not None:
+        apply_cache_headers(response, etag)
+    return response
+
+
+def cached_value(key: str, tags: Iterable[str], builder: Callable[[], Any], ttl: int | None = None) -> Any:
+    """
+    Valor JSON-serializable cacheado bajo una clave fija, para materializaciones chicas
+    que usan varios endpoints (por ejemplo, las estadísticas por categoría).
+    `ttl` permite un vencimiento más corto que CATALOG_CACHE_TTL.
+
+    Example:
+        stats = cached_value("valor:estadisticas_categorias", [TAG_PRODUCTOS], calcular)
+    """
+    entry = catalog_cache.get(key)
+    if entry is not None:
+        return json.loads(entry.body)
+    data = builder()
+    catalog_cache.set(key, json.dumps(data).encode("utf-8"), tags, ttl)
+    return data
+
+
+def invalidar_producto(producto_id: int | None = None) -> None:
+    """Invalidar los listados de productos y, si se indica, el detalle de un producto."""
+    tags = [TAG_PRODUCTOS]
+    if producto_id is not None:
+        tags.append(tag_producto(producto_id))
+    catalog_cache.invalidate_tags(*tags)
+
+
+def invalidar_productos(producto_ids: Iterable[int]) -> None:
+    """Invalidar los listados de productos y el detalle de varios productos (operaciones masivas)."""
+    catalog_cache.invalidate_tags(TAG_PRODUCTOS, *(tag_producto(i) for i in producto_ids))
+
+
+def invalidar_categoria(categoria_id: int | None = None) -> None:
+    """
+    Invalidar los listados de categorías. Los productos muestran el nombre de su
+    categoría, así que también caen los listados de productos y los detalles de
+    productos de esa categoría.
+    """
+    tags = [TAG_CATEGORIAS, TAG_PRODUCTOS]
+    if categoria_id is not None:
+        tags.append(tag_categoria(categoria_id))
+    catalog_cache.invalidate_tags(*tags)
+
+# --- Fin de cache.py ---
@@ -0,0 +1,119 @@
+"""
+Comandos CLI de Flask para MuebleriaIris ERP
+
+Uso:
+    flask imagenes generar-variantes [--forzar]
+    flask imagenes limpiar-huerfanos
+    flask recomendaciones reconstruir [--producto ID]
+    flask catalogo snapshot [--completo]
+    flask inventario snapshot
+"""
+from __future__ import annotations
+import click
+from flask import Flask
+from flask.cli import AppGroup
+
+imagenes_cli = AppGroup('imagenes', help='Mantenimiento de imágenes de productos.')
+recomendaciones_cli = AppGroup('recomendaciones', help='Índice de productos comprados juntos.')
+catalogo_cli = AppGroup('catalogo', help='Snapshot estático del catálogo.')
+inventario_cli = AppGroup('inventario', help='Historial de stock.')
+
+
+@imagenes_cli.command('generar-variantes')
+@click.option('--forzar', is_flag=True, help='Regenerar también las imágenes que ya tienen variantes.')
+def generar_variantes(forzar: bool) -> None:
+    """Generar thumbnails/WebP de las imágenes subidas antes del pipeline de variantes."""
+    from .services.imagen_service import ImagenService, ImagenServiceError
+
+    if not ImagenService.disponible():
+        raise click.ClickException("Pillow no está instalado o IMAGE_VARIANTS_ENABLED=false")
+
+    ids = ImagenService.pendientes(forzar=forzar)
+    generadas = errores = 0
+    with click.progressbar(ids, label=f"Procesando {len(ids)} imágenes") as barra:
+        for imagen_id in barra:
+            try:
+                if ImagenService.procesar_imagen(imagen_id, forzar=forzar):
+                    generadas += 1
+            except ImagenServiceError as e:
+                errores += 1
+                click.echo(f"\nImagen {imagen_id}: {e.message}", err=True)
+
+    click.echo(f"Variantes generadas: {generadas}. Omitidas: {len(ids) - generadas - errores}. Errores: {errores}.")
+
+
+@imagenes_cli.command('limpiar-huerfanos')
+def limpiar_huerfanos() -> None:
+    """
+    Borrar los uploads que ninguna imagen referencia y que superaron UPLOADS_GRACE_SECONDS
+    (uploads nunca asociados a un producto o conservados en su período de gracia).
+    """
+    from .services.imagen_service import ImagenService
+
+    borrados = ImagenService.limpiar_huerfanos()
+    click.echo(f"Archivos huérfanos borrados: {borrados}.")
+
+
+@recomendaciones_cli.command('reconstruir')
+@click.option('--producto', type=int, help='Mostrar las recomendaciones de este producto.')
+def reconstruir_recomendaciones(producto: int | None) -> None:
+    """
+    Reconstruir la matriz de co-ocurrencia desde las órdenes y mostrar estadísticas.
+
+    El índice vive en la memoria de cada worker: para refrescar los workers en ejecución
+    usar POST /api/productos/recomendados/reconstruir (o esperar RECOMMENDATIONS_REFRESH_SECONDS).
+    """
+    from .services.recomendacion_service import RecomendacionService
+
+    estadisticas = RecomendacionService.reconstruir()
+    click.echo(
+        f"Índice construido en {estadisticas['duracion_ms']} ms: "
+        f"{estadisticas['productos']} productos, {estadisticas['pares']} pares."
+    )
+    if producto is not None:
+        for recomendacion in RecomendacionService.recomendados(producto):
+            click.echo(f"  {recomendacion['id']}: {recomendacion['veces']} órdenes")
+
+
+@catalogo_cli.command('snapshot')
+@click.option('--completo', is_flag=True, help='Reescribir todos los shards aunque no hayan cambiado.')
+def generar_snapshot(completo: bool) -> None:
+    """Generar el snapshot estático del catálogo (manifest.json + un shard por categoría)."""
+    from .services.snapshot_service import SnapshotService, SnapshotServiceError
+
+    try:
+        resumen = SnapshotService.generar(completo=completo)
+    except SnapshotServiceError as e:
+        raise click.ClickException(e.message)
+
+    click.echo(
+        f"Snapshot v{resumen['version']} en {resumen['duracion_ms']} ms: "
+        f"{resumen['categorias']} categorías, {resumen['total_productos']} productos, "
+        f"{len(resumen['regenerados'])} shards regenerados."
+    )
+
+
+@inventario_cli.command('snapshot')
+def snapshot_stock() -> None:
+    """
+    Guardar el stock actual de todos los productos en snapshots_stock.
+
+    Programarlo periódicamente (p. ej. cron diario: `0 3 * * * flask inventario snapshot`)
+    para que "stock a la fecha" y los reportes de movimientos solo reproduzcan los
+    movimientos posteriores al último snapshot.
+    """
+    from .services.inventario_service import InventarioService, InventarioServiceError
+
+    try:
+        resumen = InventarioService.tomar_snapshot()
+    except InventarioServiceError as e:
+        raise click.ClickException(e.message)
+    click.echo(f"Snapshot de stock {resumen['fecha']}: {resumen['productos']} productos.")
+
+
+def register_commands(app: Flask) -> None:
+    """Registrar los grupos de comandos CLI en la aplicación."""
+    app.cli.add_command(imagenes_cli)
+    app.cli.add_command(recomendaciones_cli)
+    app.cli.add_command(catalogo_cli)
+    app.cli.add_command(inventario_cli)
@@ -15,12 +15,28 @@ from . import db
 
 # Importa datetime para manejar fechas y horas
 from datetime import datetime, timezone
+from functools import lru_cache
+
+# Estrategias de carga de relaciones (para evitar consultas N+1 al serializar listas)
+from sqlalchemy.orm import configure_mappers, joinedload, load_only, selectinload
+from sqlalchemy import func, select, update
 
 
 def utc_now():
     """Retorna datetime actual en UTC (reemplaza datetime.utcnow deprecated)."""
     return datetime.now(timezone.utc)
 
+
+def serializar_campos(campos, fields=None):
+    """
+    Arma el diccionario de un .to_dict() evaluando solo los campos pedidos.
+    `campos` mapea cada clave a una función sin argumentos; con fields=None van todos.
+    Así un ?fields=id,nombre no toca relaciones que no se precargaron.
+    """
+    if fields is None:
+        return {clave: valor() for clave, valor in campos.items()}
+    return {clave: valor() for clave, valor in campos.items() if clave in fields}
+
 # ==========================================
 # 1. SISTEMA DE USUARIOS Y ROLES
 # ==========================================
@@ -71,6 +87,7 @@ class Categoria(db.Model):
     nombre = db.Column(db.String(100), unique=True, nullable=False)
     descripcion = db.Column(db.Text)
     activa = db.Column(db.Boolean, default=True)
+    fecha_actualizacion = db.Column(db.DateTime, default=utc_now, onupdate=utc_now)  # Usada para ETags
     productos = db.relationship("Producto", backref="categoria", lazy=True)  # Una categoría tiene muchos productos
     
     def to_dict(self):
@@ -85,6 +102,18 @@ class Categoria(db.Model):
 # Modelo para la tabla 'productos' - Define los productos del catálogo
 class Producto(db.Model):
     __tablename__ = "productos"
+    __table_args__ = (
+        # Índices para la paginación por cursor (orden estable: clave + id)
+        db.Index("ix_productos_precio_id", "precio", "id_producto"),
+        db.Index("ix_productos_fecha_creacion_id", "fecha_creacion", "id_producto"),
+        # Papelera: listado por fecha de eliminación y purga de "más viejos que N días"
+        db.Index("ix_productos_fecha_eliminacion_id", "fecha_eliminacion", "id_producto"),
+        # Versión de la página de un producto: última modificación dentro de su categoría
+        db.Index("ix_productos_categoria_fecha_actualizacion", "id_categoria", "fecha_actualizacion"),
+    )
+    # NOTA: En PostgreSQL la tabla tiene además la columna generada `search_vector` (tsvector)
+    # y sus índices GIN/trigram para la búsqueda. No se mapean acá porque son específicos de
+    # PostgreSQL; se crean en la migración y los usa services/busqueda_service.py.
     id_producto = db.Column(db.Integer, primary_key=True)
     sku = db.Column(db.String(50), unique=True)
     nombre = db.Column(db.String(100), nullable=False)
@@ -94,44 +123,46 @@ class Producto(db.Model):
     ancho_cm = db.Column(db.Numeric(5, 2))
     profundidad_cm = db.Column(db.Numeric(5, 2))
     material = db.Column(db.String(100), nullable=False)
-    id_categoria = db.Column(db.Integer, db.ForeignKey("categoria.id_categoria"))  # FK a Categoria
+    id_categoria = db.Column(db.Integer, db.ForeignKey("categoria.id_categoria"), index=True)  # FK a Categoria
     activo = db.Column(db.Boolean, default=True)  # Si el producto está activo/disponible
     fecha_creacion = db.Column(db.DateTime, default=utc_now)
+    # Última modificación del producto o de sus imágenes (usada para ETags)
+    fecha_actualizacion = db.Column(db.DateTime, default=utc_now, onupdate=utc_now, index=True)
+    # Momento en que el producto pasó a la papelera (NULL si está activo)
+    fecha_eliminacion = db.Column(db.DateTime)
+    # Resumen desnormalizado de imágenes e inventario para listados tipo tarjeta
+    # (se mantiene con sincronizar_resumen_productos al modificar imágenes o stock)
+    imagen_principal_url = db.Column(db.String(500))
+    stock_actual = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    en_stock = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false(), index=True)
     imagenes = db.relationship("ImagenProducto", backref="producto", lazy=True, cascade="all, delete-orphan")  # Un producto tiene muchas imágenes
     inventario = db.relationship("Inventario", backref="producto", uselist=False, lazy=True)  # Un producto tiene un inventario (uno a uno)
     detalles_orden = db.relationship("DetalleOrden", backref="producto", lazy=True)  # Un producto puede estar en muchos detalles de orden
     
-    def to_dict(self):
-        # Obtener la imagen principal
-        imagen_principal = None
-        if self.imagenes:
-            img_principal = next((img for img in self.imagenes if img.imagen_principal), None)
-            if img_principal:
-                imagen_principal = img_principal.url_imagen
-            elif len(self.imagenes) > 0:
-                # Si no hay imagen marcada como principal, usar la primera
-                imagen_principal = self.imagenes[0].url_imagen
-        
-        return {
-            "id": self.id_producto,
-            "sku": self.sku,
-            "nombre": self.nombre,
-            "descripcion": self.descripcion,
-            "precio": float(self.precio),
-            "medidas": {
+    def to_dict(self, fields=None):
+        return serializar_campos({
+            "id": lambda: self.id_producto,
+            "sku": lambda: self.sku,
+            "nombre": lambda: self.nombre,
+            "descripcion": lambda: self.descripcion,
+            "precio": lambda: float(self.precio),
+            "medidas": lambda: {
                 "alto": float(self.alto_cm) if self.alto_cm else None,
                 "ancho": float(self.ancho_cm) if self.ancho_cm else None,
                 "profundidad": float(self.profundidad_cm) if self.profundidad_cm else None
             },
-            "material": self.material,
-            "categoria": self.categoria.nombre if self.categoria else None,
-            "id_categoria": self.id_categoria,
-            "activo": self.activo,
-            "fecha_creacion": self.fecha_creacion.isoformat() if self.fecha_creacion else None,
-            "imagen_principal": imagen_principal,
-            "imagenes": [img.to_dict() for img in self.imagenes] if self.imagenes else [],
-            "stock": self.inventario.cantidad_stock if self.inventario else 0
-        }
+            "material": lambda: self.material,
+            "categoria": lambda: self.categoria.nombre if self.categoria else None,
+            "id_categoria": lambda: self.id_categoria,
+            "activo": lambda: self.activo,
+            "fecha_creacion": lambda: self.fecha_creacion.isoformat() if self.fecha_creacion else None,
+            "fecha_actualizacion": lambda: self.fecha_actualizacion.isoformat() if self.fecha_actualizacion else None,
+            "fecha_eliminacion": lambda: self.fecha_eliminacion.isoformat() if self.fecha_eliminacion else None,
+            "imagen_principal": lambda: self.imagen_principal_url,
+            "imagenes": lambda: [img.to_dict() for img in self.imagenes] if self.imagenes else [],
+            "stock": lambda: self.stock_actual,
+            "en_stock": lambda: self.en_stock
+        }, fields)
 
 
 # Modelo para la tabla 'imagenes_productos' - Define las imágenes de productos
@@ -142,13 +173,37 @@ class ImagenProducto(db.Model):
     url_imagen = db.Column(db.Text, nullable=False)
     imagen_principal = db.Column(db.Boolean, default=False)
     descripcion = db.Column(db.Text)
+    # SHA-256 del archivo subido (almacenamiento direccionado por contenido, NULL en URLs externas).
+    # Varias filas con el mismo hash comparten archivo: el conteo de filas es su refcount.
+    hash_contenido = db.Column(db.String(64), index=True)
+    # Variantes redimensionadas generadas en segundo plano (ver services/imagen_service.py)
+    # {"thumb": {"ancho": 160, "alto": 120, "webp": url, "jpg": url}, "card": {...}, "detail": {...}}
+    variantes = db.Column(db.JSON(none_as_null=True))
+    
+    def srcset(self):
+        """
+        srcset por formato para <picture>/<img>. Mientras las variantes no estén listas
+        (o si la imagen es externa) cada formato apunta al original.
+        """
+        if not self.variantes:
+            return {"webp": self.url_imagen, "jpg": self.url_imagen}
+        return {
+            extension: ", ".join(
+                f"{datos[extension]} {datos['ancho']}w" for datos in self.variantes.values()
+                if datos.get(extension)
+            )
+            for extension in ("webp", "jpg")
+        }
     
     def to_dict(self):
         return {
             "id": self.id_imagen,
             "url": self.url_imagen,
             "imagen_principal": self.imagen_principal,
-            "descripcion": self.descripcion
+            "descripcion": self.descripcion,
+            "variantes": self.variantes or {},
+            "variantes_listas": bool(self.variantes),
+            "srcset": self.srcset()
         }
 
 
@@ -186,6 +241,16 @@ class Proveedor(db.Model):
 # Modelo para la tabla 'inventario' - Define el stock de productos
 class Inventario(db.Model):
     __tablename__ = "inventario"
+    __table_args__ = (
+        # Índice parcial con solo las filas en alerta (ver ALERTA_STOCK): las alertas y el
+        # filtro bajo_stock leen unas pocas filas en vez de recorrer todo el inventario.
+        # PostgreSQL lo mantiene solo en cada UPDATE de stock.
+        db.Index(
+            "ix_inventario_alerta_stock", "cantidad_stock", "id_producto",
+            postgresql_where=db.text("cantidad_stock <= COALESCE(stock_minimo, 0)"),
+            sqlite_where=db.text("cantidad_stock <= COALESCE(stock_minimo, 0)"),
+        ),
+    )
     id_inventario = db.Column(db.Integer, primary_key=True)
     id_producto = db.Column(db.Integer, db.ForeignKey("productos.id_producto"), unique=True)  # FK a Producto (uno a uno)
     cantidad_stock = db.Column(db.Integer, default=0, nullable=False)
@@ -195,19 +260,71 @@ class Inventario(db.Model):
     # Se mantiene para compatibilidad con esquema existente
     utlima_actualizacion = db.Column(db.DateTime, default=utc_now, onupdate=utc_now)
     
+    def to_dict(self, fields=None):
+        return serializar_campos({
+            "id": lambda: self.id_inventario,
+            "id_producto": lambda: self.id_producto,
+            "stock": lambda: self.cantidad_stock,  # Frontend expects 'stock'
+            "cantidad": lambda: self.cantidad_stock,  # Keep for backwards compatibility
+            "ubicacion": lambda: self.ubicacion or "",
+            "stock_minimo": lambda: self.stock_minimo,
+            "alerta_stock": lambda: self.cantidad_stock <= (self.stock_minimo or 0),  # Computed field (ver ALERTA_STOCK)
+            "fecha_actualizacion": lambda: self.utlima_actualizacion.isoformat() if self.utlima_actualizacion else None
+        }, fields)
+
+
+# Condición de alerta de stock (bajo stock o agotado). stock_minimo admite NULL (se toma
+# como 0, así un producto sin stock siempre está en alerta). Debe coincidir con el
+# predicado del índice parcial ix_inventario_alerta_stock para que el planner lo use.
+ALERTA_STOCK = Inventario.cantidad_stock <= func.coalesce(Inventario.stock_minimo, 0)
+
+
+# Motivos de los movimientos de inventario
+MOTIVOS_MOVIMIENTO = ("inicial", "venta", "cancelacion", "compra", "devolucion", "ajuste", "correccion")
+
+
+# Modelo para la tabla 'movimientos_inventario' - Historial (solo inserciones) de cada cambio de stock
+# Se escribe desde InventarioService en la misma transacción que modifica cantidad_stock.
+class MovimientoInventario(db.Model):
+    __tablename__ = "movimientos_inventario"
+    __table_args__ = (
+        db.Index("ix_movimientos_inventario_producto_fecha", "id_producto", "fecha"),
+    )
+    id_movimiento = db.Column(db.Integer, primary_key=True)
+    id_producto = db.Column(db.Integer, db.ForeignKey("productos.id_producto", ondelete="CASCADE"), nullable=False)
+    cantidad = db.Column(db.Integer, nullable=False)  # Delta: positivo entra, negativo sale
+    stock_resultante = db.Column(db.Integer, nullable=False)
+    motivo = db.Column(db.String(20), nullable=False)  # Ver MOTIVOS_MOVIMIENTO
+    id_orden = db.Column(db.Integer, db.ForeignKey("ordenes.id_orden", ondelete="SET NULL"), index=True)
+    id_usuario = db.Column(db.Integer, db.ForeignKey("usuarios.id_usuarios", ondelete="SET NULL"))
+    fecha = db.Column(db.DateTime, nullable=False, default=utc_now)
+
     def to_dict(self):
         return {
-            "id": self.id_inventario,
+            "id": self.id_movimiento,
             "id_producto": self.id_producto,
-            "stock": self.cantidad_stock,  # Frontend expects 'stock'
-            "cantidad": self.cantidad_stock,  # Keep for backwards compatibility
-            "ubicacion": self.ubicacion or "",
-            "stock_minimo": self.stock_minimo,
-            "alerta_stock": self.cantidad_stock <= self.stock_minimo,  # Computed field
-            "fecha_actualizacion": self.utlima_actualizacion.isoformat() if self.utlima_actualizacion else None
+            "cantidad": self.cantidad,
+            "stock_resultante": self.stock_resultante,
+            "motivo": self.motivo,
+            "id_orden": self.id_orden,
+            "id_usuario": self.id_usuario,
+            "fecha": self.fecha.isoformat() if self.fecha else None
         }
 
 
+# Modelo para la tabla 'snapshots_stock' - Foto periódica del stock de cada producto
+# "Stock a la fecha X" = último snapshot anterior a X + movimientos desde ese snapshot.
+class SnapshotStock(db.Model):
+    __tablename__ = "snapshots_stock"
+    __table_args__ = (
+        db.UniqueConstraint("id_producto", "fecha", name="uq_snapshots_stock_producto_fecha"),
+    )
+    id_snapshot = db.Column(db.Integer, primary_key=True)
+    id_producto = db.Column(db.Integer, db.ForeignKey("productos.id_producto", ondelete="CASCADE"), nullable=False)
+    cantidad_stock = db.Column(db.Integer, nullable=False)
+    fecha = db.Column(db.DateTime, nullable=False, index=True)
+
+
 # ==========================================
 # 5. GESTIÓN DE CLIENTES
 # ==========================================
@@ -228,20 +345,20 @@ class Cliente(db.Model):
     fecha_registro = db.Column(db.DateTime, default=utc_now)
     ordenes = db.relationship("Orden", backref="cliente", lazy=True)  # Un cliente tiene muchas órdenes
     
-    def to_dict(self):
-        return {
-            "id": self.id_cliente,
-            "nombre": self.nombre_cliente,
-            "apellido": self.apellido_cliente,
-            "dni_cuit": self.dni_cuit,
-            "email": self.email_cliente,
-            "telefono": self.telefono,
-            "direccion": self.direccion_cliente,
-            "ciudad": self.ciudad_cliente,
-            "codigo_postal": self.codigo_postal,
-            "provincia": self.provincia_cliente,
-            "fecha_registro": self.fecha_registro.isoformat() if self.fecha_registro else None
-        }
+    def to_dict(self, fields=None):
+        return serializar_campos({
+            "id": lambda: self.id_cliente,
+            "nombre": lambda: self.nombre_cliente,
+            "apellido": lambda: self.apellido_cliente,
+            "dni_cuit": lambda: self.dni_cuit,
+            "email": lambda: self.email_cliente,
+            "telefono": lambda: self.telefono,
+            "direccion": lambda: self.direccion_cliente,
+            "ciudad": lambda: self.ciudad_cliente,
+            "codigo_postal": lambda: self.codigo_postal,
+            "provincia": lambda: self.provincia_cliente,
+            "fecha_registro": lambda: self.fecha_registro.isoformat() if self.fecha_registro else None
+        }, fields)
 
 
 # ==========================================
@@ -260,17 +377,17 @@ class Orden(db.Model):
     detalles = db.relationship("DetalleOrden", backref="orden", lazy=True, cascade="all, delete-orphan")  # Una orden tiene muchos detalles
     pagos = db.relationship("Pago", backref="orden", lazy=True, cascade="all, delete-orphan")  # Una orden tiene muchos pagos
     
-    def to_dict(self):
-        return {
-            "id": self.id_orden,
-            "cliente": self.cliente.to_dict() if self.cliente else None,
-            "vendedor": self.vendedor.to_dict() if self.vendedor else None,
-            "fecha_orden": self.fecha_creacion.isoformat() if self.fecha_creacion else None,
-            "estado": self.estado,
-            "total": float(self.monto_total),
-            "detalles": [detalle.to_dict() for detalle in self.detalles] if self.detalles else [],
-            "pagos": [pago.to_dict() for pago in self.pagos] if self.pagos else []
-        }
+    def to_dict(self, fields=None):
+        return serializar_campos({
+            "id": lambda: self.id_orden,
+            "cliente": lambda: self.cliente.to_dict() if self.cliente else None,
+            "vendedor": lambda: self.vendedor.to_dict() if self.vendedor else None,
+            "fecha_orden": lambda: self.fecha_creacion.isoformat() if self.fecha_creacion else None,
+            "estado": lambda: self.estado,
+            "total": lambda: float(self.monto_total),
+            "detalles": lambda: [detalle.to_dict() for detalle in self.detalles] if self.detalles else [],
+            "pagos": lambda: [pago.to_dict() for pago in self.pagos] if self.pagos else []
+        }, fields)
 
 
 # Modelo para la tabla 'detalles_orden' - Define los productos incluidos en cada orden
@@ -309,17 +426,17 @@ class Pago(db.Model):
     monto_cobrado_mp = db.Column(db.Numeric(10, 2))  # Monto cobrado por MercadoPago
     fecha_pago = db.Column(db.DateTime, default=utc_now)
     
-    def to_dict(self):
-        return {
-            "id": self.id_pago,
-            "id_orden": self.id_orden,
-            "mp_preference_id": self.mp_preference_id,
-            "mp_payment_id": self.mp_payment_id,
-            "mp_estado": self.mp_estado,
-            "mp_tipo_pago": self.mp_tipo_pago,
-            "monto_cobrado": float(self.monto_cobrado_mp) if self.monto_cobrado_mp else None,
-            "fecha_pago": self.fecha_pago.isoformat() if self.fecha_pago else None
-        }
+    def to_dict(self, fields=None):
+        return serializar_campos({
+            "id": lambda: self.id_pago,
+            "id_orden": lambda: self.id_orden,
+            "mp_preference_id": lambda: self.mp_preference_id,
+            "mp_payment_id": lambda: self.mp_payment_id,
+            "mp_estado": lambda: self.mp_estado,
+            "mp_tipo_pago": lambda: self.mp_tipo_pago,
+            "monto_cobrado": lambda: float(self.monto_cobrado_mp) if self.monto_cobrado_mp else None,
+            "fecha_pago": lambda: self.fecha_pago.isoformat() if self.fecha_pago else None
+        }, fields)
 
 
 ######################################
@@ -371,4 +488,226 @@ class Favorito(db.Model):
             "producto": self.producto.to_dict() if self.producto else None
         }
 
+
+# ===========================================
+# 9. OPCIONES DE CARGA PARA SERIALIZACIÓN
+# ===========================================
+# Todas las relaciones son lazy=True, así que serializar una lista de N productos
+# con .to_dict() dispara ~3N+1 consultas (imágenes, categoría e inventario por fila).
+# Estas funciones devuelven las opciones de carga que precargan exactamente lo que
+# cada .to_dict() recorre, en una cantidad constante de consultas:
+#   - selectinload para colecciones (un SELECT ... WHERE id IN (...) por relación)
+#   - joinedload para relaciones muchos-a-uno / uno-a-uno (LEFT JOIN en la misma consulta)
+#
+# Uso:
+#   Producto.query.options(*opciones_carga_producto()).all()
+
+def opciones_carga_producto():
+    """Opciones para serializar Producto.to_dict() sin consultas extra por fila."""
+    # Las relaciones definidas con backref recién existen tras configurar los mappers.
+    # Imagen principal y stock salen de columnas de productos (no hace falta el inventario).
+    configure_mappers()
+    return (
+        selectinload(Producto.imagenes),
+        joinedload(Producto.categoria),
+    )
+
+
+def opciones_carga_detalle():
+    """Opciones para serializar DetalleOrden.to_dict() (incluye el producto completo)."""
+    return (
+        selectinload(DetalleOrden.producto).options(*opciones_carga_producto()),
+    )
+
+
+def opciones_carga_orden():
+    """Opciones para serializar Orden.to_dict() (cliente, vendedor, detalles y pagos)."""
+    configure_mappers()
+    return (
+        joinedload(Orden.cliente),
+        joinedload(Orden.vendedor).joinedload(Usuario.rol),
+        selectinload(Orden.detalles).options(*opciones_carga_detalle()),
+        selectinload(Orden.pagos),
+    )
+
+
+def opciones_carga_favorito():
+    """Opciones para serializar Favorito.to_dict() (incluye el producto completo)."""
+    return (
+        selectinload(Favorito.producto).options(*opciones_carga_producto()),
+    )
+
+
+# ===========================================
+# 10. CAMPOS PARCIALES (?fields=)
+# ===========================================
+# Para cada clave de .to_dict(): columnas que necesita y relaciones a precargar.
+# `opciones_campos` arma con esto un load_only (SELECT solo de esas columnas) y
+# carga únicamente las relaciones que los campos pedidos recorren.
+#
+# Uso:
+#   fields = {"id", "nombre", "precio"}
+#   Producto.query.options(*opciones_campos(Producto, fields)).all()
+#   [p.to_dict(fields) for p in productos]
+
+@lru_cache(maxsize=None)
+def _campos_sql():
+    """Mapa modelo -> {clave de to_dict: (columnas, funciones que devuelven opciones de carga)}."""
+    configure_mappers()
+    return {
+        Producto: {
+            "id": (("id_producto",), ()),
+            "sku": (("sku",), ()),
+            "nombre": (("nombre",), ()),
+            "descripcion": (("descripcion",), ()),
+            "precio": (("precio",), ()),
+            "medidas": (("alto_cm", "ancho_cm", "profundidad_cm"), ()),
+            "material": (("material",), ()),
+            "categoria": (("id_categoria",), (lambda: joinedload(Producto.categoria),)),
+            "id_categoria": (("id_categoria",), ()),
+            "activo": (("activo",), ()),
+            "fecha_creacion": (("fecha_creacion",), ()),
+            "fecha_actualizacion": (("fecha_actualizacion",), ()),
+            "fecha_eliminacion": (("fecha_eliminacion",), ()),
+            "imagen_principal": (("imagen_principal_url",), ()),
+            "imagenes": ((), (lambda: selectinload(Producto.imagenes),)),
+            "stock": (("stock_actual",), ()),
+            "en_stock": (("en_stock",), ()),
+        },
+        Inventario: {
+            "id": (("id_inventario",), ()),
+            "id_producto": (("id_producto",), ()),
+            "stock": (("cantidad_stock",), ()),
+            "cantidad": (("cantidad_stock",), ()),
+            "ubicacion": (("ubicacion",), ()),
+            "stock_minimo": (("stock_minimo",), ()),
+            "alerta_stock": (("cantidad_stock", "stock_minimo"), ()),
+            "fecha_actualizacion": (("utlima_actualizacion",), ()),
+        },
+        Cliente: {
+            "id": (("id_cliente",), ()),
+            "nombre": (("nombre_cliente",), ()),
+            "apellido": (("apellido_cliente",), ()),
+            "dni_cuit": (("dni_cuit",), ()),
+            "email": (("email_cliente",), ()),
+            "telefono": (("telefono",), ()),
+            "direccion": (("direccion_cliente",), ()),
+            "ciudad": (("ciudad_cliente",), ()),
+            "codigo_postal": (("codigo_postal",), ()),
+            "provincia": (("provincia_cliente",), ()),
+            "fecha_registro": (("fecha_registro",), ()),
+        },
+        Orden: {
+            "id": (("id_orden",), ()),
+            "cliente": (("id_cliente",), (lambda: joinedload(Orden.cliente),)),
+            "vendedor": (
+                ("id_usuarios",),
+                (lambda: joinedload(Orden.vendedor).joinedload(Usuario.rol),)
+            ),
+            "fecha_orden": (("fecha_creacion",), ()),
+            "estado": (("estado",), ()),
+            "total": (("monto_total",), ()),
+            "detalles": ((), (lambda: selectinload(Orden.detalles).options(*opciones_carga_detalle()),)),
+            "pagos": ((), (lambda: selectinload(Orden.pagos),)),
+        },
+        Pago: {
+            "id": (("id_pago",), ()),
+            "id_orden": (("id_orden",), ()),
+            "mp_preference_id": (("mp_preference_id",), ()),
+            "mp_payment_id": (("mp_payment_id",), ()),
+            "mp_estado": (("mp_estado",), ()),
+            "mp_tipo_pago": (("mp_tipo_pago",), ()),
+            "monto_cobrado": (("monto_cobrado_mp",), ()),
+            "fecha_pago": (("fecha_pago",), ()),
+        },
+    }
+
+
+def campos_disponibles(modelo):
+    """Claves de .to_dict() que acepta ?fields= para un modelo."""
+    return tuple(_campos_sql()[modelo])
+
+
+def opciones_campos(modelo, fields, columnas_extra=()):
+    """
+    Opciones de carga para serializar solo `fields` de un modelo: load_only con las
+    columnas necesarias (más `columnas_extra`, p. ej. las de ordenamiento) y solo las
+    relaciones que esos campos recorren.
+    """
+    especificacion = _campos_sql()[modelo]
+    columnas = [columna.name for columna in modelo.__mapper__.primary_key] + list(columnas_extra)
+    cargas = []
+    for campo in fields:
+        columnas_campo, cargas_campo = especificacion[campo]
+        columnas.extend(columnas_campo)
+        for carga in cargas_campo:
+            if carga not in cargas:
+                cargas.append(carga)
+    atributos = [getattr(modelo, c) for c in dict.fromkeys(columnas)]
+    return (load_only(*atributos), *(carga() for carga in cargas))
+
+
+# ===========================================
+# 11. RESUMEN DESNORMALIZADO DE PRODUCTOS
+# ===========================================
+# productos.imagen_principal_url / stock_actual / en_stock copian datos de
+# imagenes_productos e inventario para que un listado de tarjetas se sirva solo
+# con la tabla productos. Todo código que agregue/borre imágenes, cambie la imagen
+# principal o modifique cantidad_stock debe llamar, antes del commit, a:
+#
+#   sincronizar_resumen_productos([id_producto, ...])
+
+# Vista de tarjeta del catálogo: solo columnas de productos (sin joins ni relaciones)
+CAMPOS_TARJETA_PRODUCTO = frozenset({
+    "id", "sku", "nombre", "precio", "material", "id_categoria",
+    "imagen_principal", "stock", "en_stock",
+})
+
+
+def sincronizar_resumen_productos(producto_ids):
+    """
+    Recalcular las columnas desnormalizadas de los productos indicados con un único
+    UPDATE (subconsultas correlacionadas). Se ejecuta en la transacción en curso;
+    el commit queda a cargo de quien llama.
+    """
+    ids = sorted({i for i in producto_ids if i is not None})
+    if not ids:
+        return
+    imagen_principal = select(ImagenProducto.url_imagen).where(
+        ImagenProducto.id_producto == Producto.id_producto
+    ).order_by(
+        # imagen_principal admite NULL (y PostgreSQL ordena los NULL primero en DESC)
+        func.coalesce(ImagenProducto.imagen_principal, False).desc(), ImagenProducto.id_imagen
+    ).limit(1).scalar_subquery()
+    stock = func.coalesce(
+        select(Inventario.cantidad_stock).where(
+            Inventario.id_producto == Producto.id_producto
+        ).scalar_subquery(),
+        0
+    )
+    db.session.execute(
+        update(Producto)
+        .where(Producto.id_producto.in_(ids))
+        .values(imagen_principal_url=imagen_principal, stock_actual=stock, en_stock=stock > 0)
+        .execution_options(synchronize_session="fetch")
+    )
+
+
+def marcar_categorias_modificadas(categoria_ids):
+    """
+    Actualizar fecha_actualizacion de las categorías indicadas cuando cambia su lista de
+    productos sin que quede ninguna fila de productos con una fecha nueva (eliminación
+    permanente, producto que se muda de categoría). Las versiones para ETags usan esa
+    fecha en lugar de contar productos. Se ejecuta en la transacción en curso.
+    """
+    ids = sorted({i for i in categoria_ids if i is not None})
+    if not ids:
+        return
+    db.session.execute(
+        update(Categoria)
+        .where(Categoria.id_categoria.in_(ids))
+        .values(fecha_actualizacion=utc_now())
+        .execution_options(synchronize_session=False)
+    )
+
 # --- Fin de models.py ---
\ No newline at end of file
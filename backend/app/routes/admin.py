@@ -538,6 +538,25 @@ def get_current_user():
     }), 200
 
 
+# ==============================================================================
+#                              DIAGNÓSTICO
+# ==============================================================================
+
+@admin_bp.route('/compresion', methods=['GET'])
+def get_compresion_stats():
+    """Estadísticas de compresión de respuestas por endpoint (ratio y tiempo de CPU)"""
+    from ..utils.compression import estadisticas_compresion
+    return jsonify(estadisticas_compresion.stats()), 200
+
+
+@admin_bp.route('/compresion', methods=['DELETE'])
+def reset_compresion_stats():
+    """Reiniciar las estadísticas de compresión de este proceso"""
+    from ..utils.compression import estadisticas_compresion
+    estadisticas_compresion.reset()
+    return jsonify({"mensaje": "Estadísticas de compresión reiniciadas"}), 200
+
+
 # ==============================================================================
 #                              REPORTES ADMIN
 # ==============================================================================
@@ -600,7 +619,7 @@ def dashboard_metricas():
     """
     try:
         from sqlalchemy import func
-        from ..models import Orden, DetalleOrden, Producto, Categoria, Inventario
+        from ..models import ALERTA_STOCK, Orden, DetalleOrden, Producto, Categoria, Inventario
         from datetime import timedelta
         
         # Obtener período de consulta
@@ -639,7 +658,7 @@ def dashboard_metricas():
         ).join(
             Categoria, Producto.id_categoria == Categoria.id_categoria
         ).filter(
-            Inventario.cantidad_stock <= Inventario.stock_minimo
+            ALERTA_STOCK  # Usa el índice parcial ix_inventario_alerta_stock
         ).order_by(
             Inventario.cantidad_stock.asc()
         ).limit(10).all()
@@ -8,16 +8,38 @@ Refactorizado para usar:
 - Type hints completos
 """
 from __future__ import annotations
-import os
-import uuid
+import mimetypes
 from typing import TYPE_CHECKING
+from urllib.parse import quote
 
-from flask import Blueprint, request, current_app, send_from_directory
-from werkzeug.utils import secure_filename
+from flask import Blueprint, jsonify, request, current_app, send_from_directory, stream_with_context
+from werkzeug.security import safe_join
 
 from .. import db
-from ..models import Producto, ImagenProducto
-from ..services import ProductoService, ProductoServiceError, CategoriaService, CategoriaServiceError
+from ..cache import (
+    TAG_CATEGORIAS, TAG_PRODUCTOS, catalog_cache, cached_json_response, cached_value,
+    invalidar_producto, request_cache_key, tag_categoria, tag_producto,
+)
+from ..models import (
+    CAMPOS_TARJETA_PRODUCTO, Producto, ImagenProducto,
+    campos_disponibles, marcar_categorias_modificadas, sincronizar_resumen_productos, utc_now,
+)
+from ..services import (
+    ProductoService, ProductoServiceError,
+    CategoriaService, CategoriaServiceError,
+    BusquedaService, BusquedaServiceError,
+    ImagenService, ImagenServiceError,
+    ImportacionService, ImportacionServiceError,
+    ExportacionService, ExportacionServiceError,
+    PrecioService, PrecioServiceError,
+    PapeleraService, PapeleraServiceError,
+    RecomendacionService, RecomendacionServiceError,
+    SnapshotService, SnapshotServiceError,
+)
+from ..services.importacion_service import TAMANO_LOTE_DEFAULT
+from ..services.recomendacion_service import TOP_K_DEFAULT
+from ..utils.fields import parse_fields
+from ..utils.http_cache import apply_cache_headers, etag_matches, make_etag, not_modified_response
 from ..utils.responses import success_response, error_response, list_response
 
 if TYPE_CHECKING:
@@ -25,6 +47,9 @@ if TYPE_CHECKING:
 
 catalogo_bp = Blueprint('catalogo', __name__, url_prefix='/api')
 
+# Un año: los archivos direccionados por contenido nunca cambian de contenido
+UPLOADS_IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
 
 # ==============================================================================
 #                              HELPER FUNCTIONS
@@ -47,17 +72,28 @@ def get_upload_folder() -> str | None:
     return current_app.config.get('UPLOAD_FOLDER')
 
 
-def generate_unique_filename(original_filename: str, prefix: str = "") -> str:
-    """Generate a unique filename preserving the extension."""
-    if not original_filename:
-        return f"{prefix}{uuid.uuid4().hex}.jpg"
+def parse_catalog_filters() -> dict:
+    """Leer de los query params los filtros de catálogo que entiende ProductoService."""
+    filtros: dict = {}
+    for nombre in ('precio', 'alto', 'ancho', 'profundidad'):
+        for sufijo in ('min', 'max'):
+            valor = request.args.get(f'{nombre}_{sufijo}', type=float)
+            if valor is not None:
+                filtros[f'{nombre}_{sufijo}'] = valor
     
-    safe_filename = secure_filename(original_filename)
-    extension = safe_filename.rsplit('.', 1)[1].lower() if '.' in safe_filename else 'jpg'
+    materiales = [
+        material.strip()
+        for valor in request.args.getlist('material')
+        for material in valor.split(',')
+        if material.strip()
+    ]
+    if materiales:
+        filtros['materiales'] = materiales
     
-    if prefix:
-        return f"{prefix}{uuid.uuid4().hex}.{extension}"
-    return f"{uuid.uuid4().hex}.{extension}"
+    en_stock = request.args.get('en_stock')
+    if en_stock is not None:
+        filtros['en_stock'] = en_stock.lower() == 'true'
+    return filtros
 
 
 # ==============================================================================
@@ -71,11 +107,31 @@ def get_categorias() -> tuple[Response, int]:
     
     Query params:
         incluir_inactivas (bool): Si true, incluye categorías inactivas
+        estadisticas (bool): Si true, incluye por categoría cantidad de productos activos,
+            cantidad con stock y precio mínimo/máximo/promedio
+    
+    Soporta If-None-Match: responde 304 si el cliente ya tiene la versión actual.
     """
     try:
         incluir_inactivas = request.args.get('incluir_inactivas', 'false').lower() == 'true'
-        categorias = CategoriaService.listar_categorias(incluir_inactivas=incluir_inactivas)
-        return list_response(categorias)
+        estadisticas = request.args.get('estadisticas', 'false').lower() == 'true'
+        
+        # Con estadísticas la respuesta depende también de productos y stock
+        version = CategoriaService.version_categorias()
+        tags = [TAG_CATEGORIAS]
+        if estadisticas:
+            version += ProductoService.version_catalogo()
+            tags.append(TAG_PRODUCTOS)
+        
+        response = cached_json_response(
+            tags,
+            lambda: CategoriaService.listar_categorias(
+                incluir_inactivas=incluir_inactivas,
+                incluir_estadisticas=estadisticas
+            ),
+            etag=make_etag(*version, request_cache_key())
+        )
+        return response, response.status_code
     except Exception as e:
         return error_response("Error al obtener categorías", str(e), 500)
 
@@ -152,21 +208,104 @@ def get_productos() -> tuple[Response, int]:
     Query params:
         categoria_id (int): Filtrar por categoría
         activo (bool): Filtrar por estado activo
+        limit (int): Activa la paginación por cursor con páginas de este tamaño
+        cursor (str): Cursor opaco devuelto en `next_cursor` por la página anterior
+        orden (str): id | precio | fecha_creacion, con prefijo "-" para descendente
+        precio_min, precio_max (float): Rango de precio
+        alto_min, alto_max, ancho_min, ancho_max, profundidad_min, profundidad_max (float):
+            Rangos de medidas en cm
+        material (str): Uno o más materiales (repetido o separado por comas)
+        en_stock (bool): Solo productos con stock (true) o sin stock (false)
+        facetas (bool): Incluir conteos por material, categoría y rango de precio
+        fields (str): Claves a devolver por producto, separadas por coma (p. ej. id,nombre,precio);
+            también reduce las columnas y relaciones consultadas
+        vista (str): tarjeta = campos de una tarjeta del catálogo (id, sku, nombre, precio,
+            material, id_categoria, imagen_principal, stock, en_stock), leídos solo de la
+            tabla productos; la lista completa de imágenes queda para el detalle
+    
+    Sin `limit` ni `cursor` (ni `facetas`) se devuelve la lista completa (comportamiento original).
+    Soporta If-None-Match: responde 304 si el cliente ya tiene la versión actual.
     """
     try:
         categoria_id = request.args.get('categoria_id', type=int)
         activo_param = request.args.get('activo')
         activo = activo_param.lower() == 'true' if activo_param is not None else None
+        filtros = parse_catalog_filters()
+        incluir_facetas = request.args.get('facetas', 'false').lower() == 'true'
+        try:
+            fields = parse_fields(campos_disponibles(Producto))
+        except ValueError as e:
+            return error_response(str(e))
+        vista = request.args.get('vista')
+        if vista is not None:
+            if vista != 'tarjeta':
+                return error_response("Vista inválida. Debe ser: tarjeta")
+            if fields is None:
+                fields = set(CAMPOS_TARJETA_PRODUCTO)
         
-        productos = ProductoService.listar_productos(
-            categoria_id=categoria_id,
-            activo=activo
-        )
-        return list_response(productos)
+        def construir():
+            if 'limit' in request.args or 'cursor' in request.args:
+                limit = request.args.get('limit', 50, type=int)
+                resultado = ProductoService.listar_productos_cursor(
+                    limit=limit,
+                    cursor=request.args.get('cursor'),
+                    orden=request.args.get('orden', 'id'),
+                    categoria_id=categoria_id,
+                    activo=activo,
+                    filtros=filtros,
+                    fields=fields
+                )
+            else:
+                productos = ProductoService.listar_productos(
+                    categoria_id=categoria_id,
+                    activo=activo,
+                    filtros=filtros,
+                    fields=fields
+                )
+                if not incluir_facetas:
+                    return productos
+                resultado = {"items": productos}
+            
+            if incluir_facetas:
+                resultado["facetas"] = ProductoService.calcular_facetas(
+                    categoria_id=categoria_id,
+                    activo=activo,
+                    filtros=filtros
+                )
+            return resultado
+        
+        etag = make_etag(*ProductoService.version_catalogo(), request_cache_key())
+        response = cached_json_response([TAG_PRODUCTOS], construir, etag=etag)
+        return response, response.status_code
+    except ProductoServiceError as e:
+        return error_response(e.message, status_code=e.status_code)
     except Exception as e:
         return error_response("Error al obtener productos", str(e), 500)
 
 
+@catalogo_bp.route('/productos/buscar', methods=['GET'])
+def buscar_productos() -> tuple[Response, int]:
+    """
+    Buscar productos por texto, ordenados por relevancia.
+    
+    Query params:
+        q (str): Texto a buscar (nombre, descripción, material, SKU, categoría)
+        page (int): Página (default 1)
+        per_page (int): Resultados por página (default 20, máximo 50)
+    """
+    try:
+        resultado = BusquedaService.buscar_productos(
+            request.args.get('q', ''),
+            page=request.args.get('page', 1, type=int),
+            per_page=request.args.get('per_page', 20, type=int)
+        )
+        return jsonify(resultado), 200
+    except BusquedaServiceError as e:
+        return error_response(e.message, status_code=e.status_code)
+    except Exception as e:
+        return error_response("Error al buscar productos", str(e), 500)
+
+
 @catalogo_bp.route('/productos', methods=['POST'])
 def create_producto() -> tuple[Response, int]:
     """
@@ -197,18 +336,242 @@ def create_producto() -> tuple[Response, int]:
         return error_response("Error al crear producto", str(e), 500)
 
 
+@catalogo_bp.route('/productos/import', methods=['POST'])
+def import_productos() -> tuple[Response, int]:
+    """
+    Importación masiva de productos desde CSV o NDJSON.
+
+    El archivo puede venir como multipart (campo `file`) o directamente en el cuerpo
+    (Content-Type text/csv o application/x-ndjson). Se procesa en streaming y por lotes.
+
+    Query params:
+        formato (str): csv | ndjson (por defecto se deduce del Content-Type o del nombre)
+        modo (str): upsert (por defecto, actualiza SKUs existentes) | insert
+        lote (int): Filas por lote (por defecto 1000)
+
+    Columnas: sku, nombre, precio, material, id_categoria o categoria,
+              descripcion, alto_cm, ancho_cm, profundidad_cm
+    """
+    try:
+        archivo = request.files.get('file')
+        if archivo is not None:
+            stream, nombre, content_type = archivo.stream, archivo.filename or '', archivo.mimetype
+        else:
+            stream, nombre, content_type = request.stream, '', request.mimetype
+
+        formato = request.args.get('formato')
+        if not formato:
+            es_ndjson = nombre.lower().endswith(('.ndjson', '.jsonl')) or content_type in (
+                'application/x-ndjson', 'application/ndjson', 'application/jsonl'
+            )
+            formato = 'ndjson' if es_ndjson else 'csv'
+
+        resumen = ImportacionService.importar_productos(
+            stream,
+            formato=formato,
+            modo=request.args.get('modo', 'upsert'),
+            tamano_lote=request.args.get('lote', TAMANO_LOTE_DEFAULT, type=int)
+        )
+        return jsonify(resumen), 200
+    except ImportacionServiceError as e:
+        return error_response(e.message, status_code=e.status_code)
+    except Exception as e:
+        return error_response("Error al importar productos", str(e), 500)
+
+
+@catalogo_bp.route('/productos/precios/bulk', methods=['POST'])
+def bulk_update_precios() -> tuple[Response, int]:
+    """
+    Reajuste masivo de precios en una sola transacción (UPDATE set-based).
+
+    Body JSON (uno de los dos):
+        items (list): [{"id": 1, "precio": 125000}, ...]
+        regla (dict): {"tipo": "porcentaje" | "monto", "valor": 12.5,
+                       "categoria_id": 3, "materiales": ["roble"],
+                       "precio_min": 50000, "precio_max": 200000, "activo": true}
+
+    Opcionales:
+        redondeo (dict): {"paso": 100, "modo": "cercano" | "arriba" | "abajo"}
+        dry_run (bool): Devolver la vista previa sin modificar precios
+    """
+    try:
+        resultado = PrecioService.actualizar_precios(request.get_json(silent=True))
+        return jsonify(resultado), 200
+    except PrecioServiceError as e:
+        return error_response(e.message, status_code=e.status_code)
+    except Exception as e:
+        db.session.rollback()
+        return error_response("Error al actualizar precios", str(e), 500)
+
+
+@catalogo_bp.route('/productos/export', methods=['GET'])
+def export_productos() -> tuple[Response, int]:
+    """
+    Exportar el catálogo completo en streaming (respuesta chunked).
+
+    Cada fila incluye el nombre de la categoría, el stock y la imagen principal.
+    Las filas salen ordenadas por id, así una descarga cortada se retoma con `desde_id`.
+
+    Query params:
+        format (str): csv (por defecto) | ndjson
+        desde_id (int): Exportar solo productos con id mayor a este
+        categoria_id (int): Filtrar por categoría
+        activo (bool): Filtrar por estado activo
+    """
+    try:
+        formato = request.args.get('format', request.args.get('formato', 'csv')).lower()
+        activo = request.args.get('activo')
+        bloques = ExportacionService.exportar_productos(
+            formato=formato,
+            desde_id=request.args.get('desde_id', 0, type=int),
+            categoria_id=request.args.get('categoria_id', type=int),
+            activo=activo.lower() == 'true' if activo is not None else None
+        )
+        mimetype = 'text/csv' if formato == 'csv' else 'application/x-ndjson'
+        response = current_app.response_class(stream_with_context(bloques), mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename=productos.{formato}'
+        return response, 200
+    except ExportacionServiceError as e:
+        return error_response(e.message, status_code=e.status_code)
+    except Exception as e:
+        return error_response("Error al exportar productos", str(e), 500)
+
+
 @catalogo_bp.route('/productos/<int:id>', methods=['GET'])
 def get_producto(id: int) -> tuple[Response, int]:
-    """Obtener un producto por ID."""
+    """
+    Obtener un producto por ID.
+    
+    Soporta If-None-Match: responde 304 si el cliente ya tiene la versión actual.
+    """
     try:
-        producto = ProductoService.obtener_producto(id)
-        return list_response([producto])[0], 200
+        version = ProductoService.version_producto(id)
+        if version is None:
+            return error_response("Producto no encontrado", status_code=404)
+        
+        response = cached_json_response(
+            lambda producto: [tag_producto(id), tag_categoria(producto["id_categoria"])],
+            lambda: ProductoService.obtener_producto(id),
+            etag=make_etag(*version, request_cache_key())
+        )
+        return response, response.status_code
     except ProductoServiceError as e:
         return error_response(e.message, status_code=e.status_code)
     except Exception as e:
         return error_response("Error al obtener producto", str(e), 500)
 
 
+@catalogo_bp.route('/productos/<int:id>/pagina', methods=['GET'])
+def get_pagina_producto(id: int) -> tuple[Response, int]:
+    """
+    Todo lo que necesita la página de un producto en un solo request: producto con
+    imágenes y stock, y productos relacionados de la misma categoría.
+    
+    La parte compartida se cachea por producto (caché del servidor + ETag/304). Con
+    `id_cliente` se agrega "cliente" (favorito o no) y la respuesta pasa a ser privada;
+    esa parte también se puede pedir sola en /productos/<id>/pagina/cliente/<id_cliente>.
+    
+    Query params:
+        id_cliente (int): Cliente actual (opcional)
+    """
+    try:
+        # Los relacionados son de la misma categoría: la versión cubre el producto y su categoría
+        version = ProductoService.version_pagina_producto(id)
+        if version is None:
+            return error_response("Producto no encontrado", status_code=404)
+        etag = make_etag(*version, 'pagina', id)
+        id_cliente = request.args.get('id_cliente', type=int)
+        if id_cliente is None and etag_matches(etag):
+            return not_modified_response(etag), 304
+        
+        pagina = cached_value(
+            f"valor:pagina_producto:{id}#{etag}",
+            [TAG_PRODUCTOS, tag_producto(id)],
+            lambda: ProductoService.pagina_producto(id)
+        )
+        if id_cliente is None:
+            return apply_cache_headers(jsonify(pagina), etag), 200
+        
+        pagina["cliente"] = ProductoService.estado_cliente(id, id_cliente)
+        response = jsonify(pagina)
+        response.headers['Cache-Control'] = 'private, no-store'
+        return response, 200
+    except ProductoServiceError as e:
+        return error_response(e.message, status_code=e.status_code)
+    except Exception as e:
+        return error_response("Error al obtener la página del producto", str(e), 500)
+
+
+@catalogo_bp.route('/productos/<int:id>/pagina/cliente/<int:id_cliente>', methods=['GET'])
+def get_pagina_producto_cliente(id: int, id_cliente: int) -> tuple[Response, int]:
+    """Parte de la página de un producto que depende del cliente (favorito), sin caché."""
+    try:
+        response = jsonify(ProductoService.estado_cliente(id, id_cliente))
+        response.headers['Cache-Control'] = 'private, no-store'
+        return response, 200
+    except Exception as e:
+        return error_response("Error al obtener el estado del cliente", str(e), 500)
+
+
+@catalogo_bp.route('/productos/<int:id>/recomendados', methods=['GET'])
+def get_recomendados(id: int) -> tuple[Response, int]:
+    """
+    Productos comprados frecuentemente junto con este (índice en memoria).
+    
+    Query params:
+        k (int): Cantidad de recomendaciones (1..20, por defecto 6)
+        productos (bool): Agregar los datos de tarjeta de cada producto (una consulta extra)
+    """
+    try:
+        recomendaciones = RecomendacionService.recomendados(id, k=request.args.get('k', TOP_K_DEFAULT, type=int))
+        if request.args.get('productos', 'false').lower() == 'true':
+            recomendaciones = RecomendacionService.con_productos(recomendaciones)
+        return jsonify({"id_producto": id, "recomendados": recomendaciones}), 200
+    except RecomendacionServiceError as e:
+        return error_response(e.message, status_code=e.status_code)
+    except Exception as e:
+        return error_response("Error al obtener recomendaciones", str(e), 500)
+
+
+@catalogo_bp.route('/productos/recomendados', methods=['GET'])
+def get_recomendados_carrito() -> tuple[Response, int]:
+    """
+    Recomendaciones para un carrito: productos comprados junto con cualquiera de los dados.
+    
+    Query params:
+        ids (str): IDs de los productos del carrito, separados por coma
+        k (int): Cantidad de recomendaciones (1..20, por defecto 6)
+        productos (bool): Agregar los datos de tarjeta de cada producto
+    """
+    try:
+        try:
+            ids = [int(i) for i in request.args.get('ids', '').split(',') if i.strip()]
+        except ValueError:
+            return error_response("ids debe ser una lista de enteros separados por coma")
+        if not ids:
+            return error_response("El parámetro 'ids' es requerido")
+        
+        recomendaciones = RecomendacionService.recomendados_para(
+            ids, k=request.args.get('k', TOP_K_DEFAULT, type=int)
+        )
+        if request.args.get('productos', 'false').lower() == 'true':
+            recomendaciones = RecomendacionService.con_productos(recomendaciones)
+        return jsonify({"ids": ids, "recomendados": recomendaciones}), 200
+    except RecomendacionServiceError as e:
+        return error_response(e.message, status_code=e.status_code)
+    except Exception as e:
+        return error_response("Error al obtener recomendaciones", str(e), 500)
+
+
+@catalogo_bp.route('/productos/recomendados/reconstruir', methods=['POST'])
+def reconstruir_recomendados() -> tuple[Response, int]:
+    """Reconstruir el índice de recomendaciones de este proceso desde las órdenes."""
+    try:
+        return jsonify(RecomendacionService.reconstruir()), 200
+    except Exception as e:
+        return error_response("Error al reconstruir recomendaciones", str(e), 500)
+
+
 @catalogo_bp.route('/productos/<int:id>', methods=['PUT'])
 def update_producto(id: int) -> tuple[Response, int]:
     """Actualizar producto."""
@@ -246,16 +609,70 @@ def delete_producto(id: int) -> tuple[Response, int]:
 
 @catalogo_bp.route('/productos/papelera', methods=['GET'])
 def get_productos_papelera() -> tuple[Response, int]:
-    """Obtener todos los productos eliminados (soft-deleted)."""
+    """
+    Obtener los productos eliminados (soft-deleted), los más recientes primero.
+
+    Query params:
+        limit (int): Activa la paginación por cursor con páginas de este tamaño
+        cursor (str): Cursor opaco devuelto en `next_cursor` por la página anterior
+
+    Sin `limit` ni `cursor` se devuelve la lista completa (comportamiento original).
+    """
     try:
-        productos = Producto.query.filter_by(activo=False).order_by(
-            Producto.fecha_creacion.desc()
-        ).all()
-        return list_response([p.to_dict() for p in productos])
+        if 'limit' in request.args or 'cursor' in request.args:
+            resultado = PapeleraService.listar_cursor(
+                limit=request.args.get('limit', 50, type=int),
+                cursor=request.args.get('cursor')
+            )
+            return jsonify(resultado), 200
+        return list_response(PapeleraService.listar())
+    except PapeleraServiceError as e:
+        return error_response(e.message, status_code=e.status_code)
     except Exception as e:
         return error_response("Error al obtener productos eliminados", str(e), 500)
 
 
+@catalogo_bp.route('/productos/papelera/restaurar', methods=['POST'])
+def restaurar_productos() -> tuple[Response, int]:
+    """
+    Restaurar varios productos de la papelera en una sola transacción.
+
+    Body JSON (uno de los dos):
+        ids (list[int]): Productos a restaurar
+        dias (int): Restaurar los que están en la papelera hace más de N días
+    """
+    try:
+        resumen = PapeleraService.restaurar(request.get_json(silent=True))
+        return jsonify(resumen), 200
+    except PapeleraServiceError as e:
+        return error_response(e.message, status_code=e.status_code)
+    except Exception as e:
+        db.session.rollback()
+        return error_response("Error al restaurar productos", str(e), 500)
+
+
+@catalogo_bp.route('/productos/papelera/purgar', methods=['POST'])
+def purgar_productos() -> tuple[Response, int]:
+    """
+    Eliminar definitivamente varios productos de la papelera.
+
+    Los que tienen órdenes asociadas se conservan y se informan en `con_ordenes`.
+    Los archivos de imágenes sin otras referencias se borran en segundo plano.
+
+    Body JSON (uno de los dos):
+        ids (list[int]): Productos a eliminar
+        dias (int): Eliminar los que están en la papelera hace más de N días
+    """
+    try:
+        resumen = PapeleraService.purgar(request.get_json(silent=True))
+        return jsonify(resumen), 200
+    except PapeleraServiceError as e:
+        return error_response(e.message, status_code=e.status_code)
+    except Exception as e:
+        db.session.rollback()
+        return error_response("Error al purgar productos", str(e), 500)
+
+
 @catalogo_bp.route('/productos/<int:id>/restaurar', methods=['POST'])
 def restaurar_producto(id: int) -> tuple[Response, int]:
     """Restaurar un producto eliminado (volver a activo=True)."""
@@ -268,7 +685,9 @@ def restaurar_producto(id: int) -> tuple[Response, int]:
             return error_response("El producto ya está activo")
         
         producto.activo = True
+        producto.fecha_eliminacion = None
         db.session.commit()
+        invalidar_producto(id)
         
         return success_response("Producto restaurado exitosamente", {"producto": producto.to_dict()})
     except Exception as e:
@@ -302,8 +721,14 @@ def eliminar_producto_permanente(id: int) -> tuple[Response, int]:
                 status_code=409
             )
         
+        archivos = ImagenService.archivos_de(producto.imagenes)
+        marcar_categorias_modificadas([producto.id_categoria])
         db.session.delete(producto)
         db.session.commit()
+        invalidar_producto(id)
+        
+        # Archivos de imágenes que ya no usa ningún otro producto (en segundo plano)
+        ImagenService.encolar_limpieza(archivos)
         
         return success_response("Producto eliminado permanentemente")
     except Exception as e:
@@ -360,23 +785,75 @@ def delete_imagen(id: int) -> tuple[Response, int]:
         if not imagen:
             return error_response("Imagen no encontrada", status_code=404)
         
-        # Eliminar archivo físico si es local
-        if imagen.url_imagen and imagen.url_imagen.startswith('/api/uploads/'):
-            filename = imagen.url_imagen.split('/')[-1]
-            upload_folder = get_upload_folder()
-            if upload_folder:
-                file_path = os.path.join(upload_folder, filename)
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-        
+        producto_id = imagen.id_producto
+        archivos = ImagenService.archivos_de([imagen])
+        if imagen.producto:
+            imagen.producto.fecha_actualizacion = utc_now()
         db.session.delete(imagen)
+        sincronizar_resumen_productos([producto_id])
         db.session.commit()
+        invalidar_producto(producto_id)
+        
+        # Eliminar archivos físicos solo si ninguna otra imagen los referencia
+        ImagenService.liberar_archivos(archivos)
         return success_response("Imagen eliminada exitosamente")
     except Exception as e:
         db.session.rollback()
         return error_response("Error al eliminar imagen", str(e), 500)
 
 
+# ==============================================================================
+#                              CACHÉ DEL CATÁLOGO
+# ==============================================================================
+
+@catalogo_bp.route('/cache/catalogo', methods=['GET'])
+def get_cache_catalogo_stats() -> tuple[Response, int]:
+    """Estadísticas de la caché del catálogo (hits, misses, evictions, ocupación)."""
+    return jsonify(catalog_cache.stats()), 200
+
+
+@catalogo_bp.route('/cache/catalogo', methods=['DELETE'])
+def clear_cache_catalogo() -> tuple[Response, int]:
+    """Vaciar la caché del catálogo de este proceso."""
+    catalog_cache.clear()
+    return success_response("Caché del catálogo vaciada")
+
+
+# ==============================================================================
+#                              SNAPSHOT ESTÁTICO
+# ==============================================================================
+
+@catalogo_bp.route('/catalogo/snapshot', methods=['GET'])
+def get_catalogo_snapshot() -> tuple[Response, int]:
+    """Manifiesto del último snapshot estático generado."""
+    try:
+        manifiesto = SnapshotService.leer_manifiesto()
+        if manifiesto is None:
+            return error_response("Todavía no se generó ningún snapshot", status_code=404)
+        return jsonify(manifiesto), 200
+    except SnapshotServiceError as e:
+        return error_response(e.message, status_code=e.status_code)
+    except Exception as e:
+        return error_response("Error al leer el snapshot", str(e), 500)
+
+
+@catalogo_bp.route('/catalogo/snapshot', methods=['POST'])
+def generar_catalogo_snapshot() -> tuple[Response, int]:
+    """
+    Regenerar el snapshot estático del catálogo.
+
+    Por defecto solo reescribe los shards de las categorías que cambiaron;
+    con ?completo=true los reescribe todos.
+    """
+    try:
+        completo = request.args.get('completo', 'false').lower() == 'true'
+        return success_response("Snapshot generado", SnapshotService.generar(completo=completo))
+    except SnapshotServiceError as e:
+        return error_response(e.message, status_code=e.status_code)
+    except Exception as e:
+        return error_response("Error al generar el snapshot", str(e), 500)
+
+
 # ==============================================================================
 #                              FILE UPLOAD
 # ==============================================================================
@@ -400,35 +877,57 @@ def upload_file() -> tuple[Response, int]:
             "Tipo de archivo no permitido. Use: png, jpg, jpeg, gif, webp"
         )
     
-    upload_folder = get_upload_folder()
-    if not upload_folder:
-        return error_response("Carpeta de uploads no configurada", status_code=500)
-    
-    # Generate unique filename and save
-    unique_filename = generate_unique_filename(file.filename)
-    os.makedirs(upload_folder, exist_ok=True)
-    file_path = os.path.join(upload_folder, unique_filename)
-    
+    # Content-addressed storage: identical files share one path (ab/cd/<sha256>.<ext>)
     try:
-        file.save(file_path)
-        url = f"/api/uploads/{unique_filename}"
+        url, digest = ImagenService.guardar_upload(file)
         return success_response(
             "Archivo subido exitosamente",
-            {"url": url, "filename": unique_filename},
+            {"url": url, "filename": url.removeprefix('/api/uploads/'), "hash": digest},
             201
         )
+    except ImagenServiceError as e:
+        return error_response(e.message, status_code=e.status_code)
     except Exception as e:
         return error_response("Error al guardar archivo", str(e), 500)
 
 
-@catalogo_bp.route('/uploads/<filename>', methods=['GET'])
+@catalogo_bp.route('/uploads/<path:filename>', methods=['GET'])
 def serve_upload(filename: str) -> Response | tuple[Response, int]:
-    """Serve uploaded files."""
+    """
+    Serve uploaded files.
+    
+    - UPLOADS_ACCEL_REDIRECT_PREFIX set (nginx): only headers are returned and the proxy
+      sends the file (X-Accel-Redirect), so the worker never touches the bytes.
+    - USE_X_SENDFILE (Apache/lighttpd): same idea, handled by send_file.
+    - Otherwise send_file streams with wsgi.file_wrapper (sendfile under gunicorn),
+      supports Range requests and answers 304 via Last-Modified/ETag.
+    
+    Content-addressed names (ab/cd/<sha256>...) never change, so they are cached
+    for a year as `immutable`; other files use UPLOADS_MAX_AGE.
+    """
     upload_folder = get_upload_folder()
     if not upload_folder:
         return error_response("Carpeta de uploads no configurada", status_code=500)
     
-    return send_from_directory(upload_folder, filename)
+    inmutable = ImagenService.es_archivo_inmutable(filename)
+    max_age = UPLOADS_IMMUTABLE_MAX_AGE if inmutable else current_app.config.get('UPLOADS_MAX_AGE', 3600)
+    
+    accel_prefix = current_app.config.get('UPLOADS_ACCEL_REDIRECT_PREFIX')
+    if accel_prefix:
+        if safe_join(upload_folder, filename) is None:
+            return error_response("Archivo no encontrado", status_code=404)
+        response = current_app.response_class(
+            mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        )
+        response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{quote(filename)}"
+    else:
+        response = send_from_directory(upload_folder, filename, max_age=max_age)
+    
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    if inmutable:
+        response.cache_control.immutable = True
+    return response
 
 
 @catalogo_bp.route('/productos/<int:producto_id>/imagen', methods=['POST'])
@@ -455,18 +954,10 @@ def upload_producto_imagen(producto_id: int) -> tuple[Response, int]:
             "Tipo de archivo no permitido. Use: png, jpg, jpeg, gif, webp"
         )
     
-    upload_folder = get_upload_folder()
-    if not upload_folder:
-        return error_response("Carpeta de uploads no configurada", status_code=500)
-    
-    # Generate unique filename with product prefix
-    unique_filename = generate_unique_filename(file.filename, f"producto_{producto_id}_")
-    os.makedirs(upload_folder, exist_ok=True)
-    file_path = os.path.join(upload_folder, unique_filename)
-    
+    url = None
     try:
-        file.save(file_path)
-        url = f"/api/uploads/{unique_filename}"
+        # Content-addressed storage: re-uploading the same photo reuses the file
+        url, _ = ImagenService.guardar_upload(file)
         
         # Check if this should be the main image
         is_principal = request.form.get('principal', 'false').lower() == 'true'
@@ -484,14 +975,13 @@ def upload_producto_imagen(producto_id: int) -> tuple[Response, int]:
             {"imagen": imagen, "url": url},
             201
         )
-    except ProductoServiceError as e:
-        # Clean up file if database operation failed
-        if os.path.exists(file_path):
-            os.remove(file_path)
+    except (ProductoServiceError, ImagenServiceError) as e:
+        # Clean up file if database operation failed (unless other images share it)
+        if url:
+            ImagenService.liberar_archivos([(url, [])])
         return error_response(e.message, status_code=e.status_code)
     except Exception as e:
-        # Clean up file if save failed
-        if os.path.exists(file_path):
-            os.remove(file_path)
         db.session.rollback()
+        if url:
+            ImagenService.liberar_archivos([(url, [])])
         return error_response("Error al guardar imagen", str(e), 500)
@@ -3,8 +3,17 @@ Blueprint de Comercial - Clientes, Órdenes, Detalles, Pagos
 Módulo ERP: Gestión comercial y ventas
 """
 from flask import Blueprint, jsonify, request
+from sqlalchemy import insert
 from .. import db
-from ..models import Cliente, Orden, DetalleOrden, Producto, Inventario
+from ..cache import invalidar_producto
+from ..models import (
+    Cliente, Orden, DetalleOrden, Producto,
+    campos_disponibles, opciones_campos, opciones_carga_orden, opciones_carga_detalle,
+    sincronizar_resumen_productos
+)
+from ..services.inventario_service import InventarioService, InventarioServiceError
+from ..services.recomendacion_service import RecomendacionService
+from ..utils.fields import parse_fields
 from datetime import datetime, timezone
 
 comercial_bp = Blueprint('comercial', __name__, url_prefix='/api')
@@ -16,10 +25,21 @@ comercial_bp = Blueprint('comercial', __name__, url_prefix='/api')
 
 @comercial_bp.route('/clientes', methods=['GET'])
 def get_clientes():
-    """Obtener todos los clientes"""
+    """
+    Obtener todos los clientes
+    Query params: ?fields=id,nombre,email (solo esas claves y columnas)
+    """
     try:
-        clientes = Cliente.query.all()
-        return jsonify([c.to_dict() for c in clientes]), 200
+        try:
+            fields = parse_fields(campos_disponibles(Cliente))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        query = Cliente.query
+        if fields:
+            query = query.options(*opciones_campos(Cliente, fields))
+        clientes = query.all()
+        return jsonify([c.to_dict(fields) for c in clientes]), 200
     except Exception as e:
         return jsonify({"error": "Error al obtener clientes", "detalle": str(e)}), 500
 
@@ -151,9 +171,16 @@ def get_ordenes():
     """
     Obtener todas las órdenes
     Query params: ?cliente_id=1&estado=pendiente
+                  ?fields=id,estado,total (solo esas claves; no carga relaciones no pedidas)
     """
     try:
-        query = Orden.query
+        try:
+            fields = parse_fields(campos_disponibles(Orden))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        opciones = opciones_campos(Orden, fields, ("fecha_creacion",)) if fields else opciones_carga_orden()
+        query = Orden.query.options(*opciones)
 
         # Filtro por cliente
         cliente_id = request.args.get('cliente_id', type=int)
@@ -166,11 +193,19 @@ def get_ordenes():
             query = query.filter_by(estado=estado)
 
         ordenes = query.order_by(Orden.fecha_creacion.desc()).all()
-        return jsonify([o.to_dict() for o in ordenes]), 200
+        return jsonify([o.to_dict(fields) for o in ordenes]), 200
     except Exception as e:
         return jsonify({"error": "Error al obtener órdenes", "detalle": str(e)}), 500
 
 
+def _cantidades_por_producto(detalles):
+    """Sumar las cantidades de los detalles por producto: {id_producto: cantidad}"""
+    cantidades = {}
+    for detalle in detalles:
+        cantidades[detalle.id_producto] = cantidades.get(detalle.id_producto, 0) + detalle.cantidad
+    return cantidades
+
+
 @comercial_bp.route('/ordenes', methods=['POST'])
 def create_orden():
     """
@@ -196,8 +231,41 @@ def create_orden():
     if not data["items"] or len(data["items"]) == 0:
         return jsonify({"error": "La orden debe tener al menos un item"}), 400
 
+    # 1. Validar los items y resolver todos los productos en una sola consulta
+    errores = []
+    ids_producto = []  # id_producto de cada item, convertido a int
+    for indice, item in enumerate(data["items"]):
+        if not isinstance(item, dict) or "id_producto" not in item or "cantidad" not in item:
+            errores.append({"indice": indice, "error": "Cada item debe tener 'id_producto' y 'cantidad'"})
+            continue
+        try:
+            if isinstance(item["id_producto"], (bool, float)):
+                raise ValueError
+            ids_producto.append(int(item["id_producto"]))
+        except (TypeError, ValueError):
+            errores.append({"indice": indice, "error": "El id_producto de cada item debe ser un entero"})
+            continue
+        cantidad = item["cantidad"]
+        if isinstance(cantidad, bool) or not isinstance(cantidad, int) or cantidad <= 0:
+            errores.append({"indice": indice, "error": "La cantidad de cada item debe ser un entero mayor a 0"})
+    if errores:
+        return jsonify({"error": errores[0]["error"], "items": errores}), 400
+
     try:
-        # 1. Crear orden header
+        productos = {
+            p.id_producto: p
+            for p in Producto.query.filter(Producto.id_producto.in_(set(ids_producto)))
+        }
+        errores = [
+            {"indice": indice, "id_producto": producto_id,
+             "error": f"Producto {producto_id} no encontrado"}
+            for indice, producto_id in enumerate(ids_producto)
+            if producto_id not in productos
+        ]
+        if errores:
+            return jsonify({"error": errores[0]["error"], "items": errores}), 400
+
+        # 2. Crear orden header
         nueva_orden = Orden(
             id_cliente=data["id_cliente"],
             id_usuarios=data["id_vendedor"],
@@ -207,68 +275,51 @@ def create_orden():
         db.session.add(nueva_orden)
         db.session.flush()  # Obtener ID sin hacer commit
 
-        # 2. Procesar items y validar stock
+        # 3. Calcular detalles (precio del item o el del producto)
         monto_total = 0
-        detalles_creados = []
-
-        for item in data["items"]:
-            # Validar campos del item
-            if "id_producto" not in item or "cantidad" not in item:
-                raise ValueError("Cada item debe tener 'id_producto' y 'cantidad'")
-
-            # Obtener producto
-            producto = Producto.query.get(item["id_producto"])
-            if not producto:
-                raise ValueError(f"Producto {item['id_producto']} no encontrado")
-
-            # Obtener inventario
-            inventario = Inventario.query.filter_by(id_producto=producto.id_producto).first()
-            if not inventario:
-                raise ValueError(f"No hay inventario para el producto {producto.nombre}")
-
-            # Validar stock disponible
-            cantidad = item["cantidad"]
-            if inventario.cantidad_stock < cantidad:
-                raise ValueError(
-                    f"Stock insuficiente para {producto.nombre}. "
-                    f"Disponible: {inventario.cantidad_stock}, Solicitado: {cantidad}"
-                )
-
-            # Calcular precio (usar el del item o el del producto)
+        detalles = []
+        for item, producto_id in zip(data["items"], ids_producto):
+            producto = productos[producto_id]
             precio_unitario = item.get("precio_unitario", float(producto.precio))
-            subtotal = precio_unitario * cantidad
-
-            # Crear detalle de orden
-            detalle = DetalleOrden(
-                id_orden=nueva_orden.id_orden,
-                id_producto=producto.id_producto,
-                cantidad=cantidad,
-                precio_unitario=precio_unitario
-            )
-            db.session.add(detalle)
-            detalles_creados.append(detalle)
-
-            # Descontar stock
-            inventario.cantidad_stock -= cantidad
-            monto_total += subtotal
+            detalles.append({
+                "id_orden": nueva_orden.id_orden,
+                "id_producto": producto.id_producto,
+                "cantidad": item["cantidad"],
+                "precio_unitario": precio_unitario,
+            })
+            monto_total += precio_unitario * item["cantidad"]
+
+        # 4. Descontar stock de todos los productos: bloqueo ordenado + un UPDATE condicional
+        #    (sin sobreventa entre checkouts concurrentes)
+        cantidades = {}
+        for detalle in detalles:
+            cantidades[detalle["id_producto"]] = cantidades.get(detalle["id_producto"], 0) + detalle["cantidad"]
+        InventarioService.reservar(cantidades, id_orden=nueva_orden.id_orden, id_usuario=data["id_vendedor"])
 
-        # 3. Actualizar monto total de la orden
+        # 5. Detalles en un solo INSERT y monto total de la orden
+        db.session.execute(insert(DetalleOrden), detalles)
         nueva_orden.monto_total = monto_total
 
-        # 4. Commit de todo (transacción atómica)
+        # 6. Commit de todo (transacción atómica)
+        productos_afectados = set(cantidades)
+        sincronizar_resumen_productos(productos_afectados)
         db.session.commit()
+        for producto_id in productos_afectados:
+            invalidar_producto(producto_id)
+        RecomendacionService.registrar_orden(nueva_orden.id_orden, productos_afectados)
 
-        # 5. Preparar respuesta
+        # 7. Preparar respuesta (orden con sus relaciones en consultas agrupadas)
+        orden = Orden.query.options(*opciones_carga_orden()).filter_by(id_orden=nueva_orden.id_orden).one()
         return jsonify({
             "mensaje": "Orden creada exitosamente",
-            "orden": nueva_orden.to_dict(),
-            "items_procesados": len(detalles_creados),
+            "orden": orden.to_dict(),
+            "items_procesados": len(detalles),
             "monto_total": float(monto_total)
         }), 201
 
-    except ValueError as ve:
+    except InventarioServiceError as e:
         db.session.rollback()
-        return jsonify({"error": str(ve)}), 400
+        return jsonify({"error": e.message, "items": e.items}), e.status_code
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": "Error al crear orden", "detalle": str(e)}), 500
@@ -277,17 +328,12 @@ def create_orden():
 @comercial_bp.route('/ordenes/<int:id>', methods=['GET'])
 def get_orden(id):
     """Obtener una orden por ID (con detalles)"""
-    orden = Orden.query.get(id)
+    orden = db.session.get(Orden, id, options=opciones_carga_orden())
     if not orden:
         return jsonify({"error": "Orden no encontrada"}), 404
     
-    orden_dict = orden.to_dict()
-    
-    # Agregar detalles de la orden
-    detalles = DetalleOrden.query.filter_by(id_orden=id).all()
-    orden_dict["detalles"] = [d.to_dict() for d in detalles]
-    
-    return jsonify(orden_dict), 200
+    # to_dict ya incluye los detalles (precargados junto con sus productos)
+    return jsonify(orden.to_dict()), 200
 
 
 @comercial_bp.route('/ordenes/<int:id>/estado', methods=['PATCH'])
@@ -309,13 +355,15 @@ def update_estado_orden(id):
         return jsonify({"error": f"Estado inválido. Debe ser uno de: {', '.join(estados_validos)}"}), 400
 
     # Si se cancela la orden, devolver stock
+    productos_afectados = set()
+    estado_anterior = orden.estado
     if data["estado"] == "cancelada" and orden.estado != "cancelada":
         try:
             detalles = DetalleOrden.query.filter_by(id_orden=id).all()
-            for detalle in detalles:
-                inventario = Inventario.query.filter_by(id_producto=detalle.id_producto).first()
-                if inventario:
-                    inventario.cantidad_stock += detalle.cantidad
+            productos_afectados = {detalle.id_producto for detalle in detalles}
+            InventarioService.devolver(
+                _cantidades_por_producto(detalles), id_orden=id, id_usuario=InventarioService.usuario_actual()
+            )
         except Exception as e:
             db.session.rollback()
             return jsonify({"error": "Error al devolver stock", "detalle": str(e)}), 500
@@ -323,7 +371,15 @@ def update_estado_orden(id):
     orden.estado = data["estado"]
 
     try:
+        sincronizar_resumen_productos(productos_afectados)
         db.session.commit()
+        for producto_id in productos_afectados:
+            invalidar_producto(producto_id)
+        if productos_afectados:
+            RecomendacionService.revertir_orden(id, productos_afectados)
+        elif estado_anterior == "cancelada" and orden.estado != "cancelada":
+            # Orden reactivada: vuelve a contar para "comprados juntos"
+            RecomendacionService.registrar_orden(id, (d.id_producto for d in orden.detalles))
         return jsonify({
             "mensaje": "Estado actualizado exitosamente",
             "orden": orden.to_dict()
@@ -344,16 +400,24 @@ def delete_orden(id):
         return jsonify({"error": "No se puede cancelar una orden completada"}), 400
 
     try:
-        # Devolver stock
+        # Devolver stock (una orden ya cancelada ya lo devolvió)
+        ya_cancelada = orden.estado == "cancelada"
         detalles = DetalleOrden.query.filter_by(id_orden=id).all()
-        for detalle in detalles:
-            inventario = Inventario.query.filter_by(id_producto=detalle.id_producto).first()
-            if inventario:
-                inventario.cantidad_stock += detalle.cantidad
+        productos_afectados = set()
+        if not ya_cancelada:
+            InventarioService.devolver(
+                _cantidades_por_producto(detalles), id_orden=id, id_usuario=InventarioService.usuario_actual()
+            )
+            productos_afectados = {detalle.id_producto for detalle in detalles}
 
         # Marcar como cancelada
         orden.estado = "cancelada"
+        sincronizar_resumen_productos(productos_afectados)
         db.session.commit()
+        for producto_id in productos_afectados:
+            invalidar_producto(producto_id)
+        if not ya_cancelada:
+            RecomendacionService.revertir_orden(id, productos_afectados)
 
         return jsonify({"mensaje": "Orden cancelada y stock devuelto exitosamente"}), 200
     except Exception as e:
@@ -372,7 +436,7 @@ def get_detalles_orden(orden_id):
     if not orden:
         return jsonify({"error": "Orden no encontrada"}), 404
 
-    detalles = DetalleOrden.query.filter_by(id_orden=orden_id).all()
+    detalles = DetalleOrden.query.options(*opciones_carga_detalle()).filter_by(id_orden=orden_id).all()
     return jsonify([d.to_dict() for d in detalles]), 200
 
 
@@ -387,7 +451,7 @@ def reporte_ventas():
     Query params: ?fecha_inicio=YYYY-MM-DD&fecha_fin=YYYY-MM-DD
     """
     try:
-        query = Orden.query.filter(Orden.estado != "cancelada")
+        query = Orden.query.options(*opciones_carga_orden()).filter(Orden.estado != "cancelada")
 
         # Filtro por fecha
         fecha_inicio = request.args.get('fecha_inicio')
@@ -10,7 +10,7 @@ Endpoints:
 from flask import Blueprint, request
 
 from .. import db
-from ..models import Favorito, Cliente, Producto
+from ..models import Favorito, Cliente, Producto, opciones_carga_favorito
 from ..utils.helpers import success_response, error_response
 from ..utils.validators import validate_required_fields
 
@@ -39,7 +39,7 @@ def get_favoritos():
     if not cliente:
         return error_response("Cliente no encontrado", status_code=404)
     
-    favoritos = Favorito.query.filter_by(id_cliente=id_cliente).all()
+    favoritos = Favorito.query.options(*opciones_carga_favorito()).filter_by(id_cliente=id_cliente).all()
     return success_response(
         "Favoritos obtenidos exitosamente",
         {"favoritos": [f.to_dict() for f in favoritos]},
@@ -186,7 +186,7 @@ def get_cliente_favoritos(id_cliente: int):
     if not cliente:
         return error_response("Cliente no encontrado", status_code=404)
     
-    favoritos = Favorito.query.filter_by(id_cliente=id_cliente).all()
+    favoritos = Favorito.query.options(*opciones_carga_favorito()).filter_by(id_cliente=id_cliente).all()
     return success_response(
         "Favoritos obtenidos exitosamente",
         {"favoritos": [f.to_dict() for f in favoritos]},
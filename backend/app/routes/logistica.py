@@ -4,7 +4,13 @@ Módulo ERP: Gestión de logística y almacén
 """
 from flask import Blueprint, jsonify, request
 from .. import db
-from ..models import Inventario, Proveedor, Producto
+from ..cache import invalidar_producto
+from ..models import (
+    ALERTA_STOCK, Inventario, Proveedor, Producto,
+    campos_disponibles, opciones_campos, sincronizar_resumen_productos
+)
+from ..services.inventario_service import InventarioService, InventarioServiceError
+from ..utils.fields import parse_fields
 from datetime import datetime, timezone
 
 logistica_bp = Blueprint('logistica', __name__, url_prefix='/api')
@@ -125,17 +131,25 @@ def get_inventario():
     """
     Obtener todo el inventario
     Query params: ?bajo_stock=true (stock <= stock_minimo)
+                  ?fields=id_producto,stock (solo esas claves y columnas)
     """
     try:
+        try:
+            fields = parse_fields(campos_disponibles(Inventario))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
         query = Inventario.query
+        if fields:
+            query = query.options(*opciones_campos(Inventario, fields))
 
         # Filtro por productos con bajo stock
         bajo_stock = request.args.get('bajo_stock')
         if bajo_stock and bajo_stock.lower() == 'true':
-            query = query.filter(Inventario.cantidad_stock <= Inventario.stock_minimo)
+            query = query.filter(ALERTA_STOCK)
 
         inventario = query.all()
-        return jsonify([i.to_dict() for i in inventario]), 200
+        return jsonify([i.to_dict(fields) for i in inventario]), 200
     except Exception as e:
         return jsonify({"error": "Error al obtener inventario", "detalle": str(e)}), 500
 
@@ -176,7 +190,10 @@ def create_inventario():
 
     try:
         db.session.add(nuevo_inventario)
+        InventarioService.registrar_cambio(nuevo_inventario, 0, "inicial", InventarioService.usuario_actual())
+        sincronizar_resumen_productos([nuevo_inventario.id_producto])
         db.session.commit()
+        invalidar_producto(nuevo_inventario.id_producto)
         return jsonify({
             "mensaje": "Inventario creado exitosamente",
             "inventario": nuevo_inventario.to_dict()
@@ -221,6 +238,7 @@ def update_inventario(id):
         return jsonify({"error": "Inventario no encontrado"}), 404
 
     data = request.get_json()
+    stock_anterior = inventario.cantidad_stock
 
     if "cantidad_stock" in data:
         inventario.cantidad_stock = data["cantidad_stock"]
@@ -232,7 +250,10 @@ def update_inventario(id):
         inventario.ubicacion = data["ubicacion"].strip() or None
 
     try:
+        InventarioService.registrar_cambio(inventario, stock_anterior, "correccion", InventarioService.usuario_actual())
+        sincronizar_resumen_productos([inventario.id_producto])
         db.session.commit()
+        invalidar_producto(inventario.id_producto)
         return jsonify({
             "mensaje": "Inventario actualizado exitosamente",
             "inventario": inventario.to_dict()
@@ -245,58 +266,163 @@ def update_inventario(id):
 @logistica_bp.route('/inventario/<int:id>/ajustar', methods=['PATCH'])
 def ajustar_stock(id):
     """
-    Ajustar stock (sumar o restar)
+    Ajustar stock (sumar o restar) y registrarlo en el historial de movimientos
     Body: {
         "cantidad": int (puede ser negativo para restar),
-        "motivo": str (opcional: "venta", "compra", "ajuste", "devolucion")
+        "motivo": str (opcional: "compra", "devolucion", "ajuste", "venta"; default "ajuste")
     }
     """
-    inventario = Inventario.query.get(id)
-    if not inventario:
-        return jsonify({"error": "Inventario no encontrado"}), 404
-
     data = request.get_json()
     if not data or "cantidad" not in data:
         return jsonify({"error": "El campo 'cantidad' es requerido"}), 400
 
     cantidad = data["cantidad"]
-    nuevo_stock = inventario.cantidad_stock + cantidad
-
-    if nuevo_stock < 0:
-        return jsonify({"error": "Stock no puede ser negativo"}), 400
-
-    inventario.cantidad_stock = nuevo_stock
+    if isinstance(cantidad, bool) or not isinstance(cantidad, int):
+        return jsonify({"error": "El campo 'cantidad' debe ser un entero"}), 400
+    motivo = data.get("motivo", "ajuste")
 
     try:
+        inventario = InventarioService.ajustar(id, cantidad, motivo, InventarioService.usuario_actual())
+        if inventario is None:
+            return jsonify({"error": "Inventario no encontrado"}), 404
+        sincronizar_resumen_productos([inventario.id_producto])
         db.session.commit()
+        invalidar_producto(inventario.id_producto)
         return jsonify({
             "mensaje": "Stock ajustado exitosamente",
             "inventario": inventario.to_dict(),
             "ajuste_aplicado": cantidad,
-            "motivo": data.get("motivo", "ajuste")
+            "motivo": motivo
         }), 200
+    except InventarioServiceError as e:
+        db.session.rollback()
+        return jsonify({"error": e.message}), e.status_code
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": "Error al ajustar stock", "detalle": str(e)}), 500
 
 
-@logistica_bp.route('/inventario/alertas', methods=['GET'])
-def get_alertas_stock():
-    """Obtener productos con stock bajo o agotado"""
+@logistica_bp.route('/inventario/ajustes', methods=['POST'])
+def ajustar_stock_lote():
+    """
+    Ajustar el stock de muchos productos en una transacción (conteo físico, recepción de mercadería)
+    Body: {
+        "items": [
+            {"id_producto": int | "sku": str, "cantidad": int (delta) | "cantidad_stock": int (conteo)}
+        ],
+        "motivo": str (opcional, default "ajuste"),
+        "dry_run": bool (opcional: solo calcular)
+    }
+    Los items inválidos se informan en "resultados" con su "error" y no impiden aplicar el resto.
+    """
     try:
-        # Stock agotado (0)
-        agotados = Inventario.query.filter(Inventario.cantidad_stock == 0).all()
-        
-        # Stock bajo (cantidad <= stock_minimo)
-        bajo_stock = Inventario.query.filter(
-            Inventario.cantidad_stock > 0,
-            Inventario.cantidad_stock <= Inventario.stock_minimo
-        ).all()
+        resumen = InventarioService.ajustar_lote(request.get_json(silent=True), InventarioService.usuario_actual())
+        return jsonify(resumen), 200
+    except InventarioServiceError as e:
+        return jsonify({"error": e.message}), e.status_code
+    except Exception as e:
+        return jsonify({"error": "Error al ajustar stock", "detalle": str(e)}), 500
+
+
+# ==============================================================================
+#                          MOVIMIENTOS Y STOCK HISTÓRICO
+# ==============================================================================
 
+def _leer_ids_productos():
+    """Parsear ?productos=1,2,3 (None si no se indicó)."""
+    valor = request.args.get('productos')
+    if not valor:
+        return None
+    try:
+        return sorted({int(i) for i in valor.split(',') if i.strip()})
+    except ValueError:
+        raise InventarioServiceError("productos debe ser una lista de ids separados por coma")
+
+
+@logistica_bp.route('/inventario/movimientos', methods=['GET'])
+def get_movimientos_inventario():
+    """
+    Historial de movimientos de stock (más recientes primero, paginado por cursor)
+    Query params: ?producto=&motivo=&orden=&desde=&hasta=&limit=50&cursor=
+    """
+    try:
+        pagina = InventarioService.listar_movimientos(
+            limit=request.args.get('limit', 50, type=int),
+            cursor=request.args.get('cursor'),
+            producto_id=request.args.get('producto', type=int),
+            motivo=request.args.get('motivo'),
+            id_orden=request.args.get('orden', type=int),
+            desde=InventarioService.leer_fecha(request.args.get('desde'), 'desde'),
+            hasta=InventarioService.leer_fecha(request.args.get('hasta'), 'hasta'),
+        )
+        return jsonify(pagina), 200
+    except InventarioServiceError as e:
+        return jsonify({"error": e.message}), e.status_code
+    except Exception as e:
+        return jsonify({"error": "Error al obtener movimientos", "detalle": str(e)}), 500
+
+
+@logistica_bp.route('/inventario/movimientos/resumen', methods=['GET'])
+def get_resumen_movimientos():
+    """
+    Reporte de movimientos por producto entre dos fechas
+    Query params: ?desde=YYYY-MM-DD (requerido)&hasta=YYYY-MM-DD (default: ahora)&productos=1,2
+    """
+    try:
+        desde = InventarioService.leer_fecha(request.args.get('desde'), 'desde')
+        if desde is None:
+            return jsonify({"error": "El parámetro 'desde' es requerido"}), 400
+        hasta = InventarioService.leer_fecha(request.args.get('hasta'), 'hasta') or datetime.now(timezone.utc)
+        productos = InventarioService.resumen_movimientos(desde, hasta, _leer_ids_productos())
         return jsonify({
-            "agotados": [i.to_dict() for i in agotados],
-            "bajo_stock": [i.to_dict() for i in bajo_stock],
-            "total_alertas": len(agotados) + len(bajo_stock)
+            "desde": desde.isoformat(),
+            "hasta": hasta.isoformat(),
+            "productos": productos
         }), 200
+    except InventarioServiceError as e:
+        return jsonify({"error": e.message}), e.status_code
+    except Exception as e:
+        return jsonify({"error": "Error al obtener reporte de movimientos", "detalle": str(e)}), 500
+
+
+@logistica_bp.route('/inventario/stock-en-fecha', methods=['GET'])
+def get_stock_en_fecha():
+    """
+    Stock de cada producto a una fecha (último snapshot + movimientos posteriores)
+    Query params: ?fecha=YYYY-MM-DDTHH:MM:SS (requerido)&productos=1,2
+    """
+    try:
+        fecha = InventarioService.leer_fecha(request.args.get('fecha'), 'fecha')
+        if fecha is None:
+            return jsonify({"error": "El parámetro 'fecha' es requerido"}), 400
+        stock = InventarioService.stock_en_fecha(fecha, _leer_ids_productos())
+        return jsonify({
+            "fecha": fecha.isoformat(),
+            "stock": [{"id_producto": i, "stock": stock[i]} for i in sorted(stock)]
+        }), 200
+    except InventarioServiceError as e:
+        return jsonify({"error": e.message}), e.status_code
+    except Exception as e:
+        return jsonify({"error": "Error al calcular stock a la fecha", "detalle": str(e)}), 500
+
+
+@logistica_bp.route('/inventario/snapshots', methods=['POST'])
+def create_snapshot_stock():
+    """Guardar un snapshot del stock actual (normalmente lo hace `flask inventario snapshot` por cron)"""
+    try:
+        return jsonify({"mensaje": "Snapshot de stock guardado", **InventarioService.tomar_snapshot()}), 201
+    except InventarioServiceError as e:
+        return jsonify({"error": e.message}), e.status_code
+
+
+@logistica_bp.route('/inventario/alertas', methods=['GET'])
+def get_alertas_stock():
+    """
+    Obtener productos con stock bajo o agotado (stock <= stock_minimo; sin mínimo se toma 0)
+    Query params: ?solo_conteos=true (solo los totales, sin las filas)
+    """
+    try:
+        solo_conteos = request.args.get('solo_conteos', '').lower() == 'true'
+        return jsonify(InventarioService.alertas(solo_conteos)), 200
     except Exception as e:
         return jsonify({"error": "Error al obtener alertas", "detalle": str(e)}), 500
@@ -4,7 +4,8 @@ Módulo ERP: Gestión de pagos y facturación
 """
 from flask import Blueprint, jsonify, request
 from .. import db
-from ..models import Pago, Orden
+from ..models import Pago, Orden, campos_disponibles, opciones_campos
+from ..utils.fields import parse_fields
 from datetime import datetime
 
 pagos_bp = Blueprint('pagos', __name__, url_prefix='/api')
@@ -19,9 +20,17 @@ def get_pagos():
     """
     Obtener todos los pagos
     Query params: ?orden_id=1&estado=approved
+                  ?fields=id,mp_estado,monto_cobrado (solo esas claves y columnas)
     """
     try:
+        try:
+            fields = parse_fields(campos_disponibles(Pago))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
         query = Pago.query
+        if fields:
+            query = query.options(*opciones_campos(Pago, fields, ("fecha_pago",)))
 
         # Filtro por orden
         orden_id = request.args.get('orden_id', type=int)
@@ -34,7 +43,7 @@ def get_pagos():
             query = query.filter_by(mp_estado=mp_estado)
 
         pagos = query.order_by(Pago.fecha_pago.desc()).all()
-        return jsonify([p.to_dict() for p in pagos]), 200
+        return jsonify([p.to_dict(fields) for p in pagos]), 200
     except Exception as e:
         return jsonify({"error": "Error al obtener pagos", "detalle": str(e)}), 500
 
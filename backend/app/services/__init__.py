@@ -20,10 +20,37 @@
 
 from .producto_service import ProductoService, ProductoServiceError
 from .categoria_service import CategoriaService, CategoriaServiceError
+from .busqueda_service import BusquedaService, BusquedaServiceError
+from .imagen_service import ImagenService, ImagenServiceError
+from .importacion_service import ImportacionService, ImportacionServiceError
+from .exportacion_service import ExportacionService, ExportacionServiceError
+from .precio_service import PrecioService, PrecioServiceError
+from .papelera_service import PapeleraService, PapeleraServiceError
+from .recomendacion_service import RecomendacionService, RecomendacionServiceError
+from .snapshot_service import SnapshotService, SnapshotServiceError
+from .inventario_service import InventarioService, InventarioServiceError
 
 __all__ = [
     'ProductoService',
     'ProductoServiceError',
     'CategoriaService',
     'CategoriaServiceError',
+    'BusquedaService',
+    'BusquedaServiceError',
+    'ImagenService',
+    'ImagenServiceError',
+    'ImportacionService',
+    'ImportacionServiceError',
+    'ExportacionService',
+    'ExportacionServiceError',
+    'PrecioService',
+    'PrecioServiceError',
+    'PapeleraService',
+    'PapeleraServiceError',
+    'RecomendacionService',
+    'RecomendacionServiceError',
+    'SnapshotService',
+    'SnapshotServiceError',
+    'InventarioService',
+    'InventarioServiceError',
 ]
@@ -0,0 +1,183 @@
+"""
+BusquedaService - Búsqueda de productos por texto
+
+En PostgreSQL usa la columna generada `productos.search_vector` (tsvector con diccionario
+español y unaccent, índice GIN) más pg_trgm sobre el nombre para tolerar errores de tipeo.
+Ver la migración `add_fulltext_search_to_productos`.
+
+En otros motores (SQLite en tests) usa una alternativa portable basada en LIKE con un
+puntaje por campo, para que el endpoint funcione igual aunque sin índices.
+"""
+from __future__ import annotations
+from typing import Any
+
+from sqlalchemy import and_, case, func, literal, literal_column, or_
+
+from .. import db
+from ..models import Categoria, Producto, opciones_carga_producto
+from ..utils.database import is_postgresql
+
+
+RESULTADOS_POR_PAGINA_MAXIMO = 50
+LONGITUD_MAXIMA_CONSULTA = 200
+
+
+class BusquedaServiceError(Exception):
+    """Excepción base para errores del servicio de búsqueda"""
+
+    def __init__(self, message: str, status_code: int = 400) -> None:
+        self.message = message
+        self.status_code = status_code
+        super().__init__(self.message)
+
+
+class BusquedaService:
+    """
+    Servicio de búsqueda de productos con ranking.
+
+    Uso en routes:
+        resultado = BusquedaService.buscar_productos("sillon cuero", page=1, per_page=20)
+    """
+
+    @staticmethod
+    def buscar_productos(
+        q: str,
+        page: int = 1,
+        per_page: int = 20,
+        solo_activos: bool = True
+    ) -> dict[str, Any]:
+        """
+        Buscar productos por nombre, descripción, material, SKU y nombre de categoría.
+
+        Args:
+            q: Texto a buscar
+            page: Página (desde 1)
+            per_page: Resultados por página (1..RESULTADOS_POR_PAGINA_MAXIMO)
+            solo_activos: Si True, excluye productos en la papelera
+
+        Returns:
+            Diccionario con "items" ordenados por relevancia, "page", "per_page" y "has_more"
+
+        Raises:
+            BusquedaServiceError: Si la consulta está vacía o la paginación es inválida
+        """
+        q = (q or "").strip()[:LONGITUD_MAXIMA_CONSULTA]
+        if not q:
+            raise BusquedaServiceError("El parámetro 'q' es requerido")
+        if page < 1:
+            raise BusquedaServiceError("page debe ser mayor o igual a 1")
+        if per_page < 1 or per_page > RESULTADOS_POR_PAGINA_MAXIMO:
+            raise BusquedaServiceError(
+                f"per_page debe estar entre 1 y {RESULTADOS_POR_PAGINA_MAXIMO}"
+            )
+
+        if is_postgresql():
+            query = BusquedaService._consulta_postgresql(q)
+        else:
+            query = BusquedaService._consulta_portable(q)
+
+        if solo_activos:
+            query = query.filter(Producto.activo.is_(True))
+
+        # Primero solo (id, puntaje): la consulta rankeada no arrastra columnas ni relaciones
+        filas = query.offset((page - 1) * per_page).limit(per_page + 1).all()
+        has_more = len(filas) > per_page
+        ids = [fila.id_producto for fila in filas[:per_page]]
+
+        productos = {}
+        if ids:
+            for producto in Producto.query.options(*opciones_carga_producto()).filter(
+                Producto.id_producto.in_(ids)
+            ):
+                productos[producto.id_producto] = producto
+
+        return {
+            "items": [productos[i].to_dict() for i in ids if i in productos],
+            "page": page,
+            "per_page": per_page,
+            "has_more": has_more,
+        }
+
+    @staticmethod
+    def _consulta_postgresql(q: str):
+        """Consulta rankeada con tsvector + pg_trgm (usa los índices GIN)."""
+        texto = func.immutable_unaccent(q)
+        ts_query = func.websearch_to_tsquery(literal_column("'spanish'::regconfig"), texto)
+        search_vector = literal_column("productos.search_vector")
+        nombre_normalizado = func.immutable_unaccent(Producto.nombre)
+
+        # Las categorías son pocas: se resuelven aparte para que el filtro principal
+        # quede como OR de condiciones indexadas (BitmapOr) sin JOIN.
+        categorias_coincidentes = [
+            fila.id_categoria for fila in db.session.query(Categoria.id_categoria).filter(
+                or_(
+                    func.to_tsvector(
+                        literal_column("'spanish'::regconfig"),
+                        func.immutable_unaccent(Categoria.nombre)
+                    ).op("@@")(ts_query),
+                    func.immutable_unaccent(Categoria.nombre).op("%")(texto),
+                )
+            )
+        ]
+
+        condiciones = [
+            search_vector.op("@@")(ts_query),
+            nombre_normalizado.op("%")(texto),
+        ]
+        boost_categoria = literal(0.0)
+        if categorias_coincidentes:
+            condiciones.append(Producto.id_categoria.in_(categorias_coincidentes))
+            boost_categoria = case(
+                (Producto.id_categoria.in_(categorias_coincidentes), 0.3),
+                else_=0.0
+            )
+
+        puntaje = (
+            func.ts_rank_cd(search_vector, ts_query)
+            + func.similarity(nombre_normalizado, texto)
+            + boost_categoria
+        ).label("puntaje")
+
+        return db.session.query(Producto.id_producto, puntaje).filter(
+            or_(*condiciones)
+        ).order_by(puntaje.desc(), Producto.id_producto.asc())
+
+    @staticmethod
+    def _escapar_like(texto: str) -> str:
+        """Escapar los comodines de LIKE (con \\ como carácter de escape)."""
+        return texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+    @staticmethod
+    def _consulta_portable(q: str):
+        """Alternativa sin extensiones: cada término debe aparecer en algún campo."""
+        campos_con_peso = [
+            (Producto.nombre, 3),
+            (Producto.sku, 3),
+            (Categoria.nombre, 2),
+            (Producto.material, 1),
+            (Producto.descripcion, 1),
+        ]
+        terminos = [t.lower() for t in q.split()]
+
+        condiciones = []
+        puntaje = literal(0)
+        for termino in terminos:
+            # %, _ y \ del usuario son literales: "50%" no debe coincidir con todo
+            patron = f"%{BusquedaService._escapar_like(termino)}%"
+            coincidencias = []
+            for campo, peso in campos_con_peso:
+                coincidencia = func.lower(func.coalesce(campo, "")).like(patron, escape="\\")
+                coincidencias.append(coincidencia)
+                puntaje = puntaje + case((coincidencia, peso), else_=0)
+            condiciones.append(or_(*coincidencias))
+        puntaje = puntaje.label("puntaje")
+
+        return db.session.query(Producto.id_producto, puntaje).outerjoin(
+            Categoria, Producto.id_categoria == Categoria.id_categoria
+        ).filter(
+            and_(*condiciones)
+        ).order_by(puntaje.desc(), Producto.id_producto.asc())
+
+
+# Instancia singleton para uso directo (opcional)
+busqueda_service = BusquedaService()
@@ -7,10 +7,22 @@ Sigue el mismo patrón que ProductoService para consistencia.
 from __future__ import annotations
 from typing import Any
 
+from sqlalchemy import case, func, select
+
 from .. import db
-from ..models import Categoria
+from ..cache import TAG_CATEGORIAS, TAG_PRODUCTOS, cached_value, invalidar_categoria
+from ..models import Categoria, Producto
 from ..utils.validators import validate_required_fields
 
+CLAVE_CACHE_ESTADISTICAS = "valor:estadisticas_categorias"
+ESTADISTICAS_VACIAS = {
+    "productos": 0,
+    "en_stock": 0,
+    "precio_min": None,
+    "precio_max": None,
+    "precio_promedio": None,
+}
+
 
 class CategoriaServiceError(Exception):
     """Excepción base para errores del servicio de categorías"""
@@ -38,12 +50,17 @@ class CategoriaService:
     """
 
     @staticmethod
-    def listar_categorias(incluir_inactivas: bool = False) -> list[dict[str, Any]]:
+    def listar_categorias(
+        incluir_inactivas: bool = False,
+        incluir_estadisticas: bool = False
+    ) -> list[dict[str, Any]]:
         """
         Obtener lista de categorías.
         
         Args:
             incluir_inactivas: Si True, incluye categorías inactivas
+            incluir_estadisticas: Si True, agrega a cada categoría "estadisticas" con
+                cantidad de productos activos, cuántos tienen stock y precio mín/máx/promedio
             
         Returns:
             Lista de diccionarios con datos de categorías
@@ -54,7 +71,77 @@ class CategoriaService:
             query = query.filter_by(activa=True)
         
         categorias = query.all()
-        return [c.to_dict() for c in categorias]
+        if not incluir_estadisticas:
+            return [c.to_dict() for c in categorias]
+        
+        estadisticas = CategoriaService.estadisticas_por_categoria()
+        resultado = []
+        for categoria in categorias:
+            datos = categoria.to_dict()
+            datos["estadisticas"] = estadisticas.get(categoria.id_categoria, dict(ESTADISTICAS_VACIAS))
+            resultado.append(datos)
+        return resultado
+
+    @staticmethod
+    def estadisticas_por_categoria() -> dict[int, dict[str, Any]]:
+        """
+        Estadísticas de productos activos por categoría, calculadas con un solo GROUP BY.
+        
+        El resultado se materializa en la caché del catálogo y se invalida con cualquier
+        cambio de productos, stock o categorías (tags "productos" y "categorias").
+        
+        Returns:
+            {id_categoria: {"productos", "en_stock", "precio_min", "precio_max", "precio_promedio"}}
+        """
+        filas = cached_value(
+            CLAVE_CACHE_ESTADISTICAS,
+            [TAG_PRODUCTOS, TAG_CATEGORIAS],
+            CategoriaService._calcular_estadisticas
+        )
+        return {fila["id_categoria"]: fila["estadisticas"] for fila in filas}
+
+    @staticmethod
+    def _calcular_estadisticas() -> list[dict[str, Any]]:
+        """Conteos y rango de precios de los productos activos, agrupados por categoría."""
+        def numero(valor: Any) -> float | None:
+            return round(float(valor), 2) if valor is not None else None
+
+        consulta = db.session.query(
+            Producto.id_categoria,
+            func.count(Producto.id_producto).label("productos"),
+            func.sum(case((Producto.en_stock.is_(True), 1), else_=0)).label("en_stock"),
+            func.min(Producto.precio).label("precio_min"),
+            func.max(Producto.precio).label("precio_max"),
+            func.avg(Producto.precio).label("precio_promedio"),
+        ).filter(
+            Producto.activo.is_(True),
+            Producto.id_categoria.isnot(None)
+        ).group_by(Producto.id_categoria)
+
+        return [
+            {
+                "id_categoria": fila.id_categoria,
+                "estadisticas": {
+                    "productos": fila.productos,
+                    "en_stock": int(fila.en_stock or 0),
+                    "precio_min": numero(fila.precio_min),
+                    "precio_max": numero(fila.precio_max),
+                    "precio_promedio": numero(fila.precio_promedio),
+                },
+            }
+            for fila in consulta
+        ]
+
+    @staticmethod
+    def version_categorias() -> tuple[Any, ...]:
+        """
+        Versión de la tabla de categorías para calcular ETags (última modificación y cantidad).
+        
+        Returns:
+            Tupla que cambia siempre que se crea, modifica o elimina una categoría
+        """
+        consulta = select(func.max(Categoria.fecha_actualizacion), func.count(Categoria.id_categoria))
+        return tuple(db.session.execute(consulta).one())
 
     @staticmethod
     def obtener_categoria(categoria_id: int) -> dict[str, Any]:
@@ -114,6 +201,7 @@ class CategoriaService:
         try:
             db.session.add(nueva_categoria)
             db.session.commit()
+            invalidar_categoria(nueva_categoria.id_categoria)
             return nueva_categoria.to_dict()
         except Exception as e:
             db.session.rollback()
@@ -152,6 +240,7 @@ class CategoriaService:
         
         try:
             db.session.commit()
+            invalidar_categoria(categoria_id)
             return categoria.to_dict()
         except Exception as e:
             db.session.rollback()
@@ -178,6 +267,7 @@ class CategoriaService:
         try:
             categoria.activa = False
             db.session.commit()
+            invalidar_categoria(categoria_id)
             return categoria.to_dict()
         except Exception as e:
             db.session.rollback()
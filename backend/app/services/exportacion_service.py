@@ -0,0 +1,161 @@
+"""
+ExportacionService - Exportación del catálogo completo (CSV / NDJSON)
+
+Pensado para las sincronizaciones nocturnas con marketplaces y contabilidad: en lugar
+de armar una lista gigante de diccionarios, recorre los productos con un cursor del
+lado del servidor (`stream_results` + `yield_per`) y va generando el archivo en bloques,
+así la memoria queda constante sin importar el tamaño del catálogo.
+
+Las filas salen ordenadas por id; si la descarga se corta se puede retomar con
+`desde_id=<último id recibido>`.
+"""
+from __future__ import annotations
+import csv
+import io
+import json
+from typing import Any, Iterator, Optional
+
+from sqlalchemy import select
+
+from .. import db
+from ..models import Categoria, Producto
+
+FORMATOS_EXPORTACION = ("csv", "ndjson")
+FILAS_POR_BLOQUE = 1000
+
+COLUMNAS_EXPORTACION = (
+    "id", "sku", "nombre", "descripcion", "precio", "material",
+    "alto_cm", "ancho_cm", "profundidad_cm", "activo",
+    "id_categoria", "categoria", "stock", "imagen_principal", "fecha_actualizacion",
+)
+
+
+class ExportacionServiceError(Exception):
+    """Excepción base para errores del servicio de exportación"""
+
+    def __init__(self, message: str, status_code: int = 400) -> None:
+        self.message = message
+        self.status_code = status_code
+        super().__init__(self.message)
+
+
+class ExportacionService:
+    """
+    Servicio de exportación del catálogo en streaming.
+
+    Uso en routes:
+        bloques = ExportacionService.exportar_productos("csv", desde_id=0)
+        return Response(stream_with_context(bloques), mimetype="text/csv")
+    """
+
+    @staticmethod
+    def exportar_productos(
+        formato: str = "csv",
+        desde_id: int = 0,
+        categoria_id: Optional[int] = None,
+        activo: Optional[bool] = None
+    ) -> Iterator[str]:
+        """
+        Generar la exportación en bloques de texto.
+
+        Args:
+            formato: "csv" o "ndjson"
+            desde_id: Exportar solo productos con id mayor (para retomar una descarga)
+            categoria_id: Filtrar por categoría
+            activo: Filtrar por estado activo
+
+        Returns:
+            Iterador de bloques de texto (cada uno con hasta FILAS_POR_BLOQUE filas)
+
+        Raises:
+            ExportacionServiceError: Si el formato o desde_id son inválidos
+        """
+        if formato not in FORMATOS_EXPORTACION:
+            raise ExportacionServiceError(
+                f"Formato inválido. Debe ser uno de: {', '.join(FORMATOS_EXPORTACION)}"
+            )
+        if desde_id < 0:
+            raise ExportacionServiceError("desde_id no puede ser negativo")
+
+        consulta = ExportacionService._consulta(desde_id, categoria_id, activo)
+        if formato == "csv":
+            return ExportacionService._generar_csv(consulta)
+        return ExportacionService._generar_ndjson(consulta)
+
+    @staticmethod
+    def _consulta(desde_id: int, categoria_id: Optional[int], activo: Optional[bool]):
+        """SELECT plano (sin ORM ni relaciones) con categoría, stock e imagen principal."""
+        consulta = select(
+            Producto.id_producto.label("id"),
+            Producto.sku,
+            Producto.nombre,
+            Producto.descripcion,
+            Producto.precio,
+            Producto.material,
+            Producto.alto_cm,
+            Producto.ancho_cm,
+            Producto.profundidad_cm,
+            Producto.activo,
+            Producto.id_categoria,
+            Categoria.nombre.label("categoria"),
+            Producto.stock_actual.label("stock"),
+            Producto.imagen_principal_url.label("imagen_principal"),
+            Producto.fecha_actualizacion,
+        ).select_from(Producto).outerjoin(
+            Categoria, Categoria.id_categoria == Producto.id_categoria
+        ).where(Producto.id_producto > desde_id)
+
+        if categoria_id is not None:
+            consulta = consulta.where(Producto.id_categoria == categoria_id)
+        if activo is not None:
+            consulta = consulta.where(Producto.activo.is_(activo))
+
+        return consulta.order_by(Producto.id_producto).execution_options(
+            stream_results=True, yield_per=FILAS_POR_BLOQUE
+        )
+
+    @staticmethod
+    def _filas(consulta) -> Iterator[list[dict[str, Any]]]:
+        """Recorrer el cursor del servidor de a FILAS_POR_BLOQUE filas."""
+        resultado = db.session.execute(consulta)
+        try:
+            for particion in resultado.mappings().partitions():
+                yield [ExportacionService._serializar(fila) for fila in particion]
+        finally:
+            resultado.close()
+
+    @staticmethod
+    def _serializar(fila) -> dict[str, Any]:
+        """Fila de la consulta -> valores JSON-compatibles (mismos tipos que Producto.to_dict)."""
+        datos = dict(fila)
+        for campo in ("precio", "alto_cm", "ancho_cm", "profundidad_cm"):
+            if datos[campo] is not None:
+                datos[campo] = float(datos[campo])
+        if datos["fecha_actualizacion"] is not None:
+            datos["fecha_actualizacion"] = datos["fecha_actualizacion"].isoformat()
+        datos["stock"] = datos["stock"] or 0
+        return datos
+
+    @staticmethod
+    def _generar_csv(consulta) -> Iterator[str]:
+        """Encabezado y luego un bloque CSV por partición del cursor."""
+        buffer = io.StringIO()
+        escritor = csv.DictWriter(buffer, fieldnames=COLUMNAS_EXPORTACION, lineterminator="\n")
+        escritor.writeheader()
+        yield buffer.getvalue()
+
+        for bloque in ExportacionService._filas(consulta):
+            buffer.seek(0)
+            buffer.truncate()
+            escritor.writerows(bloque)
+            yield buffer.getvalue()
+
+    @staticmethod
+    def _generar_ndjson(consulta) -> Iterator[str]:
+        """Un objeto JSON por línea, agrupados por partición del cursor."""
+        for bloque in ExportacionService._filas(consulta):
+            yield "".join(json.dumps(fila, ensure_ascii=False) + "\n" for fila in bloque)
+
+
+# Instancia singleton para uso directo (opcional)
+exportacion_service = ExportacionService()
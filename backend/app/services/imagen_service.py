@@ -0,0 +1,464 @@
+"""
+ImagenService - Almacenamiento y variantes de las imágenes de productos
+
+Los archivos subidos se guardan direccionados por contenido: mientras se escriben a
+disco se calcula su SHA-256 y quedan en `ab/cd/<sha256>.<ext>` dentro de UPLOAD_FOLDER.
+La misma foto subida para varios productos (juegos de muebles) ocupa un solo archivo
+con una sola URL, que el navegador cachea una vez. Cada fila de ImagenProducto que
+apunta a un archivo es una referencia: el archivo se borra recién cuando desaparece
+la última (ver `liberar_archivos`). En los borrados masivos esa revisión corre en el
+pool de hilos (`encolar_limpieza`), después del commit.
+
+/api/upload devuelve la URL de un archivo antes de que exista la fila que lo referencia
+(y si el contenido ya estaba, devuelve la URL del archivo existente). Por eso cada upload
+renueva el mtime del archivo y `liberar_archivos` no borra archivos subidos hace menos de
+UPLOADS_GRACE_SECONDS; los que quedan sin referencias se borran después con
+`flask imagenes limpiar-huerfanos`.
+
+Al subir una imagen se guarda el original y se encola la generación de variantes de
+tamaño fijo (thumb/card/detail) en WebP y JPEG. El trabajo corre en un pool de hilos,
+fuera del hilo del request; mientras tanto `ImagenProducto.to_dict` devuelve el
+original como fallback.
+
+Pillow es una dependencia opcional: si no está instalada no se generan variantes y
+el catálogo sigue sirviendo los originales.
+
+Para imágenes ya existentes usar el comando:
+    flask imagenes generar-variantes
+"""
+from __future__ import annotations
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Iterable
+
+from flask import Flask, current_app
+from sqlalchemy import func
+from werkzeug.datastructures import FileStorage
+from werkzeug.security import safe_join
+from werkzeug.utils import secure_filename
+
+from .. import db
+from ..cache import invalidar_producto
+from ..models import ImagenProducto, utc_now
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - Pillow es opcional
+    Image = None
+    ImageOps = None
+
+
+# Caja máxima (ancho, alto) de cada variante; se conserva la proporción
+VARIANTES_IMAGEN: dict[str, tuple[int, int]] = {
+    "thumb": (160, 160),
+    "card": (480, 480),
+    "detail": (1200, 1200),
+}
+
+# Formato de archivo -> (formato Pillow, opciones de guardado)
+FORMATOS_VARIANTE: dict[str, tuple[str, dict[str, Any]]] = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+PREFIJO_URL_UPLOADS = "/api/uploads/"
+TAMANO_BLOQUE_UPLOAD = 64 * 1024
+IDS_POR_CONSULTA = 1000
+
+# URL de un archivo direccionado por contenido: /api/uploads/ab/cd/<sha256>.<ext>
+PATRON_URL_HASH = re.compile(
+    rf"^{re.escape(PREFIJO_URL_UPLOADS)}[0-9a-f]{{2}}/[0-9a-f]{{2}}/(?P<hash>[0-9a-f]{{64}})\.[a-z0-9]+$"
+)
+
+# Ruta relativa de un original o variante direccionado por contenido (su contenido nunca cambia)
+PATRON_ARCHIVO_INMUTABLE = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(_[a-z]+)?\.[a-z0-9]+$")
+
+
+class ImagenServiceError(Exception):
+    """Excepción base para errores del servicio de imágenes"""
+
+    def __init__(self, message: str, status_code: int = 400) -> None:
+        self.message = message
+        self.status_code = status_code
+        super().__init__(self.message)
+
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Pool de hilos compartido por el proceso (se crea en el primer uso)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=current_app.config.get('IMAGE_VARIANTS_WORKERS', 2),
+                thread_name_prefix="imagenes"
+            )
+        return _executor
+
+
+class ImagenService:
+    """
+    Servicio de almacenamiento y generación de variantes de imágenes.
+
+    Uso en servicios/routes:
+        url, digest = ImagenService.guardar_upload(request.files['file'])
+        ImagenService.encolar_variantes(imagen.id_imagen)   # después del commit
+    """
+
+    @staticmethod
+    def disponible() -> bool:
+        """True si Pillow está instalado y la generación está habilitada en la configuración."""
+        return Image is not None and current_app.config.get('IMAGE_VARIANTS_ENABLED', True)
+
+    @staticmethod
+    def ruta_local(url: str | None) -> str | None:
+        """Ruta en disco de una URL de /api/uploads/, o None si la imagen es externa."""
+        upload_folder = current_app.config.get('UPLOAD_FOLDER')
+        if not url or not upload_folder or not url.startswith(PREFIJO_URL_UPLOADS):
+            return None
+        nombre = url[len(PREFIJO_URL_UPLOADS):]
+        if not nombre:
+            return None
+        return safe_join(upload_folder, nombre)
+
+    @staticmethod
+    def hash_de_url(url: str | None) -> str | None:
+        """SHA-256 de una URL direccionada por contenido (None para URLs externas o antiguas)."""
+        coincidencia = PATRON_URL_HASH.match(url or "")
+        return coincidencia.group("hash") if coincidencia else None
+
+    @staticmethod
+    def es_archivo_inmutable(nombre: str) -> bool:
+        """True si `nombre` (relativo a UPLOAD_FOLDER) es un archivo direccionado por contenido."""
+        return PATRON_ARCHIVO_INMUTABLE.match(nombre) is not None
+
+    # ------------------------------------------------------------------
+    # Almacenamiento direccionado por contenido
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def guardar_upload(archivo: FileStorage) -> tuple[str, str]:
+        """
+        Guardar un archivo subido en `ab/cd/<sha256>.<ext>`, calculando el hash mientras
+        se escribe (sin cargar el archivo entero en memoria).
+
+        Si ya existe un archivo con el mismo contenido se descarta la copia nueva.
+
+        Returns:
+            Tupla (url, sha256)
+
+        Raises:
+            ImagenServiceError: Si la carpeta de uploads no está configurada
+        """
+        upload_folder = current_app.config.get('UPLOAD_FOLDER')
+        if not upload_folder:
+            raise ImagenServiceError("Carpeta de uploads no configurada", status_code=500)
+
+        nombre_seguro = secure_filename(archivo.filename or "")
+        extension = nombre_seguro.rsplit('.', 1)[1].lower() if '.' in nombre_seguro else 'jpg'
+        if extension == 'jpeg':
+            extension = 'jpg'
+
+        carpeta_temporal = os.path.join(upload_folder, '.tmp')
+        os.makedirs(carpeta_temporal, exist_ok=True)
+        sha256 = hashlib.sha256()
+        descriptor, ruta_temporal = tempfile.mkstemp(dir=carpeta_temporal)
+        try:
+            with os.fdopen(descriptor, 'wb') as destino:
+                while True:
+                    bloque = archivo.stream.read(TAMANO_BLOQUE_UPLOAD)
+                    if not bloque:
+                        break
+                    sha256.update(bloque)
+                    destino.write(bloque)
+
+            digest = sha256.hexdigest()
+            relativa = f"{digest[:2]}/{digest[2:4]}/{digest}.{extension}"
+            ruta_final = os.path.join(upload_folder, relativa)
+            try:
+                # Contenido repetido: reusar el archivo y renovar su período de gracia
+                os.utime(ruta_final)
+                os.remove(ruta_temporal)
+            except FileNotFoundError:
+                os.makedirs(os.path.dirname(ruta_final), exist_ok=True)
+                os.replace(ruta_temporal, ruta_final)
+        except Exception:
+            if os.path.exists(ruta_temporal):
+                os.remove(ruta_temporal)
+            raise
+
+        return f"{PREFIJO_URL_UPLOADS}{relativa}", digest
+
+    @staticmethod
+    def encolar_variantes(imagen_id: int) -> Future | None:
+        """
+        Encolar la generación de variantes de una imagen ya guardada.
+
+        Returns:
+            El Future del trabajo, o None si no hay nada que generar
+        """
+        if not ImagenService.disponible():
+            return None
+        app = current_app._get_current_object()
+        return _get_executor().submit(ImagenService._procesar_en_contexto, app, imagen_id)
+
+    @staticmethod
+    def _procesar_en_contexto(app: Flask, imagen_id: int) -> None:
+        """Punto de entrada de los hilos del pool: abre su propio app context."""
+        with app.app_context():
+            try:
+                ImagenService.procesar_imagen(imagen_id)
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f"Error generando variantes de la imagen {imagen_id}: {str(e)}")
+            finally:
+                db.session.remove()
+
+    @staticmethod
+    def procesar_imagen(imagen_id: int, forzar: bool = False) -> bool:
+        """
+        Generar y registrar las variantes de una imagen (sincrónico).
+
+        Args:
+            imagen_id: ID de la imagen
+            forzar: Regenerar aunque la imagen ya tenga variantes
+
+        Returns:
+            True si se generaron variantes
+        """
+        imagen = db.session.get(ImagenProducto, imagen_id)
+        if imagen is None or (imagen.variantes and not forzar):
+            return False
+
+        ruta = ImagenService.ruta_local(imagen.url_imagen)
+        if ruta is None or not os.path.exists(ruta):
+            return False
+
+        # Mismo archivo ya procesado para otra fila: reutilizar sus variantes
+        existente = None if forzar else ImagenService._filtro_referencias(
+            db.session.query(ImagenProducto.variantes), imagen.url_imagen
+        ).filter(
+            ImagenProducto.id_imagen != imagen.id_imagen,
+            ImagenProducto.variantes.isnot(None)
+        ).first()
+        variantes = existente.variantes if existente else ImagenService.generar_variantes(
+            ruta, imagen.url_imagen
+        )
+        imagen.variantes = variantes
+        if imagen.producto:
+            imagen.producto.fecha_actualizacion = utc_now()
+        db.session.commit()
+        invalidar_producto(imagen.id_producto)
+        return True
+
+    @staticmethod
+    def generar_variantes(ruta_original: str, url_original: str) -> dict[str, dict[str, Any]]:
+        """
+        Escribir junto al original un archivo por variante y formato
+        (`<nombre>_<variante>.<formato>`, en la misma carpeta y con la misma URL base).
+
+        Returns:
+            {"thumb": {"ancho": 160, "alto": 120, "webp": url, "jpg": url}, ...}
+
+        Raises:
+            ImagenServiceError: Si Pillow no está instalado o el archivo no es una imagen
+        """
+        if Image is None:
+            raise ImagenServiceError("Pillow no está instalado", status_code=500)
+
+        carpeta, nombre = os.path.split(ruta_original)
+        base = os.path.splitext(nombre)[0]
+        url_carpeta = url_original.rsplit('/', 1)[0]
+        variantes: dict[str, dict[str, Any]] = {}
+
+        try:
+            with Image.open(ruta_original) as original:
+                # Respetar la orientación EXIF de las fotos de celular
+                original = ImageOps.exif_transpose(original)
+                if original.mode in ("RGBA", "LA", "P"):
+                    original = original.convert("RGBA")
+                    fondo = Image.new("RGB", original.size, (255, 255, 255))
+                    fondo.paste(original, mask=original.getchannel("A"))
+                    original = fondo
+                elif original.mode != "RGB":
+                    original = original.convert("RGB")
+
+                for variante, caja in VARIANTES_IMAGEN.items():
+                    copia = original.copy()
+                    copia.thumbnail(caja, Image.Resampling.LANCZOS)
+                    datos: dict[str, Any] = {"ancho": copia.width, "alto": copia.height}
+                    for extension, (formato, opciones) in FORMATOS_VARIANTE.items():
+                        nombre_variante = f"{base}_{variante}.{extension}"
+                        copia.save(os.path.join(carpeta, nombre_variante), formato, **opciones)
+                        datos[extension] = f"{url_carpeta}/{nombre_variante}"
+                    variantes[variante] = datos
+        except OSError as e:
+            raise ImagenServiceError(f"No se pudo procesar la imagen: {str(e)}")
+
+        return variantes
+
+    # ------------------------------------------------------------------
+    # Referencias y borrado de archivos
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _filtro_referencias(query, url: str):
+        """Filtrar las filas que apuntan a `url` (por hash indexado cuando es posible)."""
+        digest = ImagenService.hash_de_url(url)
+        if digest:
+            query = query.filter(ImagenProducto.hash_contenido == digest)
+        return query.filter(ImagenProducto.url_imagen == url)
+
+    @staticmethod
+    def contar_referencias(url: str) -> int:
+        """Cantidad de imágenes de productos que apuntan al archivo de `url`."""
+        return ImagenService._filtro_referencias(
+            db.session.query(func.count(ImagenProducto.id_imagen)), url
+        ).scalar()
+
+    @staticmethod
+    def archivos_de(imagenes: Iterable[ImagenProducto]) -> list[tuple[str, list[str]]]:
+        """
+        Capturar (url, urls de variantes) de imágenes que se van a borrar, para pasarlo a
+        `liberar_archivos` después del commit.
+        """
+        return [
+            (imagen.url_imagen, ImagenService._urls_variantes(imagen.variantes))
+            for imagen in imagenes
+        ]
+
+    @staticmethod
+    def archivos_de_productos(producto_ids: Iterable[int]) -> list[tuple[str, list[str]]]:
+        """
+        Igual que `archivos_de`, pero para todas las imágenes de varios productos y
+        leyendo solo las columnas necesarias (para borrados masivos).
+        """
+        ids = list(producto_ids)
+        archivos = []
+        for inicio in range(0, len(ids), IDS_POR_CONSULTA):
+            filas = db.session.query(ImagenProducto.url_imagen, ImagenProducto.variantes).filter(
+                ImagenProducto.id_producto.in_(ids[inicio:inicio + IDS_POR_CONSULTA])
+            )
+            archivos.extend((url, ImagenService._urls_variantes(variantes)) for url, variantes in filas)
+        return archivos
+
+    @staticmethod
+    def _urls_variantes(variantes: dict[str, Any] | None) -> list[str]:
+        return [
+            datos[extension]
+            for datos in (variantes or {}).values()
+            for extension in FORMATOS_VARIANTE if datos.get(extension)
+        ]
+
+    @staticmethod
+    def en_periodo_de_gracia(ruta: str) -> bool:
+        """True si el archivo se subió (o se volvió a subir) hace menos de UPLOADS_GRACE_SECONDS."""
+        try:
+            antiguedad = time.time() - os.path.getmtime(ruta)
+        except FileNotFoundError:
+            return False
+        return antiguedad < current_app.config.get('UPLOADS_GRACE_SECONDS', 3600)
+
+    @staticmethod
+    def liberar_archivos(archivos: Iterable[tuple[str, list[str]]]) -> int:
+        """
+        Borrar del disco los archivos (original y variantes) que ya no tienen ninguna
+        imagen que los referencie. Llamar después del commit que borró las filas.
+
+        Los archivos en período de gracia se conservan: un upload reciente puede haber
+        entregado su URL para una imagen que todavía no se guardó.
+
+        Returns:
+            Cantidad de archivos originales borrados
+        """
+        borrados = 0
+        revisadas = set()
+        for url, variantes in archivos:
+            ruta = ImagenService.ruta_local(url)
+            if ruta is None or url in revisadas:
+                continue
+            revisadas.add(url)
+            if ImagenService.contar_referencias(url) > 0 or ImagenService.en_periodo_de_gracia(ruta):
+                continue
+
+            for ruta_archivo in [ruta] + [ImagenService.ruta_local(v) for v in variantes]:
+                if ruta_archivo and os.path.exists(ruta_archivo):
+                    os.remove(ruta_archivo)
+            borrados += 1
+        return borrados
+
+    @staticmethod
+    def limpiar_huerfanos() -> int:
+        """
+        Borrar los archivos direccionados por contenido sin referencias y fuera del
+        período de gracia (uploads nunca asociados, o conservados por `liberar_archivos`).
+
+        Returns:
+            Cantidad de archivos originales borrados
+        """
+        upload_folder = current_app.config.get('UPLOAD_FOLDER')
+        if not upload_folder or not os.path.isdir(upload_folder):
+            return 0
+
+        archivos = []
+        for carpeta, subcarpetas, nombres in os.walk(upload_folder):
+            subcarpetas[:] = [nombre for nombre in subcarpetas if nombre != '.tmp']
+            relativa = os.path.relpath(carpeta, upload_folder).replace(os.sep, '/')
+            for nombre in nombres:
+                url = f"{PREFIJO_URL_UPLOADS}{relativa}/{nombre}"
+                if ImagenService.hash_de_url(url) is None:
+                    continue  # variantes, archivos sin hash o de otra carpeta
+                base = os.path.splitext(nombre)[0]
+                variantes = [
+                    f"{PREFIJO_URL_UPLOADS}{relativa}/{otro}" for otro in nombres if otro.startswith(f"{base}_")
+                ]
+                archivos.append((url, variantes))
+        return ImagenService.liberar_archivos(archivos)
+
+    @staticmethod
+    def encolar_limpieza(archivos: list[tuple[str, list[str]]]) -> Future | None:
+        """
+        Encolar `liberar_archivos` en el pool de hilos, para que un borrado masivo no
+        bloquee el request. Llamar después del commit que borró las filas.
+
+        Returns:
+            El Future del trabajo, o None si no hay archivos que revisar
+        """
+        if not archivos:
+            return None
+        app = current_app._get_current_object()
+        return _get_executor().submit(ImagenService._limpiar_en_contexto, app, archivos)
+
+    @staticmethod
+    def _limpiar_en_contexto(app: Flask, archivos: list[tuple[str, list[str]]]) -> None:
+        """Punto de entrada de los hilos del pool para la limpieza de archivos."""
+        with app.app_context():
+            try:
+                borrados = ImagenService.liberar_archivos(archivos)
+                app.logger.info(f"Limpieza de uploads: {borrados} archivo(s) borrado(s)")
+            except Exception as e:
+                app.logger.error(f"Error liberando archivos de imágenes: {str(e)}")
+            finally:
+                db.session.remove()
+
+    @staticmethod
+    def pendientes(forzar: bool = False) -> list[int]:
+        """IDs de las imágenes locales sin variantes (o todas las locales si forzar)."""
+        query = db.session.query(ImagenProducto.id_imagen).filter(
+            ImagenProducto.url_imagen.like(f"{PREFIJO_URL_UPLOADS}%")
+        )
+        if not forzar:
+            query = query.filter(ImagenProducto.variantes.is_(None))
+        return [fila.id_imagen for fila in query.order_by(ImagenProducto.id_imagen)]
+
+
+# Instancia singleton para uso directo (opcional)
+imagen_service = ImagenService()
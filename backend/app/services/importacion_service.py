@@ -0,0 +1,366 @@
+"""
+ImportacionService - Importación masiva de productos (catálogos de proveedores)
+
+Lee CSV o NDJSON en streaming (fila por fila, sin cargar el archivo en memoria) y
+procesa lotes de filas:
+
+1. Valida cada fila con los validadores de siempre (validate_sku, validate_positive_number).
+2. Resuelve categorías y SKUs existentes con UNA consulta por lote cada una.
+3. Escribe el lote con un único INSERT multi-fila ... ON CONFLICT (sku) DO UPDATE
+   (o DO NOTHING en modo "insert") y hace commit por lote.
+
+Los errores se informan por fila (número de fila del archivo) sin frenar la importación.
+"""
+from __future__ import annotations
+import csv
+import io
+import json
+import time
+from decimal import Decimal, InvalidOperation
+from typing import Any, IO, Iterator
+
+from sqlalchemy import func, or_
+from sqlalchemy import insert as sql_insert
+from sqlalchemy.dialects import postgresql, sqlite
+
+from .. import db
+from ..cache import invalidar_productos
+from ..models import Categoria, Producto, utc_now
+from ..utils.database import get_dialect_name
+from ..utils.validators import validate_positive_number, validate_sku
+
+FORMATOS_IMPORTACION = ("csv", "ndjson")
+MODOS_IMPORTACION = ("upsert", "insert")
+TAMANO_LOTE_DEFAULT = 1000
+TAMANO_LOTE_MAXIMO = 2000          # ~12 parámetros por fila: lejos del límite de SQLite/psycopg2
+MAX_ERRORES_REPORTADOS = 1000
+
+CAMPOS_DIMENSIONES = ("alto_cm", "ancho_cm", "profundidad_cm")
+# Máximos que admiten las columnas Numeric(10, 2) y Numeric(5, 2)
+PRECIO_MAXIMO = Decimal("99999999.99")
+DIMENSION_MAXIMA = Decimal("999.99")
+# Columnas que un upsert sobrescribe en productos existentes
+COLUMNAS_ACTUALIZABLES = (
+    "nombre", "descripcion", "precio", "material", "id_categoria",
+    *CAMPOS_DIMENSIONES, "fecha_actualizacion",
+)
+
+
+class ImportacionServiceError(Exception):
+    """Excepción base para errores del servicio de importación"""
+
+    def __init__(self, message: str, status_code: int = 400) -> None:
+        self.message = message
+        self.status_code = status_code
+        super().__init__(self.message)
+
+
+class ImportacionService:
+    """
+    Servicio de importación masiva de productos.
+
+    Uso en routes:
+        resumen = ImportacionService.importar_productos(request.stream, formato="csv")
+    """
+
+    @staticmethod
+    def importar_productos(
+        archivo: IO[bytes],
+        formato: str = "csv",
+        modo: str = "upsert",
+        tamano_lote: int = TAMANO_LOTE_DEFAULT
+    ) -> dict[str, Any]:
+        """
+        Importar productos desde un archivo CSV o NDJSON.
+
+        Columnas/campos: sku, nombre, precio, material, id_categoria o categoria (nombre),
+        y opcionalmente descripcion, alto_cm, ancho_cm, profundidad_cm.
+
+        Args:
+            archivo: Stream binario (archivo subido o cuerpo del request)
+            formato: "csv" o "ndjson"
+            modo: "upsert" actualiza los SKUs existentes; "insert" los informa como error
+            tamano_lote: Filas por lote (1..TAMANO_LOTE_MAXIMO)
+
+        Returns:
+            Resumen con procesadas, insertadas, actualizadas, errores por fila y filas/segundo
+
+        Raises:
+            ImportacionServiceError: Si el formato, el modo o el archivo son inválidos
+        """
+        if formato not in FORMATOS_IMPORTACION:
+            raise ImportacionServiceError(
+                f"Formato inválido. Debe ser uno de: {', '.join(FORMATOS_IMPORTACION)}"
+            )
+        if modo not in MODOS_IMPORTACION:
+            raise ImportacionServiceError(
+                f"Modo inválido. Debe ser uno de: {', '.join(MODOS_IMPORTACION)}"
+            )
+        if tamano_lote < 1 or tamano_lote > TAMANO_LOTE_MAXIMO:
+            raise ImportacionServiceError(f"lote debe estar entre 1 y {TAMANO_LOTE_MAXIMO}")
+
+        inicio = time.perf_counter()
+        resumen: dict[str, Any] = {
+            "procesadas": 0,
+            "insertadas": 0,
+            "actualizadas": 0,
+            "con_errores": 0,
+            "errores": [],
+        }
+
+        texto = io.TextIOWrapper(archivo, encoding="utf-8-sig", newline="")
+        filas = (
+            ImportacionService._leer_csv(texto) if formato == "csv"
+            else ImportacionService._leer_ndjson(texto)
+        )
+
+        lote: list[tuple[int, Any]] = []
+        for numero, fila in filas:
+            lote.append((numero, fila))
+            if len(lote) >= tamano_lote:
+                ImportacionService._procesar_lote(lote, modo, resumen)
+                lote = []
+        if lote:
+            ImportacionService._procesar_lote(lote, modo, resumen)
+
+        duracion = time.perf_counter() - inicio
+        resumen["duracion_ms"] = round(duracion * 1000, 1)
+        resumen["filas_por_segundo"] = round(resumen["procesadas"] / duracion) if duracion else None
+        resumen["errores_truncados"] = resumen["con_errores"] > len(resumen["errores"])
+        return resumen
+
+    # ------------------------------------------------------------------
+    # Lectura en streaming
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _leer_csv(texto: IO[str]) -> Iterator[tuple[int, Any]]:
+        """Filas del CSV como diccionarios (la fila 1 es el encabezado)."""
+        try:
+            lector = csv.DictReader(texto)
+            if not lector.fieldnames:
+                raise ImportacionServiceError("El archivo CSV está vacío o no tiene encabezado")
+            for numero, fila in enumerate(lector, start=2):
+                yield numero, fila
+        except (csv.Error, UnicodeDecodeError) as e:
+            raise ImportacionServiceError(f"CSV inválido: {str(e)}")
+
+    @staticmethod
+    def _leer_ndjson(texto: IO[str]) -> Iterator[tuple[int, Any]]:
+        """Un objeto JSON por línea; las líneas vacías se ignoran."""
+        try:
+            for numero, linea in enumerate(texto, start=1):
+                if not linea.strip():
+                    continue
+                try:
+                    yield numero, json.loads(linea)
+                except json.JSONDecodeError as e:
+                    yield numero, ImportacionServiceError(f"JSON inválido: {e.msg}")
+        except UnicodeDecodeError as e:
+            raise ImportacionServiceError(f"El archivo no está en UTF-8: {str(e)}")
+
+    # ------------------------------------------------------------------
+    # Validación y escritura por lote
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _procesar_lote(lote: list[tuple[int, Any]], modo: str, resumen: dict[str, Any]) -> None:
+        """Validar, resolver referencias y escribir un lote con un solo INSERT."""
+        resumen["procesadas"] += len(lote)
+        validas: list[tuple[int, dict[str, Any], Any]] = []
+        for numero, fila in lote:
+            try:
+                validas.append((numero, *ImportacionService._validar_fila(fila)))
+            except ImportacionServiceError as e:
+                ImportacionService._registrar_error(resumen, numero, fila, e.message)
+        if not validas:
+            return
+
+        # Una consulta para las categorías y otra para los SKUs de todo el lote
+        ids_categoria = {ref for _, _, ref in validas if isinstance(ref, int)}
+        nombres_categoria = {ref.lower() for _, _, ref in validas if isinstance(ref, str)}
+        categorias_por_id: set[int] = set()
+        categorias_por_nombre: dict[str, int] = {}
+        if ids_categoria or nombres_categoria:
+            for categoria in db.session.query(Categoria.id_categoria, Categoria.nombre).filter(
+                or_(
+                    Categoria.id_categoria.in_(ids_categoria),
+                    func.lower(Categoria.nombre).in_(nombres_categoria),
+                )
+            ):
+                categorias_por_id.add(categoria.id_categoria)
+                categorias_por_nombre.setdefault(categoria.nombre.lower(), categoria.id_categoria)
+
+        skus = [valores["sku"] for _, valores, _ in validas]
+        existentes = dict(
+            db.session.query(Producto.sku, Producto.id_producto).filter(Producto.sku.in_(skus)).all()
+        )
+
+        ahora = utc_now()
+        registros: dict[str, tuple[int, dict[str, Any]]] = {}
+        for numero, valores, ref in validas:
+            if isinstance(ref, int):
+                id_categoria = ref if ref in categorias_por_id else None
+            else:
+                id_categoria = categorias_por_nombre.get(ref.lower())
+            if id_categoria is None:
+                ImportacionService._registrar_error(resumen, numero, valores, "Categoría no encontrada")
+                continue
+            if valores["sku"] in registros:
+                ImportacionService._registrar_error(
+                    resumen, numero, valores, "SKU duplicado dentro del lote"
+                )
+                continue
+            if modo == "insert" and valores["sku"] in existentes:
+                ImportacionService._registrar_error(resumen, numero, valores, "El SKU ya existe")
+                continue
+
+            valores.update(
+                id_categoria=id_categoria,
+                activo=True,
+                fecha_creacion=ahora,
+                fecha_actualizacion=ahora,
+            )
+            registros[valores["sku"]] = (numero, valores)
+
+        if not registros:
+            return
+
+        try:
+            sentencia = ImportacionService._sentencia_upsert(modo)
+            if modo == "insert" and get_dialect_name() in ("postgresql", "sqlite"):
+                # ON CONFLICT DO NOTHING: solo cuentan los SKUs que devuelve RETURNING
+                # (otro proceso pudo insertar el mismo SKU después de la consulta de existentes)
+                insertados = set(db.session.scalars(
+                    sentencia.returning(Producto.__table__.c.sku),
+                    [valores for _, valores in registros.values()]
+                ))
+            else:
+                db.session.execute(sentencia, [valores for _, valores in registros.values()])
+                insertados = None
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            for numero, valores in registros.values():
+                ImportacionService._registrar_error(
+                    resumen, numero, valores, f"Error al guardar el lote: {str(e)}"
+                )
+            return
+
+        if insertados is not None:
+            for sku, (numero, valores) in registros.items():
+                if sku not in insertados:
+                    ImportacionService._registrar_error(resumen, numero, valores, "El SKU ya existe")
+            resumen["insertadas"] += len(insertados)
+            return
+
+        actualizados = [existentes[sku] for sku in registros if sku in existentes]
+        resumen["actualizadas"] += len(actualizados)
+        resumen["insertadas"] += len(registros) - len(actualizados)
+        invalidar_productos(actualizados)
+
+    @staticmethod
+    def _sentencia_upsert(modo: str):
+        """INSERT ... ON CONFLICT (sku) del dialecto actual (PostgreSQL/SQLite)."""
+        tabla = Producto.__table__
+        dialecto = get_dialect_name()
+        if dialecto == "postgresql":
+            sentencia = postgresql.insert(tabla)
+        elif dialecto == "sqlite":
+            sentencia = sqlite.insert(tabla)
+        else:
+            # Sin ON CONFLICT: los SKUs existentes ya se filtraron/validaron en el lote
+            return sql_insert(tabla)
+
+        if modo == "insert":
+            return sentencia.on_conflict_do_nothing(index_elements=[tabla.c.sku])
+        return sentencia.on_conflict_do_update(
+            index_elements=[tabla.c.sku],
+            set_={columna: sentencia.excluded[columna] for columna in COLUMNAS_ACTUALIZABLES},
+        )
+
+    @staticmethod
+    def _validar_fila(fila: Any) -> tuple[dict[str, Any], int | str]:
+        """
+        Validar y normalizar una fila.
+
+        Returns:
+            Tupla (valores para productos, id o nombre de la categoría a resolver)
+
+        Raises:
+            ImportacionServiceError: Con el motivo por el que la fila no es válida
+        """
+        if isinstance(fila, ImportacionServiceError):
+            raise fila
+        if not isinstance(fila, dict):
+            raise ImportacionServiceError("La fila debe ser un objeto")
+
+        def texto(campo: str) -> str:
+            valor = fila.get(campo)
+            return str(valor).strip() if valor is not None else ""
+
+        faltantes = [campo for campo in ("sku", "nombre", "precio", "material") if not texto(campo)]
+        if not texto("id_categoria") and not texto("categoria"):
+            faltantes.append("id_categoria o categoria")
+        if faltantes:
+            raise ImportacionServiceError(f"Campos requeridos faltantes: {', '.join(faltantes)}")
+
+        sku = texto("sku")
+        is_valid, error_msg = validate_sku(sku)
+        if not is_valid:
+            raise ImportacionServiceError(error_msg)
+
+        for campo, limite in (("nombre", 100), ("material", 100)):
+            if len(texto(campo)) > limite:
+                raise ImportacionServiceError(f"{campo} no puede superar {limite} caracteres")
+
+        valores: dict[str, Any] = {
+            "sku": sku,
+            "nombre": texto("nombre"),
+            "descripcion": texto("descripcion") or None,
+            "material": texto("material"),
+            "precio": ImportacionService._decimal(fila.get("precio"), "precio", PRECIO_MAXIMO),
+        }
+        for campo in CAMPOS_DIMENSIONES:
+            valores[campo] = (
+                ImportacionService._decimal(fila.get(campo), campo, DIMENSION_MAXIMA)
+                if texto(campo) else None
+            )
+
+        if texto("id_categoria"):
+            try:
+                referencia_categoria: int | str = int(texto("id_categoria"))
+            except ValueError:
+                raise ImportacionServiceError("id_categoria debe ser un número entero")
+        else:
+            referencia_categoria = texto("categoria")
+        return valores, referencia_categoria
+
+    @staticmethod
+    def _decimal(valor: Any, campo: str, maximo: Decimal) -> Decimal:
+        """Convertir a Decimal validando que sea un número positivo que entre en la columna."""
+        is_valid, error_msg = validate_positive_number(valor, campo)
+        if not is_valid:
+            raise ImportacionServiceError(error_msg)
+        try:
+            numero = Decimal(str(valor).strip())
+            if not numero.is_finite():
+                raise ImportacionServiceError(f"{campo} debe ser un número válido")
+            numero = numero.quantize(Decimal("0.01"))
+        except InvalidOperation:
+            raise ImportacionServiceError(f"{campo} debe ser un número válido")
+        if numero > maximo:
+            raise ImportacionServiceError(f"{campo} no puede superar {maximo}")
+        return numero
+
+    @staticmethod
+    def _registrar_error(resumen: dict[str, Any], numero: int, fila: Any, mensaje: str) -> None:
+        """Agregar un error por fila al resumen (hasta MAX_ERRORES_REPORTADOS)."""
+        resumen["con_errores"] += 1
+        if len(resumen["errores"]) < MAX_ERRORES_REPORTADOS:
+            sku = fila.get("sku") if isinstance(fila, dict) else None
+            resumen["errores"].append({"fila": numero, "sku": sku, "error": mensaje})
+
+
+# Instancia singleton para uso directo (opcional)
+importacion_service = ImportacionService()
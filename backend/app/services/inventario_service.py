@@ -0,0 +1,657 @@
+"""
+InventarioService - Movimientos de stock seguros ante concurrencia
+
+Reservar stock para una orden con "leer, comparar y restar en Python" sobrevende cuando
+dos checkouts del mismo producto se cruzan: ambos leen el mismo stock y ambos restan.
+Acá la reserva de todos los productos de una orden son dos sentencias, sin importar
+cuántas líneas tenga:
+
+1. SELECT ... FROM inventario WHERE id_producto IN (...) ORDER BY id_producto FOR UPDATE
+   bloquea las filas siempre en orden de id (dos órdenes con los mismos productos no
+   pueden generar un deadlock) y permite informar el faltante de cada item.
+2. UPDATE inventario SET cantidad_stock = cantidad_stock - CASE id_producto WHEN ... END
+   WHERE id_producto IN (...) AND cantidad_stock >= CASE ... END RETURNING ...
+   La condición se mantiene como resguardo en motores sin FOR UPDATE: si alguna fila
+   no se actualiza, la reserva falla y el llamador hace rollback.
+
+Cada cambio de stock deja una fila en movimientos_inventario (solo inserciones: motivo,
+orden, usuario y fecha), escrita con un único INSERT por operación dentro de la misma
+transacción. Los snapshots periódicos de stock (`tomar_snapshot`, programado con
+`flask inventario snapshot`) permiten responder "stock a la fecha X" y los reportes de
+movimientos con el último snapshot anterior más los movimientos desde ese snapshot,
+sin recorrer todo el historial.
+
+Las alertas de stock (`alertas`) salen de un índice parcial con solo las filas en alerta
+y se cachean unos segundos; cada cambio de stock las invalida.
+
+Las funciones de movimientos no hacen commit: participan de la transacción de quien llama.
+"""
+from __future__ import annotations
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from flask import current_app
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from sqlalchemy import and_, case, func, insert, literal, or_, select, text, update
+
+from .. import db
+from ..cache import TAG_PRODUCTOS, cached_value, invalidar_productos
+from ..models import (
+    ALERTA_STOCK, MOTIVOS_MOVIMIENTO, Inventario, MovimientoInventario, Producto, SnapshotStock,
+    sincronizar_resumen_productos, utc_now,
+)
+from ..utils.database import is_postgresql
+from ..utils.pagination import encode_cursor, decode_cursor
+from .producto_service import LIMITE_PAGINA_MAXIMO
+
+MAXIMO_AJUSTES = 10000
+IDS_POR_SENTENCIA = 1000
+
+
+class InventarioServiceError(Exception):
+    """
+    Excepción base para errores del servicio de inventario.
+
+    `items` detalla el error de cada producto ({"id_producto", "error"}) cuando el
+    problema es de stock; `message` es el del primero.
+    """
+
+    def __init__(self, message: str, status_code: int = 400, items: Optional[List[Dict[str, Any]]] = None) -> None:
+        self.message = message
+        self.status_code = status_code
+        self.items = items or []
+        super().__init__(self.message)
+
+
+class InventarioService:
+    """
+    Servicio de movimientos de stock.
+
+    Uso en routes (dentro de la transacción de la orden):
+        InventarioService.reservar({id_producto: cantidad, ...}, id_orden=7, id_usuario=2)
+        InventarioService.devolver({id_producto: cantidad, ...}, id_orden=7)
+    """
+
+    @staticmethod
+    def reservar(
+        cantidades: Mapping[int, int], id_orden: Optional[int] = None, id_usuario: Optional[int] = None
+    ) -> Dict[int, int]:
+        """
+        Descontar stock de varios productos (bloqueo ordenado + un UPDATE condicional)
+        y registrar los movimientos de venta.
+
+        Args:
+            cantidades: {id_producto: cantidad a descontar}
+            id_orden: Orden que origina la venta
+            id_usuario: Usuario (vendedor) que la registra
+
+        Returns:
+            {id_producto: stock resultante}
+
+        Raises:
+            InventarioServiceError: Si algún producto no tiene inventario o stock suficiente,
+                con el detalle de cada uno en `items` (el llamador debe hacer rollback)
+        """
+        if not cantidades:
+            return {}
+        ids = sorted(cantidades)
+        disponibles = dict(db.session.execute(
+            select(Inventario.id_producto, Inventario.cantidad_stock)
+            .where(Inventario.id_producto.in_(ids))
+            .order_by(Inventario.id_producto)
+            .with_for_update()
+        ).all())
+
+        faltantes = {
+            producto_id: disponibles.get(producto_id)
+            for producto_id in ids
+            if disponibles.get(producto_id) is None or disponibles[producto_id] < cantidades[producto_id]
+        }
+        if faltantes:
+            raise InventarioService._error_reserva(cantidades, faltantes)
+
+        cantidad = case(dict(cantidades), value=Inventario.id_producto)
+        resultantes = dict(db.session.execute(
+            update(Inventario)
+            .where(Inventario.id_producto.in_(ids), Inventario.cantidad_stock >= cantidad)
+            .values(cantidad_stock=Inventario.cantidad_stock - cantidad)
+            .returning(Inventario.id_producto, Inventario.cantidad_stock)
+            .execution_options(synchronize_session=False)
+        ).all())
+
+        if len(resultantes) != len(ids):
+            # Otra transacción descontó entre la lectura y el UPDATE (motor sin FOR UPDATE)
+            faltantes = {i: disponibles.get(i) for i in ids if i not in resultantes}
+            raise InventarioService._error_reserva(cantidades, faltantes)
+
+        InventarioService.registrar_movimientos((
+            {"id_producto": i, "cantidad": -cantidades[i], "stock_resultante": resultantes[i]}
+            for i in ids
+        ), "venta", id_orden, id_usuario)
+        return resultantes
+
+    @staticmethod
+    def devolver(
+        cantidades: Mapping[int, int], motivo: str = "cancelacion",
+        id_orden: Optional[int] = None, id_usuario: Optional[int] = None
+    ) -> Dict[int, int]:
+        """
+        Devolver stock (cancelación de órdenes) con un UPDATE relativo y registrar
+        los movimientos. Los productos sin inventario se ignoran.
+
+        Returns:
+            {id_producto: stock resultante} de los productos con inventario
+        """
+        if not cantidades:
+            return {}
+        resultantes = dict(db.session.execute(
+            update(Inventario)
+            .where(Inventario.id_producto.in_(sorted(cantidades)))
+            .values(cantidad_stock=Inventario.cantidad_stock + case(dict(cantidades), value=Inventario.id_producto))
+            .returning(Inventario.id_producto, Inventario.cantidad_stock)
+            .execution_options(synchronize_session=False)
+        ).all())
+        InventarioService.registrar_movimientos((
+            {"id_producto": i, "cantidad": cantidades[i], "stock_resultante": stock}
+            for i, stock in sorted(resultantes.items())
+        ), motivo, id_orden, id_usuario)
+        return resultantes
+
+    @staticmethod
+    def ajustar(
+        id_inventario: int, cantidad: int, motivo: str = "ajuste", id_usuario: Optional[int] = None
+    ) -> Optional[Inventario]:
+        """
+        Sumar (o restar, con cantidad negativa) stock de un inventario sin permitir
+        que quede negativo, y registrar el movimiento.
+
+        Returns:
+            El inventario actualizado, o None si no existe
+
+        Raises:
+            InventarioServiceError: Si el motivo es inválido o el stock quedaría negativo
+        """
+        InventarioService.validar_motivo(motivo)
+        fila = db.session.execute(
+            update(Inventario)
+            .where(Inventario.id_inventario == id_inventario, Inventario.cantidad_stock + cantidad >= 0)
+            .values(cantidad_stock=Inventario.cantidad_stock + cantidad)
+            .returning(Inventario.id_producto, Inventario.cantidad_stock)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if fila is None:
+            inventario = db.session.get(Inventario, id_inventario)
+            if inventario is None:
+                return None
+            raise InventarioServiceError("Stock no puede ser negativo")
+
+        if cantidad:
+            InventarioService.registrar_movimientos([
+                {"id_producto": fila.id_producto, "cantidad": cantidad, "stock_resultante": fila.cantidad_stock}
+            ], motivo, id_usuario=id_usuario)
+        return db.session.get(Inventario, id_inventario, populate_existing=True)
+
+    @staticmethod
+    def ajustar_lote(data: Dict[str, Any], id_usuario: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Aplicar muchos ajustes de stock (conteo físico, recepción de proveedor) en una
+        transacción, con consultas por bloques de IDS_POR_SENTENCIA productos:
+        SKUs -> ids, bloqueo ordenado del inventario, UPDATE con CASE y un único
+        INSERT de movimientos.
+
+        Args:
+            data: Diccionario con:
+                - items (list): [{"id_producto": int | "sku": str,
+                                  "cantidad": int (delta) | "cantidad_stock": int (conteo absoluto)}]
+                - motivo (str, opcional): motivo de los movimientos (default "ajuste")
+                - dry_run (bool, opcional): calcular los resultados sin modificar nada
+
+        Returns:
+            Resumen con "aplicados", "rechazados" y "resultados" (uno por item, en orden):
+            {"indice", "id_producto", "stock_anterior", "stock"} o {"indice", "error"}.
+            Un item rechazado (producto desconocido, repetido o stock negativo) no
+            impide aplicar el resto.
+        """
+        if not isinstance(data, dict):
+            raise InventarioServiceError("El cuerpo debe ser un objeto JSON")
+        items = data.get("items")
+        if not isinstance(items, list) or not items:
+            raise InventarioServiceError("items debe ser una lista no vacía")
+        if len(items) > MAXIMO_AJUSTES:
+            raise InventarioServiceError(f"items admite como máximo {MAXIMO_AJUSTES} elementos")
+        motivo = data.get("motivo", "ajuste")
+        InventarioService.validar_motivo(motivo)
+        dry_run = bool(data.get("dry_run", False))
+
+        resultados: List[Dict[str, Any]] = [{"indice": indice} for indice in range(len(items))]
+        validos = InventarioService._leer_ajustes(items, resultados)
+        skus = {item["sku"] for _, item in validos if "sku" in item}
+        ids_por_sku = InventarioService._ids_por_sku(skus)
+
+        # Resolver el producto de cada item (un producto solo puede aparecer una vez)
+        ajustes: Dict[int, Tuple[int, Dict[str, int]]] = {}
+        for indice, item in validos:
+            producto_id = item.get("id_producto", ids_por_sku.get(item.get("sku")))
+            if producto_id is None:
+                resultados[indice]["error"] = f"SKU {item['sku']} no encontrado"
+            elif producto_id in ajustes:
+                resultados[indice]["error"] = f"Producto {producto_id} repetido en el lote"
+            else:
+                ajustes[producto_id] = (indice, item)
+
+        try:
+            ids = sorted(ajustes)
+            actuales: Dict[int, int] = {}
+            for inicio in range(0, len(ids), IDS_POR_SENTENCIA):
+                actuales.update(db.session.execute(
+                    select(Inventario.id_producto, Inventario.cantidad_stock)
+                    .where(Inventario.id_producto.in_(ids[inicio:inicio + IDS_POR_SENTENCIA]))
+                    .order_by(Inventario.id_producto)
+                    .with_for_update()
+                ).all())
+
+            nuevos: Dict[int, int] = {}
+            for producto_id in ids:
+                indice, item = ajustes[producto_id]
+                resultado = resultados[indice]
+                if producto_id not in actuales:
+                    resultado["error"] = f"No hay inventario para el producto {producto_id}"
+                    continue
+                anterior = actuales[producto_id]
+                nuevo = item["cantidad_stock"] if "cantidad_stock" in item else anterior + item["cantidad"]
+                if nuevo < 0:
+                    resultado["error"] = f"Stock no puede ser negativo (actual: {anterior}, ajuste: {item['cantidad']})"
+                    continue
+                resultado.update(id_producto=producto_id, stock_anterior=anterior, stock=nuevo)
+                if nuevo != anterior:
+                    nuevos[producto_id] = nuevo
+
+            if not dry_run and nuevos:
+                modificados = sorted(nuevos)
+                for inicio in range(0, len(modificados), IDS_POR_SENTENCIA):
+                    bloque = modificados[inicio:inicio + IDS_POR_SENTENCIA]
+                    db.session.execute(
+                        update(Inventario)
+                        .where(Inventario.id_producto.in_(bloque))
+                        .values(cantidad_stock=case({i: nuevos[i] for i in bloque}, value=Inventario.id_producto))
+                        .execution_options(synchronize_session=False)
+                    )
+                    sincronizar_resumen_productos(bloque)
+                InventarioService.registrar_movimientos((
+                    {"id_producto": i, "cantidad": nuevos[i] - actuales[i], "stock_resultante": nuevos[i]}
+                    for i in modificados
+                ), motivo, id_usuario=id_usuario)
+                db.session.commit()
+            else:
+                db.session.rollback()
+        except Exception as e:
+            db.session.rollback()
+            raise InventarioServiceError(f"Error al aplicar ajustes de stock: {str(e)}", status_code=500)
+
+        if not dry_run and nuevos:
+            invalidar_productos(nuevos)
+        rechazados = sum(1 for resultado in resultados if "error" in resultado)
+        return {
+            "dry_run": dry_run,
+            "motivo": motivo,
+            "aplicados": len(resultados) - rechazados,
+            "rechazados": rechazados,
+            "resultados": resultados,
+        }
+
+    @staticmethod
+    def _leer_ajustes(items: List[Any], resultados: List[Dict[str, Any]]) -> List[Tuple[int, Dict[str, Any]]]:
+        """Validar la forma de cada item; los inválidos quedan con "error" en su resultado."""
+        validos = []
+        for indice, item in enumerate(items):
+            if not isinstance(item, dict) or ("id_producto" in item) == ("sku" in item):
+                resultados[indice]["error"] = "Cada item debe tener 'id_producto' o 'sku' (solo uno)"
+                continue
+            if ("cantidad" in item) == ("cantidad_stock" in item):
+                resultados[indice]["error"] = "Cada item debe tener 'cantidad' (delta) o 'cantidad_stock' (conteo)"
+                continue
+            valor = item.get("cantidad", item.get("cantidad_stock"))
+            producto_id = item.get("id_producto", 0)
+            if any(isinstance(v, bool) or not isinstance(v, int) for v in (valor, producto_id)):
+                resultados[indice]["error"] = "id_producto, cantidad y cantidad_stock deben ser enteros"
+                continue
+            if "cantidad_stock" in item and valor < 0:
+                resultados[indice]["error"] = "cantidad_stock no puede ser negativa"
+                continue
+            if "sku" in item and not isinstance(item["sku"], str):
+                resultados[indice]["error"] = "sku debe ser un texto"
+                continue
+            validos.append((indice, item))
+        return validos
+
+    @staticmethod
+    def _ids_por_sku(skus: Iterable[str]) -> Dict[str, int]:
+        """Resolver SKUs a ids de producto (una consulta por bloque)."""
+        skus = sorted(skus)
+        ids: Dict[str, int] = {}
+        for inicio in range(0, len(skus), IDS_POR_SENTENCIA):
+            ids.update(db.session.execute(
+                select(Producto.sku, Producto.id_producto)
+                .where(Producto.sku.in_(skus[inicio:inicio + IDS_POR_SENTENCIA]))
+            ).all())
+        return ids
+
+    @staticmethod
+    def registrar_cambio(
+        inventario: Inventario, stock_anterior: int, motivo: str, id_usuario: Optional[int] = None
+    ) -> None:
+        """Registrar el movimiento de un inventario modificado por ORM (alta o corrección)."""
+        delta = inventario.cantidad_stock - stock_anterior
+        if delta:
+            InventarioService.registrar_movimientos([{
+                "id_producto": inventario.id_producto,
+                "cantidad": delta,
+                "stock_resultante": inventario.cantidad_stock,
+            }], motivo, id_usuario=id_usuario)
+
+    # ------------------------------------------------------------------
+    # Historial de movimientos
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def validar_motivo(motivo: str) -> None:
+        if motivo not in MOTIVOS_MOVIMIENTO:
+            raise InventarioServiceError(f"Motivo inválido. Debe ser uno de: {', '.join(MOTIVOS_MOVIMIENTO)}")
+
+    @staticmethod
+    def registrar_movimientos(
+        movimientos: Iterable[Dict[str, int]], motivo: str,
+        id_orden: Optional[int] = None, id_usuario: Optional[int] = None
+    ) -> int:
+        """
+        Insertar movimientos ({id_producto, cantidad, stock_resultante}) con un solo
+        INSERT en la transacción en curso. Todos comparten motivo, orden, usuario y fecha.
+
+        Returns:
+            Cantidad de movimientos insertados
+        """
+        # La fecha se toma después de escribir el inventario (flush de cambios ORM pendientes):
+        # así queda ordenada respecto de un snapshot concurrente (ver tomar_snapshot)
+        db.session.flush()
+        fecha = utc_now()
+        filas = [
+            {**movimiento, "motivo": motivo, "id_orden": id_orden, "id_usuario": id_usuario, "fecha": fecha}
+            for movimiento in movimientos
+        ]
+        if filas:
+            db.session.execute(insert(MovimientoInventario), filas)
+        return len(filas)
+
+    @staticmethod
+    def usuario_actual() -> Optional[int]:
+        """Id del usuario del token JWT del request, si vino uno válido (el token es opcional)."""
+        try:
+            verify_jwt_in_request(optional=True)
+            identidad = get_jwt_identity()
+        except Exception:
+            return None
+        if isinstance(identidad, str):
+            try:
+                identidad = json.loads(identidad)
+            except json.JSONDecodeError:
+                return None
+        return identidad.get("id") if isinstance(identidad, dict) else None
+
+    @staticmethod
+    def leer_fecha(valor: Optional[str], campo: str) -> Optional[datetime]:
+        """Fecha ISO 8601 de un query param (sin zona horaria se asume UTC)."""
+        if not valor:
+            return None
+        try:
+            fecha = datetime.fromisoformat(valor)
+        except ValueError:
+            raise InventarioServiceError(f"{campo} debe ser una fecha ISO 8601 (YYYY-MM-DD[THH:MM:SS])")
+        return fecha if fecha.tzinfo else fecha.replace(tzinfo=timezone.utc)
+
+    @staticmethod
+    def listar_movimientos(
+        limit: int, cursor: Optional[str] = None, producto_id: Optional[int] = None,
+        motivo: Optional[str] = None, id_orden: Optional[int] = None,
+        desde: Optional[datetime] = None, hasta: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """
+        Movimientos más recientes primero, con paginación keyset por (fecha, id).
+
+        Returns:
+            Diccionario con "items", "next_cursor" y "has_more"
+        """
+        if limit < 1 or limit > LIMITE_PAGINA_MAXIMO:
+            raise InventarioServiceError(f"limit debe estar entre 1 y {LIMITE_PAGINA_MAXIMO}")
+
+        query = MovimientoInventario.query
+        if producto_id is not None:
+            query = query.filter(MovimientoInventario.id_producto == producto_id)
+        if motivo:
+            InventarioService.validar_motivo(motivo)
+            query = query.filter(MovimientoInventario.motivo == motivo)
+        if id_orden is not None:
+            query = query.filter(MovimientoInventario.id_orden == id_orden)
+        if desde is not None:
+            query = query.filter(MovimientoInventario.fecha > desde)
+        if hasta is not None:
+            query = query.filter(MovimientoInventario.fecha <= hasta)
+        if cursor:
+            ultima_fecha, ultimo_id = InventarioService._leer_cursor(cursor)
+            query = query.filter(or_(
+                MovimientoInventario.fecha < ultima_fecha,
+                and_(MovimientoInventario.fecha == ultima_fecha, MovimientoInventario.id_movimiento < ultimo_id),
+            ))
+
+        # Una fila extra indica si hay página siguiente sin hacer COUNT
+        movimientos = query.order_by(
+            MovimientoInventario.fecha.desc(), MovimientoInventario.id_movimiento.desc()
+        ).limit(limit + 1).all()
+        has_more = len(movimientos) > limit
+        movimientos = movimientos[:limit]
+
+        next_cursor = None
+        if has_more:
+            ultimo = movimientos[-1]
+            next_cursor = encode_cursor({"f": ultimo.fecha.isoformat(), "id": ultimo.id_movimiento})
+        return {
+            "items": [m.to_dict() for m in movimientos],
+            "next_cursor": next_cursor,
+            "has_more": has_more,
+        }
+
+    @staticmethod
+    def _leer_cursor(cursor: str) -> Tuple[datetime, int]:
+        try:
+            datos = decode_cursor(cursor)
+            return datetime.fromisoformat(datos["f"]), int(datos["id"])
+        except (KeyError, TypeError, ValueError):
+            raise InventarioServiceError("Cursor inválido")
+
+    # ------------------------------------------------------------------
+    # Snapshots y stock histórico
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def tomar_snapshot() -> Dict[str, Any]:
+        """
+        Guardar el stock actual de todos los productos con un INSERT ... SELECT (y commit).
+        Pensado para correr periódicamente (cron diario con `flask inventario snapshot`).
+
+        El replay toma los movimientos con fecha > fecha del snapshot, pero un movimiento
+        recibe su fecha antes del commit de su transacción. En PostgreSQL el snapshot toma
+        `LOCK TABLE inventario IN SHARE MODE`, que espera a las transacciones que ya
+        modificaron stock y frena las nuevas hasta el commit; recién entonces se toma la
+        fecha. Así todo movimiento incluido en el snapshot tiene fecha anterior y todo
+        movimiento no incluido, posterior.
+        """
+        try:
+            if is_postgresql():
+                db.session.execute(text("LOCK TABLE inventario IN SHARE MODE"))
+            fecha = utc_now()
+            resultado = db.session.execute(
+                insert(SnapshotStock).from_select(
+                    ["id_producto", "cantidad_stock", "fecha"],
+                    select(Inventario.id_producto, Inventario.cantidad_stock, literal(fecha, SnapshotStock.fecha.type))
+                    .where(Inventario.id_producto.isnot(None))
+                )
+            )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise InventarioServiceError(f"Error al tomar snapshot de stock: {str(e)}", status_code=500)
+        return {"fecha": fecha.isoformat(), "productos": resultado.rowcount}
+
+    @staticmethod
+    def _ultimo_snapshot(fecha: datetime, producto_ids: Optional[List[int]] = None):
+        """Subconsulta: fecha del último snapshot <= `fecha` de cada producto."""
+        consulta = select(
+            SnapshotStock.id_producto, func.max(SnapshotStock.fecha).label("fecha")
+        ).where(SnapshotStock.fecha <= fecha)
+        if producto_ids is not None:
+            consulta = consulta.where(SnapshotStock.id_producto.in_(producto_ids))
+        return consulta.group_by(SnapshotStock.id_producto).subquery()
+
+    @staticmethod
+    def stock_en_fecha(fecha: datetime, producto_ids: Optional[List[int]] = None) -> Dict[int, int]:
+        """
+        Stock de cada producto a una fecha: último snapshot anterior + movimientos
+        posteriores a ese snapshot hasta la fecha (dos consultas).
+
+        Returns:
+            {id_producto: stock}; los productos sin snapshot ni movimientos no aparecen
+        """
+        base = InventarioService._ultimo_snapshot(fecha, producto_ids)
+        stock = dict(db.session.execute(
+            select(SnapshotStock.id_producto, SnapshotStock.cantidad_stock).join(
+                base, and_(SnapshotStock.id_producto == base.c.id_producto, SnapshotStock.fecha == base.c.fecha)
+            )
+        ).all())
+
+        deltas = select(
+            MovimientoInventario.id_producto, func.sum(MovimientoInventario.cantidad)
+        ).outerjoin(
+            base, base.c.id_producto == MovimientoInventario.id_producto
+        ).where(
+            MovimientoInventario.fecha <= fecha,
+            or_(base.c.fecha.is_(None), MovimientoInventario.fecha > base.c.fecha)
+        )
+        if producto_ids is not None:
+            deltas = deltas.where(MovimientoInventario.id_producto.in_(producto_ids))
+        for producto_id, delta in db.session.execute(deltas.group_by(MovimientoInventario.id_producto)):
+            stock[producto_id] = stock.get(producto_id, 0) + int(delta)
+        return stock
+
+    @staticmethod
+    def resumen_movimientos(
+        desde: datetime, hasta: datetime, producto_ids: Optional[List[int]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Reporte por producto entre dos fechas: stock inicial (snapshot + replay),
+        entradas, salidas, neto por motivo y stock final.
+        """
+        if hasta < desde:
+            raise InventarioServiceError("'hasta' debe ser posterior a 'desde'")
+
+        iniciales = InventarioService.stock_en_fecha(desde, producto_ids)
+        consulta = select(
+            MovimientoInventario.id_producto,
+            MovimientoInventario.motivo,
+            func.sum(case((MovimientoInventario.cantidad > 0, MovimientoInventario.cantidad), else_=0)),
+            func.sum(case((MovimientoInventario.cantidad < 0, -MovimientoInventario.cantidad), else_=0)),
+        ).where(
+            MovimientoInventario.fecha > desde, MovimientoInventario.fecha <= hasta
+        )
+        if producto_ids is not None:
+            consulta = consulta.where(MovimientoInventario.id_producto.in_(producto_ids))
+
+        reporte: Dict[int, Dict[str, Any]] = {}
+        for producto_id, motivo, entradas, salidas in db.session.execute(
+            consulta.group_by(MovimientoInventario.id_producto, MovimientoInventario.motivo)
+        ):
+            fila = reporte.setdefault(producto_id, {
+                "id_producto": producto_id,
+                "stock_inicial": iniciales.get(producto_id, 0),
+                "entradas": 0,
+                "salidas": 0,
+                "por_motivo": {},
+            })
+            fila["entradas"] += int(entradas)
+            fila["salidas"] += int(salidas)
+            fila["por_motivo"][motivo] = int(entradas) - int(salidas)
+
+        for fila in reporte.values():
+            fila["stock_final"] = fila["stock_inicial"] + fila["entradas"] - fila["salidas"]
+        return [reporte[i] for i in sorted(reporte)]
+
+    # ==========================================================================
+    # ALERTAS DE STOCK
+    # ==========================================================================
+
+    @staticmethod
+    def alertas(solo_conteos: bool = False) -> Dict[str, Any]:
+        """
+        Productos agotados y con bajo stock, en una sola consulta sobre el índice parcial
+        ix_inventario_alerta_stock (ver ALERTA_STOCK en models.py).
+
+        El resultado se cachea INVENTARIO_ALERTAS_TTL segundos con el tag de productos:
+        todo cambio de stock ya llama a invalidar_producto(s) después del commit, así que
+        el TTL corto solo acota cuánto puede tardar en enterarse otro worker.
+
+        Args:
+            solo_conteos: Devolver solo los totales, sin leer ni serializar las filas
+        """
+        ttl = current_app.config.get('INVENTARIO_ALERTAS_TTL', 30)
+        if solo_conteos:
+            return cached_value("valor:alertas_stock:conteos", [TAG_PRODUCTOS], InventarioService._contar_alertas, ttl)
+        return cached_value("valor:alertas_stock", [TAG_PRODUCTOS], InventarioService._listar_alertas, ttl)
+
+    @staticmethod
+    def _contar_alertas() -> Dict[str, int]:
+        agotados, total = db.session.execute(
+            select(
+                func.count(case((Inventario.cantidad_stock <= 0, 1))),
+                func.count(),
+            ).select_from(Inventario).where(ALERTA_STOCK)
+        ).one()
+        return InventarioService._totales_alertas(agotados, total)
+
+    @staticmethod
+    def _listar_alertas() -> Dict[str, Any]:
+        agotados, bajo_stock = [], []
+        for inventario in db.session.scalars(
+            select(Inventario).where(ALERTA_STOCK).order_by(Inventario.cantidad_stock, Inventario.id_producto)
+        ):
+            (agotados if inventario.cantidad_stock <= 0 else bajo_stock).append(inventario.to_dict())
+        return {
+            "agotados": agotados,
+            "bajo_stock": bajo_stock,
+            **InventarioService._totales_alertas(len(agotados), len(agotados) + len(bajo_stock)),
+        }
+
+    @staticmethod
+    def _totales_alertas(agotados: int, total: int) -> Dict[str, int]:
+        return {"total_agotados": agotados, "total_bajo_stock": total - agotados, "total_alertas": total}
+
+    @staticmethod
+    def _error_reserva(cantidades: Mapping[int, int], faltantes: Mapping[int, Optional[int]]) -> InventarioServiceError:
+        """Error con un mensaje por producto ("sin inventario" o "stock insuficiente")."""
+        nombres = dict(db.session.execute(
+            select(Producto.id_producto, Producto.nombre).where(Producto.id_producto.in_(list(faltantes)))
+        ).all())
+        items = []
+        for producto_id, disponible in faltantes.items():
+            nombre = nombres.get(producto_id, str(producto_id))
+            if disponible is None:
+                error = f"No hay inventario para el producto {nombre}"
+            else:
+                error = (
+                    f"Stock insuficiente para {nombre}. "
+                    f"Disponible: {disponible}, Solicitado: {cantidades[producto_id]}"
+                )
+            items.append({"id_producto": producto_id, "error": error})
+        return InventarioServiceError(items[0]["error"], items=items)
+
+
+# Instancia singleton para uso directo (opcional)
+inventario_service = InventarioService()
@@ -0,0 +1,303 @@
+"""
+PapeleraService - Papelera de productos (listado paginado, restauración y purga masiva)
+
+Los productos desactivados quedan en la papelera con `fecha_eliminacion`. Desde acá
+se pueden restaurar o eliminar definitivamente en bloque, eligiéndolos por lista de
+ids o por antigüedad ("en la papelera hace más de N días").
+
+Las operaciones son set-based: se recorren los candidatos de a LOTE_PAPELERA ids
+(keyset por id) y cada lote es un UPDATE / DELETE ... WHERE id_producto IN (...).
+La purga confirma cada lote por separado para no retener locks de filas durante toda
+la operación, y el borrado de archivos de imágenes se encola en el pool de hilos
+de ImagenService después de cada commit.
+"""
+from __future__ import annotations
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, exists, or_, select, update
+
+from .. import db
+from ..cache import invalidar_productos
+from ..models import (
+    DetalleOrden, Favorito, ImagenProducto, Inventario, MovimientoInventario, Producto,
+    SnapshotStock, marcar_categorias_modificadas, opciones_carga_producto, utc_now,
+)
+from ..utils.pagination import encode_cursor, decode_cursor
+from .imagen_service import ImagenService
+from .producto_service import LIMITE_PAGINA_MAXIMO
+
+LOTE_PAPELERA = 500
+MAXIMO_IDS = 10000
+
+
+class PapeleraServiceError(Exception):
+    """Excepción base para errores del servicio de papelera"""
+
+    def __init__(self, message: str, status_code: int = 400) -> None:
+        self.message = message
+        self.status_code = status_code
+        super().__init__(self.message)
+
+
+class PapeleraService:
+    """
+    Servicio de la papelera de productos.
+
+    Uso en routes:
+        pagina = PapeleraService.listar_cursor(limit=50, cursor=request.args.get('cursor'))
+        resumen = PapeleraService.purgar({"dias": 30})
+    """
+
+    @staticmethod
+    def listar() -> List[Dict[str, Any]]:
+        """Todos los productos de la papelera, los eliminados más recientemente primero."""
+        productos = Producto.query.options(*opciones_carga_producto()).filter(
+            Producto.activo.is_(False)
+        ).order_by(*PapeleraService._orden()).all()
+        return [p.to_dict() for p in productos]
+
+    @staticmethod
+    def listar_cursor(limit: int, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Una página de la papelera con paginación keyset por (fecha_eliminacion, id).
+
+        Args:
+            limit: Cantidad máxima de productos (1..LIMITE_PAGINA_MAXIMO)
+            cursor: Cursor opaco de la página anterior (None = primera página)
+
+        Returns:
+            Diccionario con "items", "next_cursor" y "has_more"
+
+        Raises:
+            PapeleraServiceError: Si el límite o el cursor son inválidos
+        """
+        if limit < 1 or limit > LIMITE_PAGINA_MAXIMO:
+            raise PapeleraServiceError(f"limit debe estar entre 1 y {LIMITE_PAGINA_MAXIMO}")
+
+        query = Producto.query.options(*opciones_carga_producto()).filter(Producto.activo.is_(False))
+        if cursor:
+            ultima_fecha, ultimo_id = PapeleraService._leer_cursor(cursor)
+            query = query.filter(PapeleraService._despues_de(ultima_fecha, ultimo_id))
+
+        # Una fila extra indica si hay página siguiente sin hacer COUNT
+        productos = query.order_by(*PapeleraService._orden()).limit(limit + 1).all()
+        has_more = len(productos) > limit
+        productos = productos[:limit]
+
+        next_cursor = None
+        if has_more:
+            ultimo = productos[-1]
+            fecha = ultimo.fecha_eliminacion
+            next_cursor = encode_cursor({
+                "f": fecha.isoformat() if fecha else None,
+                "id": ultimo.id_producto,
+            })
+
+        return {
+            "items": [p.to_dict() for p in productos],
+            "next_cursor": next_cursor,
+            "has_more": has_more,
+        }
+
+    @staticmethod
+    def _orden():
+        # Productos sin fecha_eliminacion (anteriores a la columna) al final
+        return [Producto.fecha_eliminacion.desc().nulls_last(), Producto.id_producto.desc()]
+
+    @staticmethod
+    def _despues_de(ultima_fecha: Optional[datetime], ultimo_id: int):
+        """Condición keyset equivalente a `_orden` (con los NULL al final)."""
+        if ultima_fecha is None:
+            return and_(Producto.fecha_eliminacion.is_(None), Producto.id_producto < ultimo_id)
+        return or_(
+            Producto.fecha_eliminacion < ultima_fecha,
+            and_(Producto.fecha_eliminacion == ultima_fecha, Producto.id_producto < ultimo_id),
+            Producto.fecha_eliminacion.is_(None),
+        )
+
+    @staticmethod
+    def _leer_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+        try:
+            datos = decode_cursor(cursor)
+            ultimo_id = int(datos["id"])
+            fecha = datos.get("f")
+            return (datetime.fromisoformat(fecha) if fecha else None), ultimo_id
+        except (KeyError, TypeError, ValueError):
+            raise PapeleraServiceError("Cursor inválido")
+
+    # ------------------------------------------------------------------
+    # Selección de productos
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _leer_seleccion(data: Any) -> Tuple[Optional[List[int]], Optional[datetime]]:
+        """
+        Interpretar el cuerpo {"ids": [...]} o {"dias": N}.
+
+        Returns:
+            Tupla (ids, fecha de corte); exactamente uno de los dos no es None
+        """
+        if not isinstance(data, dict):
+            raise PapeleraServiceError("El cuerpo debe ser un objeto JSON")
+
+        tiene_ids = data.get("ids") is not None
+        tiene_dias = data.get("dias") is not None
+        if tiene_ids == tiene_dias:
+            raise PapeleraServiceError("Debe indicarse 'ids' o 'dias' (solo uno de los dos)")
+
+        if tiene_ids:
+            ids = data["ids"]
+            if not isinstance(ids, list) or not ids:
+                raise PapeleraServiceError("ids debe ser una lista no vacía")
+            if len(ids) > MAXIMO_IDS:
+                raise PapeleraServiceError(f"ids admite como máximo {MAXIMO_IDS} elementos")
+            try:
+                return sorted({int(i) for i in ids}), None
+            except (TypeError, ValueError):
+                raise PapeleraServiceError("ids debe contener solo enteros")
+
+        dias = data["dias"]
+        if isinstance(dias, bool) or not isinstance(dias, int) or dias < 0:
+            raise PapeleraServiceError("dias debe ser un entero mayor o igual a 0")
+        return None, utc_now() - timedelta(days=dias)
+
+    @staticmethod
+    def _lotes(ids: Optional[List[int]], corte: Optional[datetime]) -> Iterator[List[int]]:
+        """
+        Ids de productos en la papelera que cumplen la selección, de a LOTE_PAPELERA
+        (keyset por id, así los productos que se saltean no se vuelven a leer).
+        """
+        ultimo_id = 0
+        while True:
+            consulta = select(Producto.id_producto).where(
+                Producto.activo.is_(False), Producto.id_producto > ultimo_id
+            )
+            if ids is not None:
+                pendientes = [i for i in ids if i > ultimo_id][:LOTE_PAPELERA]
+                if not pendientes:
+                    return
+                consulta = consulta.where(Producto.id_producto.in_(pendientes))
+                ultimo_pedido = pendientes[-1]
+            else:
+                consulta = consulta.where(Producto.fecha_eliminacion <= corte)
+                ultimo_pedido = None
+
+            lote = list(db.session.execute(
+                consulta.order_by(Producto.id_producto).limit(LOTE_PAPELERA)
+            ).scalars())
+            if lote:
+                yield lote
+            elif ids is None:
+                return
+            ultimo_id = ultimo_pedido if ultimo_pedido is not None else lote[-1]
+
+    # ------------------------------------------------------------------
+    # Restaurar / purgar
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def restaurar(data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Restaurar productos de la papelera (activo=True) en una sola transacción.
+
+        Args:
+            data: {"ids": [int, ...]} o {"dias": N} (en la papelera hace más de N días)
+
+        Returns:
+            Resumen con "restaurados" y, si se pidieron ids, "no_encontrados"
+        """
+        ids, corte = PapeleraService._leer_seleccion(data)
+        ahora = utc_now()
+        restaurados: List[int] = []
+        try:
+            for lote in PapeleraService._lotes(ids, corte):
+                db.session.execute(
+                    update(Producto)
+                    .where(Producto.id_producto.in_(lote))
+                    .values(activo=True, fecha_eliminacion=None, fecha_actualizacion=ahora)
+                    .execution_options(synchronize_session=False)
+                )
+                restaurados.extend(lote)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise PapeleraServiceError(f"Error al restaurar productos: {str(e)}", status_code=500)
+
+        invalidar_productos(restaurados)
+        resumen: Dict[str, Any] = {"restaurados": len(restaurados)}
+        if ids is not None:
+            encontrados = set(restaurados)
+            resumen["no_encontrados"] = [i for i in ids if i not in encontrados]
+        return resumen
+
+    @staticmethod
+    def purgar(data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Eliminar definitivamente productos de la papelera.
+
+        Los productos con órdenes asociadas se conservan (se informan en "con_ordenes").
+        Cada lote se borra y confirma por separado; los archivos de imágenes que quedan
+        sin referencias se borran en segundo plano.
+
+        Args:
+            data: {"ids": [int, ...]} o {"dias": N} (en la papelera hace más de N días)
+
+        Returns:
+            Resumen con "eliminados", "con_ordenes", "archivos_en_revision" y, si se
+            pidieron ids, "no_encontrados"
+        """
+        ids, corte = PapeleraService._leer_seleccion(data)
+        eliminados: List[int] = []
+        con_ordenes: List[int] = []
+        archivos_en_revision = 0
+
+        for lote in PapeleraService._lotes(ids, corte):
+            tiene_ordenes = exists().where(DetalleOrden.id_producto == Producto.id_producto)
+            bloqueados = set(db.session.execute(
+                select(Producto.id_producto).where(Producto.id_producto.in_(lote), tiene_ordenes)
+            ).scalars())
+            borrables = [i for i in lote if i not in bloqueados]
+            con_ordenes.extend(i for i in lote if i in bloqueados)
+            if not borrables:
+                continue
+
+            archivos = ImagenService.archivos_de_productos(borrables)
+            try:
+                # Las versiones para ETags no cuentan productos: la baja se ve en la categoría
+                marcar_categorias_modificadas(db.session.execute(
+                    select(Producto.id_categoria.distinct()).where(Producto.id_producto.in_(borrables))
+                ).scalars())
+                for modelo in (ImagenProducto, MovimientoInventario, SnapshotStock, Inventario, Favorito, Producto):
+                    db.session.execute(
+                        delete(modelo)
+                        .where(modelo.id_producto.in_(borrables))
+                        .execution_options(synchronize_session=False)
+                    )
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                invalidar_productos(eliminados)
+                raise PapeleraServiceError(
+                    f"Error al eliminar productos (eliminados hasta ahora: {len(eliminados)}): {str(e)}",
+                    status_code=500
+                )
+
+            eliminados.extend(borrables)
+            ImagenService.encolar_limpieza(archivos)
+            archivos_en_revision += len(archivos)
+
+        invalidar_productos(eliminados)
+        resumen: Dict[str, Any] = {
+            "eliminados": len(eliminados),
+            "con_ordenes": con_ordenes,
+            "archivos_en_revision": archivos_en_revision,
+        }
+        if ids is not None:
+            procesados = set(eliminados) | set(con_ordenes)
+            resumen["no_encontrados"] = [i for i in ids if i not in procesados]
+        return resumen
+
+
+# Instancia singleton para uso directo (opcional)
+papelera_service = PapeleraService()
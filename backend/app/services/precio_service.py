@@ -0,0 +1,347 @@
+"""
+PrecioService - Actualización masiva de precios del catálogo
+
+Con la inflación se reajusta todo el catálogo (o categorías completas) varias veces
+al mes. En lugar de un PUT por producto (cargar entidad + commit por fila), aquí cada
+reajuste es un único UPDATE set-based dentro de una transacción:
+
+- Lista explícita `[{id, precio}]`: UPDATE ... SET precio = CASE id_producto WHEN ... END
+- Regla (porcentaje o monto fijo, filtrada por categoría, material o banda de precio):
+  UPDATE ... SET precio = <expresión SQL con redondeo> WHERE <filtros>
+
+Todas las filas tocadas comparten una misma `fecha_actualizacion` y el caché se
+invalida una sola vez al final. Con `dry_run` se devuelve la vista previa (la misma
+expresión, evaluada en un SELECT) sin modificar nada.
+"""
+from __future__ import annotations
+from decimal import Decimal, InvalidOperation, ROUND_CEILING, ROUND_FLOOR, ROUND_HALF_UP
+from typing import Any, Dict, Optional
+
+from sqlalchemy import Integer, Numeric, case, cast, func, literal, select, update
+
+from .. import db
+from ..cache import invalidar_productos
+from ..models import Producto, utc_now
+from ..utils.database import is_postgresql
+from .producto_service import ProductoService
+
+TIPOS_REGLA = ("porcentaje", "monto")
+MODOS_REDONDEO = ("cercano", "arriba", "abajo")
+REDONDEO_DEFAULT = Decimal("0.01")
+PRECIO_MAXIMO = Decimal("99999999.99")  # Numeric(10, 2)
+MAXIMO_ITEMS = 10000
+IDS_POR_SENTENCIA = 1000
+FILAS_MUESTRA = 50
+
+# Filtros aceptados por una regla (subconjunto de ProductoService.aplicar_filtros
+# que no requiere joins, para poder usarse directamente en el UPDATE)
+FILTROS_REGLA = ("materiales", "precio_min", "precio_max")
+
+_REDONDEO_DECIMAL = {
+    "cercano": ROUND_HALF_UP,
+    "arriba": ROUND_CEILING,
+    "abajo": ROUND_FLOOR,
+}
+
+
+class PrecioServiceError(Exception):
+    """Excepción base para errores del servicio de precios"""
+
+    def __init__(self, message: str, status_code: int = 400) -> None:
+        self.message = message
+        self.status_code = status_code
+        super().__init__(self.message)
+
+
+def _decimal(valor: Any, campo: str) -> Decimal:
+    """Convertir un valor del JSON a Decimal (sin pasar por float)."""
+    if isinstance(valor, bool):
+        raise PrecioServiceError(f"{campo} debe ser un número válido")
+    try:
+        numero = Decimal(str(valor))
+    except (InvalidOperation, TypeError, ValueError):
+        raise PrecioServiceError(f"{campo} debe ser un número válido")
+    if not numero.is_finite():
+        raise PrecioServiceError(f"{campo} debe ser un número válido")
+    return numero
+
+
+class PrecioService:
+    """
+    Servicio de reajuste masivo de precios.
+
+    Uso en routes:
+        resultado = PrecioService.actualizar_precios(request.get_json())
+        return jsonify(resultado), 200
+    """
+
+    @staticmethod
+    def actualizar_precios(data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Aplicar (o previsualizar) un reajuste masivo de precios.
+
+        Args:
+            data: Diccionario con:
+                - items (list): [{"id": int, "precio": number}] precios explícitos, o
+                - regla (dict): {"tipo": "porcentaje" | "monto", "valor": number,
+                                 "categoria_id": int, "materiales": [str],
+                                 "precio_min": number, "precio_max": number,
+                                 "activo": bool}
+                - redondeo (dict, opcional): {"paso": 0.01 | 1 | 10 | 100 ...,
+                                              "modo": "cercano" | "arriba" | "abajo"}
+                - dry_run (bool, opcional): solo calcular la vista previa
+
+        Returns:
+            Resumen con la cantidad de productos afectados (y la muestra si es dry_run)
+
+        Raises:
+            PrecioServiceError: Si el cuerpo es inválido o algún precio resultante
+                queda fuera de rango
+        """
+        if not isinstance(data, dict):
+            raise PrecioServiceError("El cuerpo debe ser un objeto JSON")
+
+        tiene_items = data.get("items") is not None
+        tiene_regla = data.get("regla") is not None
+        if tiene_items == tiene_regla:
+            raise PrecioServiceError("Debe indicarse 'items' o 'regla' (solo uno de los dos)")
+
+        paso, modo = PrecioService._validar_redondeo(data.get("redondeo"))
+        dry_run = bool(data.get("dry_run", False))
+
+        if tiene_items:
+            return PrecioService._actualizar_lista(data["items"], paso, modo, dry_run)
+        return PrecioService._actualizar_regla(data["regla"], paso, modo, dry_run)
+
+    # ------------------------------------------------------------------
+    # Validación
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _validar_redondeo(redondeo: Optional[Dict[str, Any]]) -> tuple[Decimal, str]:
+        """Política de redondeo: múltiplo (paso) y sentido."""
+        redondeo = redondeo or {}
+        if not isinstance(redondeo, dict):
+            raise PrecioServiceError("redondeo debe ser un objeto {paso, modo}")
+
+        paso = _decimal(redondeo.get("paso", REDONDEO_DEFAULT), "redondeo.paso")
+        if paso < REDONDEO_DEFAULT:
+            raise PrecioServiceError(f"redondeo.paso debe ser al menos {REDONDEO_DEFAULT}")
+
+        modo = redondeo.get("modo", "cercano")
+        if modo not in MODOS_REDONDEO:
+            raise PrecioServiceError(
+                f"redondeo.modo inválido. Debe ser uno de: {', '.join(MODOS_REDONDEO)}"
+            )
+        return paso, modo
+
+    @staticmethod
+    def _validar_rango(precio: Decimal, referencia: str) -> None:
+        if precio < 0:
+            raise PrecioServiceError(f"{referencia}: el precio no puede ser negativo")
+        if precio > PRECIO_MAXIMO:
+            raise PrecioServiceError(f"{referencia}: el precio supera el máximo ({PRECIO_MAXIMO})")
+
+    # ------------------------------------------------------------------
+    # Lista explícita
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _actualizar_lista(items: Any, paso: Decimal, modo: str, dry_run: bool) -> Dict[str, Any]:
+        """UPDATE con CASE id_producto WHEN ... (en sentencias de IDS_POR_SENTENCIA ids)."""
+        if not isinstance(items, list) or not items:
+            raise PrecioServiceError("items debe ser una lista no vacía de {id, precio}")
+        if len(items) > MAXIMO_ITEMS:
+            raise PrecioServiceError(f"items admite como máximo {MAXIMO_ITEMS} elementos")
+
+        precios: Dict[int, Decimal] = {}
+        for posicion, item in enumerate(items):
+            referencia = f"items[{posicion}]"
+            if not isinstance(item, dict) or "id" not in item or "precio" not in item:
+                raise PrecioServiceError(f"{referencia}: se requieren 'id' y 'precio'")
+            try:
+                producto_id = int(item["id"])
+            except (TypeError, ValueError):
+                raise PrecioServiceError(f"{referencia}: id debe ser un entero")
+            precio = PrecioService._redondear(_decimal(item["precio"], f"{referencia}.precio"), paso, modo)
+            PrecioService._validar_rango(precio, referencia)
+            precios[producto_id] = precio
+
+        ids = sorted(precios)
+        actuales: Dict[int, Any] = {}
+        for inicio in range(0, len(ids), IDS_POR_SENTENCIA):
+            bloque = ids[inicio:inicio + IDS_POR_SENTENCIA]
+            actuales.update(db.session.execute(
+                select(Producto.id_producto, Producto.precio).where(Producto.id_producto.in_(bloque))
+            ).all())
+
+        encontrados = [i for i in ids if i in actuales]
+        no_encontrados = [i for i in ids if i not in actuales]
+
+        if dry_run:
+            muestra = [
+                PrecioService._fila_muestra(i, actuales[i], precios[i])
+                for i in encontrados[:FILAS_MUESTRA]
+            ]
+            return PrecioService._resumen(
+                len(encontrados), True, no_encontrados=no_encontrados, muestra=muestra
+            )
+
+        ahora = utc_now()
+        try:
+            for inicio in range(0, len(encontrados), IDS_POR_SENTENCIA):
+                bloque = encontrados[inicio:inicio + IDS_POR_SENTENCIA]
+                nuevo = case(
+                    {i: literal(precios[i], Numeric(10, 2)) for i in bloque},
+                    value=Producto.id_producto
+                )
+                db.session.execute(
+                    update(Producto)
+                    .where(Producto.id_producto.in_(bloque))
+                    .values(precio=nuevo, fecha_actualizacion=ahora)
+                    .execution_options(synchronize_session=False)
+                )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise PrecioServiceError(f"Error al actualizar precios: {str(e)}", status_code=500)
+
+        invalidar_productos(encontrados)
+        return PrecioService._resumen(
+            len(encontrados), False, no_encontrados=no_encontrados, fecha_actualizacion=ahora
+        )
+
+    @staticmethod
+    def _redondear(precio: Decimal, paso: Decimal, modo: str) -> Decimal:
+        """Redondeo en Python (lista explícita); misma política que _redondear_sql."""
+        multiplos = (precio / paso).to_integral_value(rounding=_REDONDEO_DECIMAL[modo])
+        return (multiplos * paso).quantize(REDONDEO_DEFAULT)
+
+    # ------------------------------------------------------------------
+    # Regla
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _actualizar_regla(regla: Any, paso: Decimal, modo: str, dry_run: bool) -> Dict[str, Any]:
+        """UPDATE ... SET precio = <expresión> WHERE <filtros> en una única sentencia."""
+        if not isinstance(regla, dict):
+            raise PrecioServiceError("regla debe ser un objeto")
+
+        tipo = regla.get("tipo")
+        if tipo not in TIPOS_REGLA:
+            raise PrecioServiceError(f"regla.tipo inválido. Debe ser uno de: {', '.join(TIPOS_REGLA)}")
+        if "valor" not in regla:
+            raise PrecioServiceError("regla.valor es requerido")
+        valor = _decimal(regla["valor"], "regla.valor")
+        if tipo == "porcentaje" and valor <= -100:
+            raise PrecioServiceError("regla.valor debe ser mayor a -100 para un porcentaje")
+
+        categoria_id = regla.get("categoria_id")
+        activo = regla.get("activo")
+        filtros = {clave: regla[clave] for clave in FILTROS_REGLA if regla.get(clave) is not None}
+        if isinstance(filtros.get("materiales"), str):
+            filtros["materiales"] = [filtros["materiales"]]
+        for clave in ("precio_min", "precio_max"):
+            if clave in filtros:
+                filtros[clave] = _decimal(filtros[clave], f"regla.{clave}")
+
+        if tipo == "porcentaje":
+            bruto = Producto.precio * literal((100 + valor) / 100, Numeric(14, 6))
+        else:
+            bruto = Producto.precio + literal(valor, Numeric(12, 2))
+        nuevo = PrecioService._redondear_sql(bruto, paso, modo)
+
+        def filtrar(consulta):
+            return ProductoService.aplicar_filtros(
+                consulta, categoria_id=categoria_id, activo=activo, filtros=filtros
+            )
+
+        # Un solo SELECT de agregados: cantidad, totales y precios fuera de rango
+        totales = filtrar(db.session.query(
+            func.count(Producto.id_producto),
+            func.coalesce(func.sum(Producto.precio), 0),
+            func.coalesce(func.sum(nuevo), 0),
+            func.count(case((nuevo < 0, 1))),
+            func.count(case((nuevo > PRECIO_MAXIMO, 1))),
+        )).one()
+        afectados, total_actual, total_nuevo, negativos, excedidos = totales
+
+        if negativos:
+            raise PrecioServiceError(f"La regla dejaría {negativos} producto(s) con precio negativo")
+        if excedidos:
+            raise PrecioServiceError(
+                f"La regla dejaría {excedidos} producto(s) con precio mayor a {PRECIO_MAXIMO}"
+            )
+
+        if dry_run:
+            filas = filtrar(db.session.query(
+                Producto.id_producto, Producto.precio, nuevo
+            )).order_by(Producto.id_producto).limit(FILAS_MUESTRA).all()
+            return PrecioService._resumen(
+                afectados, True,
+                total_actual=float(total_actual),
+                total_nuevo=float(total_nuevo),
+                muestra=[PrecioService._fila_muestra(*fila) for fila in filas]
+            )
+
+        ahora = utc_now()
+        try:
+            ids = [fila[0] for fila in filtrar(db.session.query(Producto.id_producto))]
+            filtrar(db.session.query(Producto)).update(
+                {Producto.precio: nuevo, Producto.fecha_actualizacion: ahora},
+                synchronize_session=False
+            )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise PrecioServiceError(f"Error al actualizar precios: {str(e)}", status_code=500)
+
+        invalidar_productos(ids)
+        return PrecioService._resumen(
+            len(ids), False,
+            total_actual=float(total_actual),
+            total_nuevo=float(total_nuevo),
+            fecha_actualizacion=ahora
+        )
+
+    @staticmethod
+    def _redondear_sql(expresion, paso: Decimal, modo: str):
+        """
+        round/ceil/floor al múltiplo `paso`, evaluado por la base de datos.
+        SQLite no siempre trae ceil/floor, así que se emulan con CAST (los precios son >= 0).
+        """
+        paso_sql = literal(paso, Numeric(12, 2))
+        multiplos = expresion / paso_sql
+        if modo == "cercano":
+            redondeado = func.round(multiplos)
+        elif is_postgresql():
+            redondeado = func.ceil(multiplos) if modo == "arriba" else func.floor(multiplos)
+        else:
+            redondeado = cast(multiplos, Integer)
+            if modo == "arriba":
+                redondeado = redondeado + case((multiplos > redondeado, 1), else_=0)
+        return func.round(redondeado * paso_sql, 2)
+
+    # ------------------------------------------------------------------
+    # Respuesta
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _fila_muestra(producto_id: int, actual: Any, nuevo: Any) -> Dict[str, Any]:
+        return {
+            "id": producto_id,
+            "precio_actual": float(actual),
+            "precio_nuevo": float(nuevo),
+        }
+
+    @staticmethod
+    def _resumen(afectados: int, dry_run: bool, fecha_actualizacion=None, **extra) -> Dict[str, Any]:
+        resumen: Dict[str, Any] = {"dry_run": dry_run, "afectados": afectados}
+        if fecha_actualizacion is not None:
+            resumen["fecha_actualizacion"] = fecha_actualizacion.isoformat()
+        resumen.update(extra)
+        return resumen
+
+
+# Instancia singleton para uso directo (opcional)
+precio_service = PrecioService()
@@ -7,12 +7,48 @@ Esto permite:
 - Reutilizar lógica entre diferentes endpoints
 - Mantener routes más limpios y enfocados en HTTP
 """
+import os
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
 from typing import Dict, Any, List, Optional, Tuple
+from flask import current_app
+from sqlalchemy import case, func, select, tuple_
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
 
 from .. import db
-from ..models import Producto, Categoria, ImagenProducto, Inventario
+from ..cache import invalidar_producto
+from ..models import (
+    CAMPOS_TARJETA_PRODUCTO, Producto, Categoria, Favorito, ImagenProducto, Inventario,
+    marcar_categorias_modificadas, opciones_campos, opciones_carga_producto,
+    sincronizar_resumen_productos, utc_now,
+)
+from ..utils.database import is_postgresql
+from ..utils.pagination import encode_cursor, decode_cursor
 from ..utils.validators import validate_required_fields, validate_sku, validate_positive_number
+from .imagen_service import ImagenService
+
+
+# Claves de ordenamiento permitidas para la paginación por cursor.
+# Cada una está respaldada por un índice (clave, id_producto) en la tabla productos.
+CLAVES_ORDEN_CURSOR = {
+    "id": Producto.id_producto,
+    "precio": Producto.precio,
+    "fecha_creacion": Producto.fecha_creacion,
+}
+LIMITE_PAGINA_MAXIMO = 200
+
+# Filtros de rango del catálogo: <nombre>_min / <nombre>_max
+COLUMNAS_RANGO = {
+    "precio": Producto.precio,
+    "alto": Producto.alto_cm,
+    "ancho": Producto.ancho_cm,
+    "profundidad": Producto.profundidad_cm,
+}
+RANGOS_PRECIO_DEFAULT = [50000, 100000, 250000, 500000]
+
+# Productos de la misma categoría que se muestran en la página de un producto
+RELACIONADOS_PAGINA = 4
 
 
 class ProductoServiceError(Exception):
@@ -42,7 +78,9 @@ class ProductoService:
     @staticmethod
     def listar_productos(
         categoria_id: Optional[int] = None,
-        activo: Optional[bool] = None
+        activo: Optional[bool] = None,
+        filtros: Optional[Dict[str, Any]] = None,
+        fields: Optional[set] = None
     ) -> List[Dict[str, Any]]:
         """
         Obtener lista de productos con filtros opcionales.
@@ -50,20 +88,265 @@ class ProductoService:
         Args:
             categoria_id: Filtrar por categoría
             activo: Filtrar por estado activo/inactivo
+            filtros: Filtros adicionales (ver `aplicar_filtros`)
+            fields: Claves de Producto.to_dict() a devolver (None = todas); también
+                reduce el SELECT y las relaciones precargadas
             
         Returns:
             Lista de diccionarios con datos de productos
         """
-        query = Producto.query
+        opciones = opciones_campos(Producto, fields) if fields else opciones_carga_producto()
+        query = Producto.query.options(*opciones)
+        query = ProductoService.aplicar_filtros(query, categoria_id, activo, filtros)
+        
+        productos = query.all()
+        return [p.to_dict(fields) for p in productos]
+
+    @staticmethod
+    def listar_productos_cursor(
+        limit: int,
+        cursor: Optional[str] = None,
+        orden: str = "id",
+        categoria_id: Optional[int] = None,
+        activo: Optional[bool] = None,
+        filtros: Optional[Dict[str, Any]] = None,
+        fields: Optional[set] = None
+    ) -> Dict[str, Any]:
+        """
+        Obtener una página de productos usando paginación keyset (sin OFFSET).
+        
+        Args:
+            limit: Cantidad máxima de productos en la página (1..LIMITE_PAGINA_MAXIMO)
+            cursor: Cursor opaco devuelto por la página anterior (None = primera página)
+            orden: Clave de orden: "id", "precio" o "fecha_creacion"; prefijo "-" para descendente
+            categoria_id: Filtrar por categoría
+            activo: Filtrar por estado activo/inactivo
+            filtros: Filtros adicionales (ver `aplicar_filtros`)
+            fields: Claves de Producto.to_dict() a devolver en cada item (None = todas)
+            
+        Returns:
+            Diccionario con "items", "next_cursor" (None en la última página) y "has_more"
+            
+        Raises:
+            ProductoServiceError: Si el límite, el orden o el cursor son inválidos
+        """
+        if limit < 1 or limit > LIMITE_PAGINA_MAXIMO:
+            raise ProductoServiceError(f"limit debe estar entre 1 y {LIMITE_PAGINA_MAXIMO}")
+        
+        descendente = orden.startswith("-")
+        clave = orden.lstrip("-")
+        if clave not in CLAVES_ORDEN_CURSOR:
+            raise ProductoServiceError(
+                f"Orden inválido. Debe ser uno de: {', '.join(CLAVES_ORDEN_CURSOR)}"
+            )
+        columna = CLAVES_ORDEN_CURSOR[clave]
+        
+        if fields:
+            # La columna de orden se necesita para armar el cursor aunque no se devuelva
+            opciones = opciones_campos(Producto, fields, columnas_extra=(columna.key,))
+        else:
+            opciones = opciones_carga_producto()
+        query = Producto.query.options(*opciones)
+        query = ProductoService.aplicar_filtros(query, categoria_id, activo, filtros)
+        
+        if cursor:
+            ultimo_id, ultimo_valor = ProductoService._leer_cursor(cursor, orden, clave)
+            if clave == "id":
+                condicion = Producto.id_producto < ultimo_id if descendente else Producto.id_producto > ultimo_id
+            else:
+                fila = tuple_(columna, Producto.id_producto)
+                limite = tuple_(ultimo_valor, ultimo_id)
+                condicion = fila < limite if descendente else fila > limite
+            query = query.filter(condicion)
+        
+        if clave == "id":
+            criterios = [Producto.id_producto.desc() if descendente else Producto.id_producto.asc()]
+        elif descendente:
+            criterios = [columna.desc(), Producto.id_producto.desc()]
+        else:
+            criterios = [columna.asc(), Producto.id_producto.asc()]
+        
+        # Pedimos una fila extra para saber si hay página siguiente sin hacer COUNT
+        productos = query.order_by(*criterios).limit(limit + 1).all()
+        has_more = len(productos) > limit
+        productos = productos[:limit]
+        
+        next_cursor = None
+        if has_more:
+            ultimo = productos[-1]
+            valor = getattr(ultimo, columna.key)
+            next_cursor = encode_cursor({
+                "o": orden,
+                "id": ultimo.id_producto,
+                "v": valor.isoformat() if isinstance(valor, datetime) else valor,
+            })
+        
+        return {
+            "items": [p.to_dict(fields) for p in productos],
+            "next_cursor": next_cursor,
+            "has_more": has_more,
+        }
+
+    @staticmethod
+    def aplicar_filtros(
+        query,
+        categoria_id: Optional[int] = None,
+        activo: Optional[bool] = None,
+        filtros: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Aplicar los filtros del catálogo a una consulta cuya entidad principal es Producto.
         
+        Args:
+            query: Consulta SQLAlchemy (de entidades o de columnas de Producto)
+            categoria_id: Filtrar por categoría
+            activo: Filtrar por estado activo/inactivo
+            filtros: Diccionario opcional con:
+                - precio_min / precio_max, alto_min / alto_max, ancho_min / ancho_max,
+                  profundidad_min / profundidad_max (float): rangos inclusivos
+                - materiales (list[str]): uno o más materiales
+                - en_stock (bool): solo con stock (True) o solo sin stock (False)
+                
+        Returns:
+            La consulta filtrada
+        """
         if categoria_id is not None:
-            query = query.filter_by(id_categoria=categoria_id)
+            query = query.filter(Producto.id_categoria == categoria_id)
         
         if activo is not None:
-            query = query.filter_by(activo=activo)
+            query = query.filter(Producto.activo == activo)
         
-        productos = query.all()
-        return [p.to_dict() for p in productos]
+        filtros = filtros or {}
+        
+        for nombre, columna in COLUMNAS_RANGO.items():
+            minimo = filtros.get(f"{nombre}_min")
+            maximo = filtros.get(f"{nombre}_max")
+            if minimo is not None:
+                query = query.filter(columna >= minimo)
+            if maximo is not None:
+                query = query.filter(columna <= maximo)
+        
+        materiales = filtros.get("materiales")
+        if materiales:
+            query = query.filter(Producto.material.in_(materiales))
+        
+        en_stock = filtros.get("en_stock")
+        if en_stock is not None:
+            query = query.filter(Producto.en_stock.is_(bool(en_stock)))
+        
+        return query
+
+    @staticmethod
+    def calcular_facetas(
+        categoria_id: Optional[int] = None,
+        activo: Optional[bool] = None,
+        filtros: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Contar productos por material, por categoría y por rango de precio para los
+        filtros actuales, en una sola pasada sobre los productos.
+        
+        En PostgreSQL usa GROUPING SETS (un único escaneo que produce las tres
+        agregaciones). En otros motores agrupa por la combinación de las tres
+        dimensiones (también un único escaneo) y suma cada faceta en Python.
+        
+        Args:
+            categoria_id, activo, filtros: Mismos filtros que `listar_productos`
+            
+        Returns:
+            Diccionario con las listas "material", "categoria" y "precio"
+        """
+        limites = current_app.config.get('CATALOG_PRICE_BUCKETS') or RANGOS_PRECIO_DEFAULT
+        rango_precio = case(
+            *[(Producto.precio < limite, indice) for indice, limite in enumerate(limites)],
+            else_=len(limites)
+        )
+        
+        base = db.session.query(
+            Producto.material.label("material"),
+            Producto.id_categoria.label("id_categoria"),
+            Categoria.nombre.label("categoria"),
+            rango_precio.label("rango"),
+        ).outerjoin(Categoria, Producto.id_categoria == Categoria.id_categoria)
+        base = ProductoService.aplicar_filtros(base, categoria_id, activo, filtros).subquery()
+        
+        por_material: Dict[str, int] = {}
+        por_categoria: Dict[Tuple[Any, Any], int] = {}
+        por_rango: Dict[int, int] = {}
+        
+        if is_postgresql():
+            filas = db.session.query(
+                base.c.material,
+                base.c.id_categoria,
+                base.c.categoria,
+                base.c.rango,
+                func.grouping(base.c.material).label("sin_material"),
+                func.grouping(base.c.id_categoria).label("sin_categoria"),
+                func.count().label("cantidad"),
+            ).group_by(
+                func.grouping_sets(
+                    tuple_(base.c.material),
+                    tuple_(base.c.id_categoria, base.c.categoria),
+                    tuple_(base.c.rango),
+                )
+            ).all()
+            for fila in filas:
+                if fila.sin_material == 0:
+                    por_material[fila.material] = fila.cantidad
+                elif fila.sin_categoria == 0:
+                    por_categoria[(fila.id_categoria, fila.categoria)] = fila.cantidad
+                else:
+                    por_rango[fila.rango] = fila.cantidad
+        else:
+            filas = db.session.query(
+                base.c.material,
+                base.c.id_categoria,
+                base.c.categoria,
+                base.c.rango,
+                func.count().label("cantidad"),
+            ).group_by(
+                base.c.material, base.c.id_categoria, base.c.categoria, base.c.rango
+            ).all()
+            for fila in filas:
+                por_material[fila.material] = por_material.get(fila.material, 0) + fila.cantidad
+                clave = (fila.id_categoria, fila.categoria)
+                por_categoria[clave] = por_categoria.get(clave, 0) + fila.cantidad
+                por_rango[fila.rango] = por_rango.get(fila.rango, 0) + fila.cantidad
+        
+        bordes = [None] + list(limites) + [None]
+        return {
+            "material": [
+                {"valor": material, "cantidad": cantidad}
+                for material, cantidad in sorted(por_material.items(), key=lambda x: (-x[1], x[0] or ""))
+            ],
+            "categoria": [
+                {"id": id_categoria, "nombre": nombre, "cantidad": cantidad}
+                for (id_categoria, nombre), cantidad in sorted(
+                    por_categoria.items(), key=lambda x: (-x[1], x[0][1] or "")
+                )
+            ],
+            "precio": [
+                {"desde": bordes[i], "hasta": bordes[i + 1], "cantidad": por_rango.get(i, 0)}
+                for i in range(len(limites) + 1)
+            ],
+        }
+
+    @staticmethod
+    def _leer_cursor(cursor: str, orden: str, clave: str) -> Tuple[int, Any]:
+        """Decodificar y validar un cursor, devolviendo (ultimo_id, ultimo_valor)."""
+        try:
+            datos = decode_cursor(cursor)
+            if datos.get("o") != orden:
+                raise ValueError(orden)
+            ultimo_id = int(datos["id"])
+            valor = datos.get("v")
+            if clave == "precio":
+                valor = Decimal(str(valor))
+            elif clave == "fecha_creacion":
+                valor = datetime.fromisoformat(valor)
+            return ultimo_id, valor
+        except (KeyError, TypeError, ValueError, InvalidOperation):
+            raise ProductoServiceError("Cursor inválido o no corresponde al orden solicitado")
 
     @staticmethod
     def obtener_producto(producto_id: int) -> Dict[str, Any]:
@@ -79,11 +362,142 @@ class ProductoService:
         Raises:
             ProductoServiceError: Si el producto no existe
         """
-        producto = Producto.query.get(producto_id)
+        producto = db.session.get(Producto, producto_id, options=opciones_carga_producto())
         if not producto:
             raise ProductoServiceError("Producto no encontrado", status_code=404)
         return producto.to_dict()
 
+    @staticmethod
+    def pagina_producto(producto_id: int, relacionados: int = RELACIONADOS_PAGINA) -> Dict[str, Any]:
+        """
+        Datos compartidos de la página de un producto (iguales para todos los clientes):
+        el producto completo (imágenes y stock incluidos) y productos relacionados de la
+        misma categoría en formato tarjeta.
+        
+        Usa siempre 3 consultas: producto + categoría, imágenes, relacionados.
+        
+        Args:
+            producto_id: ID del producto
+            relacionados: Cantidad máxima de productos relacionados
+            
+        Returns:
+            Diccionario con "producto" y "relacionados"
+            
+        Raises:
+            ProductoServiceError: Si el producto no existe
+        """
+        producto = db.session.get(Producto, producto_id, options=opciones_carga_producto())
+        if not producto:
+            raise ProductoServiceError("Producto no encontrado", status_code=404)
+        
+        tarjetas = []
+        if producto.id_categoria is not None and relacionados > 0:
+            similares = Producto.query.options(
+                *opciones_campos(Producto, CAMPOS_TARJETA_PRODUCTO)
+            ).filter(
+                Producto.id_categoria == producto.id_categoria,
+                Producto.id_producto != producto_id,
+                Producto.activo.is_(True)
+            ).order_by(
+                Producto.en_stock.desc(), Producto.id_producto
+            ).limit(relacionados).all()
+            # La categoría es la del producto: no hace falta el join por cada tarjeta
+            nombre_categoria = producto.categoria.nombre if producto.categoria else None
+            tarjetas = [
+                {**p.to_dict(CAMPOS_TARJETA_PRODUCTO), "categoria": nombre_categoria}
+                for p in similares
+            ]
+        
+        return {"producto": producto.to_dict(), "relacionados": tarjetas}
+
+    @staticmethod
+    def estado_cliente(producto_id: int, cliente_id: int) -> Dict[str, Any]:
+        """
+        Parte de la página de un producto que depende del cliente (no se cachea).
+        
+        Returns:
+            Diccionario con "id_cliente", "favorito" e "id_favorito"
+        """
+        id_favorito = db.session.execute(
+            select(Favorito.id_favorito).where(
+                Favorito.id_cliente == cliente_id,
+                Favorito.id_producto == producto_id
+            ).limit(1)
+        ).scalar()
+        return {
+            "id_cliente": cliente_id,
+            "favorito": id_favorito is not None,
+            "id_favorito": id_favorito,
+        }
+
+    @staticmethod
+    def version_catalogo() -> Tuple[Any, ...]:
+        """
+        Versión del catálogo completo para calcular ETags, en una sola consulta barata:
+        última modificación de productos (índice en fecha_actualizacion) y de categorías.
+        
+        Los cambios de stock e imágenes ya actualizan productos.fecha_actualizacion
+        (sincronizar_resumen_productos) y las eliminaciones permanentes actualizan la
+        fecha de la categoría (marcar_categorias_modificadas), así que no hace falta
+        contar productos ni recorrer inventario.
+        
+        Returns:
+            Tupla que cambia siempre que cambia algún dato visible en los listados
+        """
+        consulta = select(
+            select(func.max(Producto.fecha_actualizacion)).scalar_subquery(),
+            select(func.max(Categoria.fecha_actualizacion)).scalar_subquery(),
+        )
+        return tuple(db.session.execute(consulta).one())
+
+    @staticmethod
+    def version_producto(producto_id: int) -> Optional[Tuple[Any, ...]]:
+        """
+        Versión de un producto (producto, su inventario y su categoría) para calcular ETags.
+        
+        Returns:
+            Tupla de marcas de tiempo, o None si el producto no existe
+        """
+        consulta = select(
+            Producto.fecha_actualizacion,
+            Inventario.utlima_actualizacion,
+            Categoria.fecha_actualizacion,
+        ).select_from(Producto).outerjoin(
+            Inventario, Inventario.id_producto == Producto.id_producto
+        ).outerjoin(
+            Categoria, Categoria.id_categoria == Producto.id_categoria
+        ).where(Producto.id_producto == producto_id)
+        fila = db.session.execute(consulta).first()
+        return tuple(fila) if fila else None
+
+    @staticmethod
+    def version_pagina_producto(producto_id: int) -> Optional[Tuple[Any, ...]]:
+        """
+        Versión de la página de un producto: la del producto (ver version_producto) más
+        la última modificación de los productos de su categoría, que cubre la lista de
+        relacionados. Usa el índice (id_categoria, fecha_actualizacion), así que un
+        cambio en otra categoría no invalida la página.
+        
+        Returns:
+            Tupla de marcas de tiempo, o None si el producto no existe
+        """
+        otros = aliased(Producto)
+        ultima_de_categoria = select(func.max(otros.fecha_actualizacion)).where(
+            otros.id_categoria == Producto.id_categoria
+        ).scalar_subquery()
+        consulta = select(
+            Producto.fecha_actualizacion,
+            Inventario.utlima_actualizacion,
+            Categoria.fecha_actualizacion,
+            ultima_de_categoria,
+        ).select_from(Producto).outerjoin(
+            Inventario, Inventario.id_producto == Producto.id_producto
+        ).outerjoin(
+            Categoria, Categoria.id_categoria == Producto.id_categoria
+        ).where(Producto.id_producto == producto_id)
+        fila = db.session.execute(consulta).first()
+        return tuple(fila) if fila else None
+
     @staticmethod
     def crear_producto(data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -146,6 +560,7 @@ class ProductoService:
         try:
             db.session.add(nuevo_producto)
             db.session.commit()
+            invalidar_producto(nuevo_producto.id_producto)
             return nuevo_producto.to_dict()
         except IntegrityError as e:
             db.session.rollback()
@@ -191,6 +606,10 @@ class ProductoService:
             "alto_cm", "ancho_cm", "profundidad_cm", "material"
         ]
         
+        # Si cambia de categoría, la anterior pierde un relacionado sin que cambie ninguna
+        # de sus filas: se marca para que cambie la versión de sus páginas
+        categoria_anterior = producto.id_categoria
+        
         for campo in campos_actualizables:
             if campo in data:
                 valor = data[campo]
@@ -199,7 +618,10 @@ class ProductoService:
                 setattr(producto, campo, valor)
         
         try:
+            if producto.id_categoria != categoria_anterior:
+                marcar_categorias_modificadas([categoria_anterior])
             db.session.commit()
+            invalidar_producto(producto_id)
             return producto.to_dict()
         except Exception as e:
             db.session.rollback()
@@ -229,12 +651,21 @@ class ProductoService:
         
         try:
             producto.activo = False
+            producto.fecha_eliminacion = utc_now()
             
-            # Poner stock en 0 si tiene inventario
-            if producto.inventario:
-                producto.inventario.cantidad_stock = 0
+            # Poner stock en 0 si tiene inventario (queda registrado en movimientos_inventario)
+            inventario = producto.inventario
+            if inventario:
+                db.session.refresh(inventario, with_for_update=True)
+            if inventario and inventario.cantidad_stock:
+                from .inventario_service import InventarioService  # import local: inventario_service importa este módulo
+                InventarioService.ajustar(
+                    inventario.id_inventario, -inventario.cantidad_stock, "ajuste", InventarioService.usuario_actual()
+                )
+                sincronizar_resumen_productos([producto_id])
             
             db.session.commit()
+            invalidar_producto(producto_id)
             
             ordenes_asociadas = len(producto.detalles_orden) if producto.detalles_orden else 0
             return producto.to_dict(), ordenes_asociadas
@@ -290,6 +721,11 @@ class ProductoService:
         if not producto:
             raise ProductoServiceError("Producto no encontrado", status_code=404)
         
+        # Un upload local cuyo archivo ya se limpió (ver ImagenService.liberar_archivos)
+        ruta = ImagenService.ruta_local(url_imagen.strip())
+        if ruta is not None and not os.path.exists(ruta):
+            raise ProductoServiceError("El archivo de la imagen ya no existe; volver a subirlo", status_code=409)
+        
         # Si se marca como principal, quitar marca de otras
         if imagen_principal:
             ImagenProducto.query.filter_by(
@@ -297,20 +733,30 @@ class ProductoService:
                 imagen_principal=True
             ).update({'imagen_principal': False})
         
+        # Las imágenes forman parte de la representación del producto
+        producto.fecha_actualizacion = utc_now()
+        
         nueva_imagen = ImagenProducto(
             id_producto=producto_id,
             url_imagen=url_imagen.strip(),
+            hash_contenido=ImagenService.hash_de_url(url_imagen.strip()),
             descripcion=descripcion.strip() if descripcion else None,
             imagen_principal=imagen_principal
         )
         
         try:
             db.session.add(nueva_imagen)
+            sincronizar_resumen_productos([producto_id])
             db.session.commit()
-            return nueva_imagen.to_dict()
+            invalidar_producto(producto_id)
+            resultado = nueva_imagen.to_dict()
         except Exception as e:
             db.session.rollback()
             raise ProductoServiceError(f"Error al agregar imagen: {str(e)}", status_code=500)
+        
+        # Thumbnails y WebP en segundo plano; hasta entonces se sirve el original
+        ImagenService.encolar_variantes(nueva_imagen.id_imagen)
+        return resultado
 
 
 # Instancia singleton para uso directo (opcional)
@@ -0,0 +1,367 @@
+"""
+RecomendacionService - "Comprados juntos" a partir de la co-ocurrencia en órdenes
+
+Matriz dispersa producto x producto: para cada par (a, b) cuántas órdenes no canceladas
+incluyen ambos. El conteo completo lo hace la base de datos en una sola consulta
+(self-join de detalles_orden agrupado por par), y el resultado queda en un índice en
+memoria por proceso: {producto: {otro_producto: veces}}, más el top-k ya ordenado de
+cada producto, así responder una recomendación es una búsqueda en un dict.
+
+El índice se mantiene:
+- Incrementalmente al crear o cancelar órdenes (`registrar_orden` / `revertir_orden`).
+- Con una reconstrucción completa en segundo plano cada RECOMMENDATIONS_REFRESH_SECONDS
+  (cada worker tiene su propio índice y solo ve sus propias actualizaciones incrementales).
+- A pedido: POST /api/productos/recomendados/reconstruir o `flask recomendaciones reconstruir`.
+
+La primera construcción también corre en segundo plano: hasta que termina las consultas
+devuelven listas vacías, nunca esperan al self-join. Las órdenes registradas o canceladas
+mientras se calcula una reconstrucción se encolan con su id. La reconstrucción lee, en la
+misma foto de la base que usó para contar, si cada orden encolada quedó contada, y solo
+aplica la diferencia con su estado final: nada se pierde ni se cuenta dos veces.
+"""
+from __future__ import annotations
+import heapq
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from itertools import permutations
+from typing import Any, Dict, Iterable, Iterator, List
+
+from flask import Flask, current_app
+from sqlalchemy import and_, distinct, func, or_, select, text
+from sqlalchemy.orm import Session, aliased
+
+from .. import db
+from ..models import CAMPOS_TARJETA_PRODUCTO, DetalleOrden, Orden, Producto, opciones_campos
+
+TOP_K_MAXIMO = 20
+TOP_K_DEFAULT = 6
+ESTADO_CANCELADA = "cancelada"
+
+
+class RecomendacionServiceError(Exception):
+    """Excepción base para errores del servicio de recomendaciones"""
+
+    def __init__(self, message: str, status_code: int = 400) -> None:
+        self.message = message
+        self.status_code = status_code
+        super().__init__(self.message)
+
+
+class IndiceCoocurrencia:
+    """
+    Índice en memoria (thread-safe) de la matriz de co-ocurrencia.
+
+    El top de cada producto se ordena la primera vez que se pide y se descarta cuando
+    cambia alguno de sus conteos.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._conteos: dict[int, dict[int, int]] = {}
+        self._top: dict[int, tuple[tuple[int, int], ...]] = {}
+        self.construido_en: float | None = None
+        self.duracion_ms: float | None = None
+        self.reconstruyendo = False
+        # Deltas (id_orden, ids, delta) recibidos durante la reconstrucción en curso
+        self._pendientes: list[tuple[int, frozenset[int], int]] = []
+
+    @property
+    def construido(self) -> bool:
+        return self.construido_en is not None
+
+    def iniciar_reconstruccion(self) -> bool:
+        """
+        Marcar que empieza una reconstrucción (antes de consultar la base) para encolar
+        los deltas que lleguen mientras tanto. Devuelve False si ya había una en curso.
+        """
+        with self._lock:
+            if self.reconstruyendo:
+                return False
+            self.reconstruyendo = True
+            self._pendientes = []
+            return True
+
+    def cancelar_reconstruccion(self) -> None:
+        with self._lock:
+            self.reconstruyendo = False
+            self._pendientes = []
+
+    def ordenes_pendientes(self) -> set[int]:
+        """Órdenes con deltas encolados durante la reconstrucción en curso."""
+        with self._lock:
+            return {id_orden for id_orden, _, _ in self._pendientes}
+
+    def reemplazar(
+        self, conteos: dict[int, dict[int, int]], contadas: dict[int, bool], duracion_ms: float
+    ) -> bool:
+        """
+        Instalar el índice reconstruido. `contadas` dice, para cada orden encolada, si los
+        conteos ya la incluyen; de cada orden se aplica solo la diferencia entre eso y su
+        último delta (+1 vigente, -1 cancelada).
+
+        Returns:
+            False (sin instalar nada) si hay órdenes encoladas que no están en `contadas`
+        """
+        with self._lock:
+            ultimo: dict[int, tuple[frozenset[int], int]] = {}
+            for id_orden, ids, delta in self._pendientes:
+                ultimo[id_orden] = (ids, delta)
+            if not ultimo.keys() <= contadas.keys():
+                return False
+            for id_orden, (ids, delta) in ultimo.items():
+                ajuste = int(delta > 0) - int(contadas[id_orden])
+                if ajuste:
+                    self._sumar(conteos, ids, ajuste)
+            self._conteos = conteos
+            self._top = {}
+            self._pendientes = []
+            self.reconstruyendo = False
+            self.construido_en = time.time()
+            self.duracion_ms = duracion_ms
+            return True
+
+    def aplicar(self, id_orden: int, producto_ids: Iterable[int], delta: int) -> None:
+        """Sumar `delta` a todos los pares de productos de una orden."""
+        ids = frozenset(i for i in producto_ids if i is not None)
+        if len(ids) < 2:
+            return
+        with self._lock:
+            if self.reconstruyendo:
+                self._pendientes.append((id_orden, ids, delta))
+            if not self.construido:
+                return
+            self._sumar(self._conteos, ids, delta)
+            for a in ids:
+                self._top.pop(a, None)
+
+    @staticmethod
+    def _sumar(conteos: dict[int, dict[int, int]], ids: frozenset[int], delta: int) -> None:
+        for a, b in permutations(ids, 2):
+            vecinos = conteos.setdefault(a, {})
+            veces = vecinos.get(b, 0) + delta
+            if veces > 0:
+                vecinos[b] = veces
+            else:
+                vecinos.pop(b, None)
+
+    def top(self, producto_id: int, k: int) -> tuple[tuple[int, int], ...]:
+        """Los k productos más comprados junto con `producto_id`: ((id, veces), ...)."""
+        with self._lock:
+            top = self._top.get(producto_id)
+            if top is None:
+                vecinos = self._conteos.get(producto_id, {})
+                # Más veces primero; a igualdad, id menor (orden estable entre reconstrucciones)
+                top = tuple(heapq.nsmallest(TOP_K_MAXIMO, vecinos.items(), key=lambda par: (-par[1], par[0])))
+                self._top[producto_id] = top
+        return top[:k]
+
+    def vecinos(self, producto_id: int) -> dict[int, int]:
+        with self._lock:
+            return dict(self._conteos.get(producto_id, {}))
+
+    def estadisticas(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "construido": self.construido,
+                "construido_en": self.construido_en,
+                "duracion_ms": self.duracion_ms,
+                "productos": len(self._conteos),
+                "pares": sum(len(v) for v in self._conteos.values()),
+                "reconstruyendo": self.reconstruyendo,
+            }
+
+
+# Índice del proceso (uno por worker)
+indice_recomendaciones = IndiceCoocurrencia()
+_lock_reconstruccion = threading.Lock()
+
+
+class RecomendacionService:
+    """
+    Servicio de recomendaciones "comprados juntos".
+
+    Uso en routes:
+        RecomendacionService.registrar_orden(orden.id_orden, {1, 5, 9})   # después del commit
+        RecomendacionService.recomendados(5, k=6)              # [{"id": 9, "veces": 3}, ...]
+    """
+
+    @staticmethod
+    def calcular_conteos(sesion: Session | None = None) -> dict[int, dict[int, int]]:
+        """Matriz completa en una consulta: órdenes distintas no canceladas por par de productos."""
+        a = aliased(DetalleOrden)
+        b = aliased(DetalleOrden)
+        consulta = select(
+            a.id_producto, b.id_producto, func.count(distinct(a.id_orden))
+        ).join(
+            b, and_(b.id_orden == a.id_orden, b.id_producto != a.id_producto)
+        ).join(
+            Orden, Orden.id_orden == a.id_orden
+        ).where(
+            or_(Orden.estado.is_(None), Orden.estado != ESTADO_CANCELADA)
+        ).group_by(a.id_producto, b.id_producto)
+
+        conteos: dict[int, dict[int, int]] = defaultdict(dict)
+        for producto, otro, veces in (sesion or db.session).execute(consulta):
+            conteos[producto][otro] = veces
+        return dict(conteos)
+
+    @staticmethod
+    def _ordenes_contadas(sesion: Session, orden_ids: Iterable[int]) -> dict[int, bool]:
+        """Para cada orden, si calcular_conteos la cuenta (existe y no está cancelada)."""
+        ids = list(orden_ids)
+        contadas = dict.fromkeys(ids, False)
+        for id_orden, estado in sesion.execute(
+            select(Orden.id_orden, Orden.estado).where(Orden.id_orden.in_(ids))
+        ):
+            contadas[id_orden] = estado != ESTADO_CANCELADA
+        return contadas
+
+    @staticmethod
+    @contextmanager
+    def _lectura_consistente() -> Iterator[Session]:
+        """
+        Sesión propia cuyas consultas ven todas la misma foto de la base: REPEATABLE READ
+        en PostgreSQL, transacción de lectura explícita en SQLite.
+        """
+        with Session(db.engine) as sesion:
+            dialecto = db.engine.dialect.name
+            if dialecto == "postgresql":
+                sesion.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+            elif dialecto == "sqlite":
+                sesion.execute(text("BEGIN"))
+            yield sesion
+
+    @staticmethod
+    def reconstruir() -> Dict[str, Any]:
+        """Reconstruir el índice del proceso desde la base de datos (sincrónico)."""
+        with _lock_reconstruccion:
+            # Si la marcó _asegurar_indice ya está en curso (y encolando deltas)
+            indice_recomendaciones.iniciar_reconstruccion()
+            try:
+                inicio = time.perf_counter()
+                with RecomendacionService._lectura_consistente() as sesion:
+                    conteos = RecomendacionService.calcular_conteos(sesion)
+                    # Estado de las órdenes encoladas en la misma foto que los conteos; si
+                    # llegan más mientras tanto se consultan también (misma transacción)
+                    contadas: dict[int, bool] = {}
+                    while True:
+                        faltantes = indice_recomendaciones.ordenes_pendientes() - contadas.keys()
+                        if faltantes:
+                            contadas.update(RecomendacionService._ordenes_contadas(sesion, faltantes))
+                        duracion_ms = round((time.perf_counter() - inicio) * 1000, 1)
+                        if indice_recomendaciones.reemplazar(conteos, contadas, duracion_ms):
+                            break
+            except Exception:
+                indice_recomendaciones.cancelar_reconstruccion()
+                raise
+        return indice_recomendaciones.estadisticas()
+
+    @staticmethod
+    def _reconstruir_en_contexto(app: Flask) -> None:
+        with app.app_context():
+            try:
+                RecomendacionService.reconstruir()
+            except Exception as e:
+                app.logger.error(f"Error reconstruyendo recomendaciones: {str(e)}")
+            finally:
+                db.session.remove()
+
+    @staticmethod
+    def _asegurar_indice() -> None:
+        """
+        Lanzar en segundo plano la primera construcción del índice, o un refresco cuando
+        venció RECOMMENDATIONS_REFRESH_SECONDS. Nunca bloquea el request.
+        """
+        if indice_recomendaciones.construido:
+            intervalo = current_app.config.get('RECOMMENDATIONS_REFRESH_SECONDS', 900)
+            if not intervalo or time.time() - indice_recomendaciones.construido_en <= intervalo:
+                return
+        if indice_recomendaciones.iniciar_reconstruccion():
+            app = current_app._get_current_object()
+            threading.Thread(
+                target=RecomendacionService._reconstruir_en_contexto, args=(app,),
+                name="recomendaciones", daemon=True
+            ).start()
+
+    # ------------------------------------------------------------------
+    # Actualización incremental
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def registrar_orden(id_orden: int, producto_ids: Iterable[int]) -> None:
+        """Sumar una orden nueva (o reactivada) al índice. Llamar después del commit."""
+        indice_recomendaciones.aplicar(id_orden, producto_ids, 1)
+
+    @staticmethod
+    def revertir_orden(id_orden: int, producto_ids: Iterable[int]) -> None:
+        """Restar una orden cancelada del índice. Llamar después del commit."""
+        indice_recomendaciones.aplicar(id_orden, producto_ids, -1)
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _validar_k(k: int) -> None:
+        if k < 1 or k > TOP_K_MAXIMO:
+            raise RecomendacionServiceError(f"k debe estar entre 1 y {TOP_K_MAXIMO}")
+
+    @staticmethod
+    def recomendados(producto_id: int, k: int = TOP_K_DEFAULT) -> List[Dict[str, int]]:
+        """
+        Top-k de productos comprados junto con un producto (solo memoria). Lista vacía
+        mientras el índice del proceso se construye por primera vez.
+
+        Returns:
+            Lista de {"id": id_producto, "veces": órdenes en común}
+        """
+        RecomendacionService._validar_k(k)
+        RecomendacionService._asegurar_indice()
+        return [{"id": otro, "veces": veces} for otro, veces in indice_recomendaciones.top(producto_id, k)]
+
+    @staticmethod
+    def recomendados_para(producto_ids: List[int], k: int = TOP_K_DEFAULT) -> List[Dict[str, int]]:
+        """
+        Top-k para un carrito: suma las co-ocurrencias de todos sus productos y excluye
+        los que ya están en el carrito.
+        """
+        RecomendacionService._validar_k(k)
+        RecomendacionService._asegurar_indice()
+        en_carrito = set(producto_ids)
+        totales: dict[int, int] = defaultdict(int)
+        for producto_id in en_carrito:
+            for otro, veces in indice_recomendaciones.vecinos(producto_id).items():
+                if otro not in en_carrito:
+                    totales[otro] += veces
+        mejores = heapq.nsmallest(k, totales.items(), key=lambda par: (-par[1], par[0]))
+        return [{"id": otro, "veces": veces} for otro, veces in mejores]
+
+    @staticmethod
+    def con_productos(recomendaciones: List[Dict[str, int]]) -> List[Dict[str, Any]]:
+        """
+        Agregar los datos de tarjeta de cada producto recomendado (una consulta).
+        Se omiten los productos inactivos o eliminados.
+        """
+        if not recomendaciones:
+            return []
+        productos = {
+            p.id_producto: p
+            for p in Producto.query.options(*opciones_campos(Producto, CAMPOS_TARJETA_PRODUCTO)).filter(
+                Producto.id_producto.in_([r["id"] for r in recomendaciones]),
+                Producto.activo.is_(True)
+            )
+        }
+        return [
+            {**productos[r["id"]].to_dict(CAMPOS_TARJETA_PRODUCTO), "veces": r["veces"]}
+            for r in recomendaciones if r["id"] in productos
+        ]
+
+    @staticmethod
+    def estadisticas() -> Dict[str, Any]:
+        return indice_recomendaciones.estadisticas()
+
+
+# Instancia singleton para uso directo (opcional)
+recomendacion_service = RecomendacionService()
@@ -0,0 +1,312 @@
+"""
+SnapshotService - Snapshot estático del catálogo público
+
+El catálogo cambia pocas veces al día, así que la navegación pública no necesita pasar
+por los workers de Flask: este servicio escribe en CATALOG_SNAPSHOT_FOLDER un JSON
+compacto por categoría (shard) más un manifiesto, listos para el build de Astro o para
+un servidor de archivos estáticos:
+
+    manifest.json                         versión, fecha y lista de categorías con su shard
+    shards/categoria-<id>.<hash>.json     productos activos de la categoría
+
+Los shards se nombran por su contenido (inmutables, cacheables para siempre); el
+manifiesto es lo único que cambia de contenido con el mismo nombre y se escribe al final.
+
+Cada shard guarda una "versión" barata de la categoría (cantidad de productos y última
+modificación). La regeneración incremental calcula esas versiones con una sola consulta
+y reescribe solo los shards cuya versión cambió. Los productos se leen en una única
+pasada en streaming (productos + imágenes, ordenados por categoría), usando las
+columnas desnormalizadas de stock e imagen principal.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from flask import current_app
+from sqlalchemy import and_, func, select
+
+from .. import db
+from ..models import Categoria, ImagenProducto, Producto, utc_now
+from ..utils.http_cache import make_etag
+
+NOMBRE_MANIFIESTO = "manifest.json"
+CARPETA_SHARDS = "shards"
+FILAS_POR_LOTE = 1000
+
+_lock_snapshot = threading.Lock()
+
+
+class SnapshotServiceError(Exception):
+    """Excepción base para errores del servicio de snapshot"""
+
+    def __init__(self, message: str, status_code: int = 400) -> None:
+        self.message = message
+        self.status_code = status_code
+        super().__init__(self.message)
+
+
+def _json_compacto(datos: Any) -> bytes:
+    return json.dumps(datos, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _escribir_atomico(ruta: str, contenido: bytes) -> None:
+    """Escribir en un temporal de la misma carpeta y reemplazar (nunca queda un archivo a medias)."""
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    descriptor, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as destino:
+            destino.write(contenido)
+        os.replace(temporal, ruta)
+    except Exception:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+
+class SnapshotService:
+    """
+    Servicio de generación del snapshot estático del catálogo.
+
+    Uso:
+        SnapshotService.generar()                 # incremental: solo shards que cambiaron
+        SnapshotService.generar(completo=True)    # reescribir todos los shards
+    """
+
+    @staticmethod
+    def carpeta() -> str:
+        carpeta = current_app.config.get('CATALOG_SNAPSHOT_FOLDER')
+        if not carpeta:
+            raise SnapshotServiceError("CATALOG_SNAPSHOT_FOLDER no está configurada", status_code=500)
+        return carpeta
+
+    @staticmethod
+    def leer_manifiesto() -> Optional[Dict[str, Any]]:
+        """Manifiesto actual, o None si todavía no se generó ningún snapshot."""
+        ruta = os.path.join(SnapshotService.carpeta(), NOMBRE_MANIFIESTO)
+        if not os.path.exists(ruta):
+            return None
+        with open(ruta, "rb") as archivo:
+            return json.loads(archivo.read())
+
+    @staticmethod
+    def generar(completo: bool = False) -> Dict[str, Any]:
+        """
+        Generar (o actualizar) el snapshot.
+
+        Args:
+            completo: Reescribir todos los shards aunque su versión no haya cambiado
+
+        Returns:
+            Resumen con la versión del manifiesto y los shards regenerados / eliminados
+        """
+        with _lock_snapshot:
+            inicio = time.perf_counter()
+            carpeta = SnapshotService.carpeta()
+            anterior = SnapshotService.leer_manifiesto()
+            shards_anteriores = {
+                c["id"]: c for c in (anterior or {}).get("categorias", [])
+            }
+
+            categorias = SnapshotService._versiones_categorias()
+            cambiadas = [
+                c["id"] for c in categorias
+                if completo
+                or c["id"] not in shards_anteriores
+                or shards_anteriores[c["id"]]["version"] != c["version"]
+                or not os.path.exists(os.path.join(carpeta, shards_anteriores[c["id"]]["archivo"]))
+            ]
+
+            archivos = {
+                id_categoria: datos["archivo"] for id_categoria, datos in shards_anteriores.items()
+            }
+            por_id = {c["id"]: c for c in categorias}
+            for id_categoria, productos in SnapshotService._productos_por_categoria(cambiadas):
+                archivos[id_categoria] = SnapshotService._escribir_shard(
+                    carpeta, por_id[id_categoria], productos
+                )
+
+            entradas = [{**c, "archivo": archivos[c["id"]]} for c in categorias]
+            if anterior is not None and not cambiadas and entradas == anterior.get("categorias"):
+                # Nada cambió: se conserva el manifiesto (y su versión) sin escribir nada
+                return {
+                    "version": anterior["version"],
+                    "categorias": len(categorias),
+                    "total_productos": anterior["total_productos"],
+                    "regenerados": [],
+                    "eliminados": [],
+                    "duracion_ms": round((time.perf_counter() - inicio) * 1000, 1),
+                }
+
+            manifiesto = {
+                "version": (anterior or {}).get("version", 0) + 1,
+                "generado_en": utc_now().isoformat(),
+                "total_productos": sum(c["productos"] for c in categorias),
+                "categorias": entradas,
+            }
+            _escribir_atomico(os.path.join(carpeta, NOMBRE_MANIFIESTO), _json_compacto(manifiesto))
+
+            # Se conservan los shards del manifiesto anterior para clientes que todavía lo tienen
+            en_uso = set(archivos.values()) | {c["archivo"] for c in shards_anteriores.values()}
+            SnapshotService._limpiar_shards(carpeta, en_uso)
+
+            return {
+                "version": manifiesto["version"],
+                "categorias": len(categorias),
+                "total_productos": manifiesto["total_productos"],
+                "regenerados": cambiadas,
+                "eliminados": sorted(set(shards_anteriores) - set(por_id)),
+                "duracion_ms": round((time.perf_counter() - inicio) * 1000, 1),
+            }
+
+    @staticmethod
+    def _versiones_categorias() -> List[Dict[str, Any]]:
+        """Categorías activas con su cantidad de productos activos y su versión (una consulta)."""
+        consulta = select(
+            Categoria.id_categoria,
+            Categoria.nombre,
+            Categoria.descripcion,
+            Categoria.fecha_actualizacion,
+            func.count(Producto.id_producto),
+            func.max(Producto.fecha_actualizacion),
+        ).outerjoin(
+            Producto, and_(Producto.id_categoria == Categoria.id_categoria, Producto.activo.is_(True))
+        ).where(
+            Categoria.activa.is_(True)
+        ).group_by(
+            Categoria.id_categoria, Categoria.nombre, Categoria.descripcion, Categoria.fecha_actualizacion
+        ).order_by(Categoria.nombre)
+
+        return [
+            {
+                "id": id_categoria,
+                "nombre": nombre,
+                "descripcion": descripcion,
+                "productos": cantidad,
+                "version": make_etag(fecha_categoria, cantidad, ultima_modificacion),
+            }
+            for id_categoria, nombre, descripcion, fecha_categoria, cantidad, ultima_modificacion
+            in db.session.execute(consulta)
+        ]
+
+    @staticmethod
+    def _productos_por_categoria(categoria_ids: List[int]) -> Iterator[tuple[int, List[Dict[str, Any]]]]:
+        """
+        Una sola pasada en streaming sobre productos + imágenes de las categorías dadas,
+        ordenada por categoría: emite (id_categoria, productos) al terminar cada una.
+        Las categorías sin productos activos se emiten al final con lista vacía.
+        """
+        if not categoria_ids:
+            return
+        consulta = select(
+            Producto.id_categoria,
+            Producto.id_producto,
+            Producto.sku,
+            Producto.nombre,
+            Producto.descripcion,
+            Producto.precio,
+            Producto.material,
+            Producto.alto_cm,
+            Producto.ancho_cm,
+            Producto.profundidad_cm,
+            Producto.imagen_principal_url,
+            Producto.stock_actual,
+            Producto.en_stock,
+            ImagenProducto.url_imagen,
+        ).outerjoin(
+            ImagenProducto, ImagenProducto.id_producto == Producto.id_producto
+        ).where(
+            Producto.activo.is_(True),
+            Producto.id_categoria.in_(categoria_ids)
+        ).order_by(
+            Producto.id_categoria,
+            Producto.id_producto,
+            func.coalesce(ImagenProducto.imagen_principal, False).desc(),
+            ImagenProducto.id_imagen,
+        ).execution_options(stream_results=True, yield_per=FILAS_POR_LOTE)
+
+        pendientes = set(categoria_ids)
+        categoria_actual = None
+        productos: List[Dict[str, Any]] = []
+        resultado = db.session.execute(consulta)
+        try:
+            for fila in resultado:
+                if fila.id_categoria != categoria_actual:
+                    if categoria_actual is not None:
+                        pendientes.discard(categoria_actual)
+                        yield categoria_actual, productos
+                    categoria_actual, productos = fila.id_categoria, []
+                if not productos or productos[-1]["id"] != fila.id_producto:
+                    productos.append(SnapshotService._serializar(fila))
+                if fila.url_imagen:
+                    productos[-1]["imagenes"].append(fila.url_imagen)
+        finally:
+            resultado.close()
+
+        if categoria_actual is not None:
+            pendientes.discard(categoria_actual)
+            yield categoria_actual, productos
+        for id_categoria in sorted(pendientes):
+            yield id_categoria, []
+
+    @staticmethod
+    def _serializar(fila) -> Dict[str, Any]:
+        """Fila de la consulta -> producto compacto (mismas claves que Producto.to_dict)."""
+        def numero(valor):
+            return float(valor) if valor else None
+
+        return {
+            "id": fila.id_producto,
+            "sku": fila.sku,
+            "nombre": fila.nombre,
+            "descripcion": fila.descripcion,
+            "precio": float(fila.precio),
+            "material": fila.material,
+            "medidas": {
+                "alto": numero(fila.alto_cm),
+                "ancho": numero(fila.ancho_cm),
+                "profundidad": numero(fila.profundidad_cm),
+            },
+            "imagen_principal": fila.imagen_principal_url,
+            "imagenes": [],
+            "stock": fila.stock_actual,
+            "en_stock": fila.en_stock,
+        }
+
+    @staticmethod
+    def _escribir_shard(carpeta: str, categoria: Dict[str, Any], productos: List[Dict[str, Any]]) -> str:
+        """Escribir el shard de una categoría con nombre por contenido; devuelve la ruta relativa."""
+        contenido = _json_compacto({
+            "categoria": {
+                "id": categoria["id"],
+                "nombre": categoria["nombre"],
+                "descripcion": categoria["descripcion"],
+            },
+            "version": categoria["version"],
+            "productos": productos,
+        })
+        digest = hashlib.sha256(contenido).hexdigest()[:16]
+        relativa = f"{CARPETA_SHARDS}/categoria-{categoria['id']}.{digest}.json"
+        ruta = os.path.join(carpeta, relativa)
+        if not os.path.exists(ruta):
+            _escribir_atomico(ruta, contenido)
+        return relativa
+
+    @staticmethod
+    def _limpiar_shards(carpeta: str, en_uso: Iterable[str]) -> None:
+        """Borrar los shards que no referencia el manifiesto actual ni el anterior."""
+        carpeta_shards = os.path.join(carpeta, CARPETA_SHARDS)
+        if not os.path.isdir(carpeta_shards):
+            return
+        conservar = {os.path.basename(relativa) for relativa in en_uso}
+        for nombre in os.listdir(carpeta_shards):
+            if nombre.endswith(".json") and nombre not in conservar:
+                os.remove(os.path.join(carpeta_shards, nombre))
+
+
+# Instancia singleton para uso directo (opcional)
+snapshot_service = SnapshotService()
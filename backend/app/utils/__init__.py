@@ -21,6 +21,8 @@ from .helpers import (
     format_currency,
     calculate_percentage
 )
+from .pagination import encode_cursor, decode_cursor
+from .fields import parse_fields
 
 __all__ = [
     'validate_required_fields',
@@ -36,7 +38,10 @@ __all__ = [
     'paginate_query',
     'decimal_to_float',
     'format_currency',
-    'calculate_percentage'
+    'calculate_percentage',
+    'encode_cursor',
+    'decode_cursor',
+    'parse_fields'
 ]
 
 ######################################
@@ -0,0 +1,190 @@
+"""
+Compresión de respuestas de /api/* (gzip y brotli)
+
+Los listados del catálogo, las órdenes (con el producto completo en cada detalle) y los
+reportes devuelven JSON grande que se comprime muy bien. Este hook negocia la
+codificación con Accept-Encoding y comprime la respuesta si:
+
+- el path empieza con /api/, el status es 2xx con cuerpo y el tipo es texto/JSON/CSV;
+- no está ya codificada, no es un stream ni un archivo (send_file / X-Accel-Redirect);
+- el cuerpo tiene al menos COMPRESSION_MIN_SIZE bytes.
+
+Las respuestas que salen de la caché del catálogo (`response.cache_entry`, ver
+app/cache.py) se comprimen una sola vez por entrada y codificación; los requests
+siguientes sirven el cuerpo precomprimido.
+
+Brotli es una dependencia opcional: si el paquete `brotli` no está instalado solo se
+ofrece gzip. Las estadísticas por endpoint (ratio y tiempo de CPU) se consultan en
+GET /api/compresion.
+"""
+from __future__ import annotations
+import gzip
+import threading
+import time
+from typing import Any, Callable
+
+from flask import Flask, Response, current_app, request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli es opcional
+    brotli = None
+
+from ..cache import catalog_cache
+
+TIPOS_COMPRIMIBLES = frozenset({
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "text/csv",
+    "text/html",
+    "text/plain",
+    "text/xml",
+})
+STATUS_SIN_CUERPO = frozenset({204, 206, 304})
+
+
+class EstadisticasCompresion:
+    """Contadores de compresión por endpoint (thread-safe, por proceso)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._endpoints: dict[str, dict[str, Any]] = {}
+
+    def registrar(
+        self, endpoint: str, original: int, comprimido: int | None = None,
+        cpu_segundos: float = 0.0, precomprimido: bool = False
+    ) -> None:
+        """Registrar una respuesta; `comprimido=None` significa que no se comprimió (chica)."""
+        with self._lock:
+            datos = self._endpoints.setdefault(endpoint, {
+                "comprimidas": 0,
+                "sin_comprimir": 0,
+                "precomprimidas": 0,
+                "bytes_originales": 0,
+                "bytes_comprimidos": 0,
+                "cpu_segundos": 0.0,
+            })
+            if comprimido is None:
+                datos["sin_comprimir"] += 1
+                return
+            datos["comprimidas"] += 1
+            datos["precomprimidas"] += int(precomprimido)
+            datos["bytes_originales"] += original
+            datos["bytes_comprimidos"] += comprimido
+            datos["cpu_segundos"] += cpu_segundos
+
+    def reset(self) -> None:
+        with self._lock:
+            self._endpoints.clear()
+
+    def stats(self) -> dict[str, Any]:
+        """Ratio (comprimido / original) y CPU por endpoint, más los totales."""
+        with self._lock:
+            endpoints = {nombre: dict(datos) for nombre, datos in self._endpoints.items()}
+
+        totales = {"comprimidas": 0, "bytes_originales": 0, "bytes_comprimidos": 0, "cpu_segundos": 0.0}
+        for datos in endpoints.values():
+            for clave in totales:
+                totales[clave] += datos[clave]
+            datos.update(self._derivadas(datos))
+            datos["cpu_segundos"] = round(datos["cpu_segundos"], 6)
+        totales.update(self._derivadas(totales))
+        totales["cpu_segundos"] = round(totales["cpu_segundos"], 6)
+
+        return {
+            "codificaciones": codificaciones_disponibles(),
+            "min_size": current_app.config.get('COMPRESSION_MIN_SIZE', 1024),
+            "totales": totales,
+            "endpoints": dict(sorted(endpoints.items())),
+        }
+
+    @staticmethod
+    def _derivadas(datos: dict[str, Any]) -> dict[str, Any]:
+        originales = datos["bytes_originales"]
+        comprimidas = datos["comprimidas"]
+        return {
+            "ratio": round(datos["bytes_comprimidos"] / originales, 4) if originales else None,
+            "cpu_ms_promedio": round(datos["cpu_segundos"] * 1000 / comprimidas, 3) if comprimidas else None,
+        }
+
+
+# Instancia global (una por worker)
+estadisticas_compresion = EstadisticasCompresion()
+
+
+def codificaciones_disponibles() -> list[str]:
+    """Codificaciones soportadas, en orden de preferencia del servidor."""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def compresor(encoding: str) -> Callable[[bytes], bytes]:
+    """Función de compresión para una codificación con el nivel configurado."""
+    if encoding == "br":
+        calidad = current_app.config.get('COMPRESSION_BROTLI_QUALITY', 5)
+        return lambda datos: brotli.compress(datos, quality=calidad)
+    nivel = current_app.config.get('COMPRESSION_GZIP_LEVEL', 6)
+    # mtime=0: la misma entrada siempre produce los mismos bytes
+    return lambda datos: gzip.compress(datos, compresslevel=nivel, mtime=0)
+
+
+def _es_comprimible(response: Response) -> bool:
+    return (
+        200 <= response.status_code < 300
+        and response.status_code not in STATUS_SIN_CUERPO
+        and request.method != 'HEAD'
+        and not response.direct_passthrough
+        and not response.is_streamed
+        and 'Content-Encoding' not in response.headers
+        and 'X-Accel-Redirect' not in response.headers
+        and response.mimetype in TIPOS_COMPRIMIBLES
+    )
+
+
+def comprimir_respuesta(response: Response) -> Response:
+    """after_request: comprimir la respuesta si corresponde (ver docstring del módulo)."""
+    if not request.path.startswith('/api/') or not _es_comprimible(response):
+        return response
+
+    # La representación depende de Accept-Encoding aunque esta vez no se comprima
+    response.vary.add('Accept-Encoding')
+    encoding = request.accept_encodings.best_match(codificaciones_disponibles())
+    if encoding is None:
+        return response
+
+    endpoint = request.endpoint or request.path
+    cuerpo = response.get_data()
+    if len(cuerpo) < current_app.config.get('COMPRESSION_MIN_SIZE', 1024):
+        estadisticas_compresion.registrar(endpoint, len(cuerpo))
+        return response
+
+    inicio = time.thread_time()
+    entry = getattr(response, 'cache_entry', None)
+    if entry is not None and entry.body == cuerpo:
+        comprimido, precomprimido = catalog_cache.compressed(entry, encoding, compresor(encoding))
+    else:
+        comprimido, precomprimido = compresor(encoding)(cuerpo), False
+    cpu_segundos = time.thread_time() - inicio
+
+    if len(comprimido) >= len(cuerpo):
+        estadisticas_compresion.registrar(endpoint, len(cuerpo))
+        return response
+
+    response.set_data(comprimido)
+    response.headers['Content-Encoding'] = encoding
+    # El cuerpo ya no es byte a byte el de la versión original: el ETag pasa a ser débil
+    # (etag_matches compara en forma débil, así los 304 siguen funcionando)
+    etag, debil = response.get_etag()
+    if etag and not debil:
+        response.set_etag(etag, weak=True)
+
+    estadisticas_compresion.registrar(endpoint, len(cuerpo), len(comprimido), cpu_segundos, precomprimido)
+    return response
+
+
+def init_compression(app: Flask) -> None:
+    """Registrar la compresión de respuestas si está habilitada en la configuración."""
+    if not app.config.get('COMPRESSION_ENABLED', True):
+        return
+    app.extensions['compression'] = estadisticas_compresion
+    app.after_request(comprimir_respuesta)
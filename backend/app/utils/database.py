@@ -0,0 +1,19 @@
+"""
+Utilidades de base de datos
+
+Permite a los servicios elegir entre una implementación optimizada para PostgreSQL
+(motor de producción) y una alternativa portable (por ejemplo SQLite en tests).
+"""
+from __future__ import annotations
+
+from .. import db
+
+
+def get_dialect_name() -> str:
+    """Nombre del dialecto SQLAlchemy de la sesión actual ('postgresql', 'sqlite', ...)."""
+    return db.session.get_bind().dialect.name
+
+
+def is_postgresql() -> bool:
+    """True si la sesión actual está conectada a PostgreSQL."""
+    return get_dialect_name() == 'postgresql'
@@ -0,0 +1,35 @@
+"""
+Sparse fieldsets (?fields=)
+
+Los listados aceptan `?fields=id,nombre,precio` para devolver solo esas claves de
+cada elemento. El route valida la lista con `parse_fields` y se la pasa a la consulta
+(`opciones_campos` en models.py, que reduce el SELECT) y a `.to_dict(fields)`.
+"""
+from __future__ import annotations
+from typing import Iterable
+
+from flask import request
+
+
+def parse_fields(disponibles: Iterable[str], param: str = 'fields') -> set[str] | None:
+    """
+    Leer `?fields=` del request actual.
+
+    Returns:
+        Conjunto de campos pedidos, o None si no se pidió (serializar todo)
+
+    Raises:
+        ValueError: Si algún campo no existe en el modelo
+    """
+    valor = request.args.get(param)
+    if valor is None or not valor.strip():
+        return None
+
+    fields = {campo.strip() for campo in valor.split(',') if campo.strip()}
+    desconocidos = sorted(fields - set(disponibles))
+    if desconocidos:
+        raise ValueError(
+            f"Campos inválidos: {', '.join(desconocidos)}. "
+            f"Disponibles: {', '.join(disponibles)}"
+        )
+    return fields
@@ -0,0 +1,46 @@
+"""
+HTTP Cache Helpers
+
+ETags y respuestas condicionales (If-None-Match / 304 Not Modified).
+
+El ETag se calcula a partir de una "versión" barata de obtener (marcas de tiempo de
+última modificación, contadores) y no del cuerpo de la respuesta, así un 304 se puede
+contestar sin consultar los datos ni serializar nada.
+"""
+from __future__ import annotations
+import hashlib
+from typing import Any
+
+from flask import Response, current_app, request
+
+DEFAULT_CACHE_CONTROL = 'public, no-cache'
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Construir un ETag fuerte a partir de una versión y del recurso pedido.
+
+    Example:
+        make_etag(ultima_modificacion, cantidad, request.full_path)
+    """
+    raw = "|".join(str(part) for part in parts).encode("utf-8")
+    return hashlib.sha1(raw).hexdigest()
+
+
+def etag_matches(etag: str) -> bool:
+    """True si el cliente ya tiene esta versión (If-None-Match, comparación débil)."""
+    return request.if_none_match.contains_weak(etag)
+
+
+def apply_cache_headers(response: Response, etag: str) -> Response:
+    """Agregar ETag y Cache-Control a una respuesta."""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = current_app.config.get(
+        'CATALOG_CACHE_CONTROL', DEFAULT_CACHE_CONTROL
+    )
+    return response
+
+
+def not_modified_response(etag: str) -> Response:
+    """Respuesta 304 sin cuerpo para un ETag que el cliente ya tiene."""
+    return apply_cache_headers(current_app.response_class(status=304), etag)
@@ -0,0 +1,44 @@
+"""
+Paginación por cursor (keyset) para listados grandes
+
+A diferencia de `paginate_query` (LIMIT/OFFSET), el cursor guarda la última clave
+de ordenamiento vista y la siguiente página se pide con `WHERE clave > :ultima`.
+Así el costo de cada página depende solo del tamaño de la página y no de cuántas
+filas hay antes, siempre que exista un índice sobre la clave de ordenamiento.
+
+El cursor es opaco para el cliente: un JSON compacto codificado en base64 url-safe.
+"""
+from __future__ import annotations
+import base64
+import binascii
+import json
+from typing import Any
+
+
+def encode_cursor(data: dict[str, Any]) -> str:
+    """
+    Codificar el estado de paginación como string opaco.
+
+    Example:
+        encode_cursor({"o": "precio", "v": "150.00", "id": 42})  # -> 'eyJvIjoi...'
+    """
+    raw = json.dumps(data, separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict[str, Any]:
+    """
+    Decodificar un cursor generado por `encode_cursor`.
+
+    Raises:
+        ValueError: Si el cursor está mal formado o fue manipulado
+    """
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(cursor + padding)
+        data = json.loads(raw.decode("utf-8"))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError, ValueError):
+        raise ValueError("Cursor inválido")
+    if not isinstance(data, dict):
+        raise ValueError("Cursor inválido")
+    return data
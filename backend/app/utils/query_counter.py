@@ -0,0 +1,40 @@
+"""
+Contador de consultas SQL por request
+
+Cuenta cada sentencia que SQLAlchemy envía a la base de datos durante un request y
+la expone en el header `X-Query-Count` de la respuesta. Sirve para detectar (y probar
+que se corrigieron) problemas N+1 al serializar listados.
+
+Se activa con QUERY_COUNTER_ENABLED=true en la configuración.
+"""
+from __future__ import annotations
+from flask import Flask, Response, g, has_app_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+QUERY_COUNT_HEADER = 'X-Query-Count'
+
+
+def _contar_consulta(conn, cursor, statement, parameters, context, executemany) -> None:
+    """Listener de SQLAlchemy: suma una consulta al contador del request actual."""
+    if has_app_context():
+        g.query_count = g.get('query_count', 0) + 1
+
+
+def get_query_count() -> int:
+    """Cantidad de consultas ejecutadas hasta ahora en el request actual."""
+    return g.get('query_count', 0) if has_app_context() else 0
+
+
+def init_query_counter(app: Flask) -> None:
+    """Registrar el contador de consultas si está habilitado en la configuración."""
+    if not app.config.get('QUERY_COUNTER_ENABLED'):
+        return
+
+    if not event.contains(Engine, 'before_cursor_execute', _contar_consulta):
+        event.listen(Engine, 'before_cursor_execute', _contar_consulta)
+
+    @app.after_request
+    def add_query_count_header(response: Response) -> Response:
+        response.headers[QUERY_COUNT_HEADER] = str(get_query_count())
+        return response
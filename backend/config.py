@@ -31,3 +31,51 @@ class Config:
     UPLOAD_FOLDER = os.path.join(BASEDIR, 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+    
+    # Servido de /api/uploads: delegar el envío del archivo al proxy
+    # - nginx: location interna que apunta a UPLOAD_FOLDER, p. ej. '/_uploads/'
+    #     location /_uploads/ { internal; alias /ruta/a/backend/uploads/; }
+    # - Apache/lighttpd: USE_X_SENDFILE=true (opción estándar de Flask)
+    UPLOADS_ACCEL_REDIRECT_PREFIX = os.environ.get('UPLOADS_ACCEL_REDIRECT_PREFIX') or None
+    USE_X_SENDFILE = os.environ.get('USE_X_SENDFILE', 'false').lower() == 'true'
+    UPLOADS_MAX_AGE = int(os.environ.get('UPLOADS_MAX_AGE', 3600))  # segundos, archivos sin hash
+    # Un archivo sin referencias no se borra hasta que pasa este tiempo desde su último
+    # upload: /api/upload puede haber devuelto su URL para una imagen que todavía no se creó
+    UPLOADS_GRACE_SECONDS = int(os.environ.get('UPLOADS_GRACE_SECONDS', 3600))
+    
+    # Variantes de imágenes (thumb/card/detail en WebP y JPEG, requiere Pillow)
+    IMAGE_VARIANTS_ENABLED = os.environ.get('IMAGE_VARIANTS_ENABLED', 'true').lower() == 'true'
+    IMAGE_VARIANTS_WORKERS = int(os.environ.get('IMAGE_VARIANTS_WORKERS', 2))
+    
+    # Catálogo: límites superiores de los rangos de precio para las facetas
+    CATALOG_PRICE_BUCKETS = [50000, 100000, 250000, 500000]
+    
+    # Caché en memoria de respuestas del catálogo (ver app/cache.py)
+    CATALOG_CACHE_ENABLED = os.environ.get('CATALOG_CACHE_ENABLED', 'true').lower() == 'true'
+    CATALOG_CACHE_MAX_ENTRIES = int(os.environ.get('CATALOG_CACHE_MAX_ENTRIES', 512))
+    CATALOG_CACHE_MAX_BYTES = int(os.environ.get('CATALOG_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    CATALOG_CACHE_TTL = int(os.environ.get('CATALOG_CACHE_TTL', 300))  # segundos
+    # Las alertas de stock cambian con cada venta: vencen antes (y se invalidan al mover stock)
+    INVENTARIO_ALERTAS_TTL = int(os.environ.get('INVENTARIO_ALERTAS_TTL', 30))  # segundos
+    
+    # Cache-Control de las respuestas del catálogo con ETag: el navegador guarda la
+    # respuesta pero revalida siempre con If-None-Match (responde 304 si no cambió)
+    CATALOG_CACHE_CONTROL = os.environ.get('CATALOG_CACHE_CONTROL', 'public, no-cache')
+    
+    # Compresión de respuestas de /api/* (ver app/utils/compression.py); brotli solo si
+    # el paquete está instalado. Las respuestas cacheadas se guardan precomprimidas.
+    COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() == 'true'
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))  # bytes
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))  # 1..9
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 5))  # 0..11
+    
+    # Diagnóstico: agrega el header X-Query-Count con las consultas SQL de cada request
+    QUERY_COUNTER_ENABLED = os.environ.get('QUERY_COUNTER_ENABLED', 'false').lower() == 'true'
+    
+    # Recomendaciones "comprados juntos": índice en memoria por worker (ver
+    # services/recomendacion_service.py); se reconstruye en segundo plano cada N segundos
+    RECOMMENDATIONS_REFRESH_SECONDS = int(os.environ.get('RECOMMENDATIONS_REFRESH_SECONDS', 900))
+
+    # Snapshot estático del catálogo (manifest.json + shards por categoría) para el
+    # storefront Astro; ver services/snapshot_service.py y `flask catalogo snapshot`
+    CATALOG_SNAPSHOT_FOLDER = os.environ.get('CATALOG_SNAPSHOT_FOLDER') or os.path.join(BASEDIR, 'catalog_snapshot')
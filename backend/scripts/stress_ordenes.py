@@ -0,0 +1,95 @@
+"""
+Prueba de estrés: órdenes concurrentes sobre un mismo producto
+
+Fija el stock de un producto, dispara muchas órdenes en paralelo contra la API y
+verifica que no haya sobreventa: las órdenes aceptadas no pueden superar el stock
+inicial y el stock final tiene que ser exactamente el inicial menos lo vendido.
+Informa throughput (órdenes/s) y latencias.
+
+Correr contra un servidor real con varios workers y PostgreSQL, por ejemplo:
+
+    gunicorn -w 4 --threads 4 run:app
+    python scripts/stress_ordenes.py --producto 12 --stock 50 --ordenes 400 --concurrencia 32
+
+Con --cancelar las órdenes creadas se cancelan al final (el stock vuelve al inicial).
+Sale con código 1 si detecta sobreventa.
+"""
+from __future__ import annotations
+import argparse
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5000/api", help="URL base de la API")
+    parser.add_argument("--producto", type=int, required=True, help="Producto a comprar (debe tener inventario)")
+    parser.add_argument("--stock", type=int, default=50, help="Stock inicial a fijar")
+    parser.add_argument("--ordenes", type=int, default=400, help="Cantidad de órdenes a disparar")
+    parser.add_argument("--concurrencia", type=int, default=32, help="Requests en paralelo")
+    parser.add_argument("--cantidad", type=int, default=1, help="Unidades por orden")
+    parser.add_argument("--cliente", type=int, default=1, help="id_cliente de las órdenes")
+    parser.add_argument("--vendedor", type=int, default=1, help="id_vendedor de las órdenes")
+    parser.add_argument("--cancelar", action="store_true", help="Cancelar las órdenes creadas al terminar")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    sesion = requests.Session()
+
+    respuesta = sesion.get(f"{args.url}/inventario/producto/{args.producto}")
+    respuesta.raise_for_status()
+    id_inventario = respuesta.json()["id"]
+    sesion.put(f"{args.url}/inventario/{id_inventario}", json={"cantidad_stock": args.stock}).raise_for_status()
+
+    cuerpo = {
+        "id_cliente": args.cliente,
+        "id_vendedor": args.vendedor,
+        "items": [{"id_producto": args.producto, "cantidad": args.cantidad}],
+    }
+
+    def crear_orden(_: int) -> tuple[int, float, int | None]:
+        inicio = time.perf_counter()
+        r = requests.post(f"{args.url}/ordenes", json=cuerpo, timeout=30)
+        latencia = time.perf_counter() - inicio
+        return r.status_code, latencia, r.json()["orden"]["id"] if r.status_code == 201 else None
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrencia) as pool:
+        resultados = list(pool.map(crear_orden, range(args.ordenes)))
+    duracion = time.perf_counter() - inicio
+
+    creadas = [orden_id for status, _, orden_id in resultados if status == 201]
+    rechazadas = sum(1 for status, _, _ in resultados if status == 400)
+    errores = len(resultados) - len(creadas) - rechazadas
+    latencias = sorted(latencia for _, latencia, _ in resultados)
+
+    stock_final = sesion.get(f"{args.url}/inventario/{id_inventario}").json()["stock"]
+    vendido = len(creadas) * args.cantidad
+    sobreventa = max(0, vendido - args.stock)
+    esperado = args.stock - vendido
+
+    print(f"Órdenes: {args.ordenes} ({args.concurrencia} en paralelo) en {duracion:.2f} s "
+          f"-> {args.ordenes / duracion:.1f} órdenes/s")
+    print(f"Creadas: {len(creadas)}  Sin stock: {rechazadas}  Otros errores: {errores}")
+    print(f"Latencia p50: {statistics.median(latencias) * 1000:.1f} ms  "
+          f"p95: {latencias[int(len(latencias) * 0.95) - 1] * 1000:.1f} ms  "
+          f"máx: {latencias[-1] * 1000:.1f} ms")
+    print(f"Stock inicial: {args.stock}  vendido: {vendido}  final: {stock_final} (esperado {esperado})")
+    print(f"Sobreventa: {sobreventa}")
+
+    if args.cancelar:
+        for orden_id in creadas:
+            sesion.delete(f"{args.url}/ordenes/{orden_id}").raise_for_status()
+        print(f"Órdenes canceladas: {len(creadas)}")
+
+    return 1 if sobreventa or stock_final != esperado else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())